@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+'''
+Animates a full-screen scrolling gradient with pp.colour.render.Screen, reporting the frame rate and bytes per frame.
+e.g. bin/animate_gradient.py [frames] [truecolour|256], or redirect stdout to measure without a terminal
+'''
+
+import os
+import sys
+import time
+
+from pp.colour import gradient, render
+
+if __name__ == '__main__':
+    n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    mode = sys.argv[2] if len(sys.argv) > 2 else 'truecolour'
+    try:
+        width, height = os.get_terminal_size()
+    except OSError:
+        width, height = 200, 60
+    height -= 1
+
+    colours = gradient.gradient([(255, 0, 128), (255, 200, 0), (0, 200, 255), (255, 0, 128)], width * 2)
+    written, start = 0, time.perf_counter()
+    with render.Screen(mode) as screen:
+        for i in range(n_frames):
+            # each row is offset from the last, and the whole gradient scrolls one cell per frame
+            written += screen.draw([
+                [(' ', None, colours[(x + y + i) % len(colours)]) for x in range(width)]
+                for y in range(height)
+            ])
+    elapsed = time.perf_counter() - start
+    print(f'{width}x{height}, {mode}: {n_frames / elapsed:.1f} fps, {written / n_frames:,.0f} bytes/frame', file=sys.stderr)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+'Benchmarks the batch (*_many) colour conversions in pp.colour.c against the scalar ones, for 1M colours.'
+
+import random
+
+from pp import bench
+from pp.colour import c
+
+N = 1_000_000
+
+def ansi_to_rgb_scalar(codes): return [c.ansi_to_rgb(n) for n in codes]
+def ansi_to_rgb_many(codes):   return c.ansi_to_rgb_many(codes)
+
+def rgb_to_ansi_scalar(pixels): return [c.rgb_to_ansi(*p) for p in pixels]
+def rgb_to_ansi_many(pixels):   return c.rgb_to_ansi_many(pixels)
+
+def same(result, expected):
+    'Compare numpy arrays and lists'
+    if hasattr(result, 'tolist'):
+        result = [tuple(i) if isinstance(i, list) else i for i in result.tolist()]
+    return result == expected
+
+if __name__ == '__main__':
+    rng = random.Random(0)
+    codes = [rng.randrange(256) for _ in range(N)]
+    pixels = [(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(N)]
+    if c.np is not None:
+        codes_many, pixels_many = c.np.array(codes, dtype=c.np.uint8), c.np.array(pixels, dtype=c.np.uint8)
+    else:
+        codes_many, pixels_many = codes, pixels
+
+    for (scalar, many), args, args_many in (
+        ((ansi_to_rgb_scalar, ansi_to_rgb_many), codes, codes_many),
+        ((rgb_to_ansi_scalar, rgb_to_ansi_many), pixels, pixels_many),
+    ):
+        expected = scalar(args)
+        bench.bench(tests=[((args,), {}, expected)], func_groups=[[scalar]], n=3, compare=same, progress=False)
+        bench.bench(tests=[((args_many,), {}, expected)], func_groups=[[many]], n=3, compare=same, progress=False)
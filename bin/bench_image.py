@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+'Benchmarks rendering a 4K (3840x2160) PPM image with pp.colour.image, to /dev/null.'
+
+import os
+import tempfile
+import time
+
+from pp.colour import image
+
+WIDTH, HEIGHT = 3840, 2160
+
+def write_ppm(path):
+    'A smooth gradient, with a band of noise'
+    with open(path, 'wb') as f:
+        f.write(f'P6\n# test image\n{WIDTH} {HEIGHT}\n255\n'.encode())
+        noise = os.urandom(WIDTH * 3)
+        for y in range(HEIGHT):
+            if HEIGHT // 3 <= y < HEIGHT // 2:
+                f.write(noise)
+            else:
+                f.write(bytes(v for x in range(WIDTH) for v in (x * 255 // WIDTH, y * 255 // HEIGHT, 128)))
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, '4k.ppm')
+        write_ppm(path)
+        with open(os.devnull, 'w') as out:
+            for mode in ('256', 'truecolour'):
+                for columns in (80, 200):
+                    start = time.perf_counter()
+                    image.render(path, columns=columns, mode=mode, out=out)
+                    print(f'{mode:>10s}, {columns:3d} columns: {(time.perf_counter() - start)*1000:7.1f} ms')
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+'Benchmarks logging a structured record with logger.info(msg, {fields}), against the logger.event(msg, **fields) fast path.'
+
+import os
+
+from pp import bench, log
+
+def info(logger):
+    logger.info('request', {'path': '/', 'status': 200, 'duration_ms': 12.5})
+
+def event(logger):
+    logger.event('request', path='/', status=200, duration_ms=12.5)
+
+if __name__ == '__main__':
+    with open(os.devnull, 'w') as devnull:
+        logger = log.getLogger('bench_log', level=log.LogLevel.INFO, stream=devnull)
+
+        # peak is the memory allocated (and freed) while logging a record
+        bench.bench(
+            tests=[((logger,), {}, None)],
+            func_groups=[[info, event]],
+            n=10_000,
+            memory=True,
+        )
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+'Benchmarks rendering a 200x60 grid with colorise per cell, against pp.colour.render in 256-colour and truecolour modes.'
+
+from pp import bench
+from pp.colour import c, render
+
+WIDTH, HEIGHT = 200, 60
+
+def colorise_cells(rows, rgb_rows):
+    return '\n'.join(''.join(c.from_ansi(fg).colorise(c.from_ansi(bg).colorise(text), 'fg') for text, fg, bg in row) for row in rows)
+
+def render_256(rows, rgb_rows):
+    return render.Renderer('256').render(rows)
+
+def render_truecolour(rows, rgb_rows):
+    return render.Renderer('truecolour').render(rgb_rows)
+
+if __name__ == '__main__':
+    # horizontal bands of 8 cells of a colour, as in a gradient or heatmap
+    rows = [
+        [('▀', 16 + (x // 8 + y) % 216, 16 + (x // 8 + y + 1) % 216) for x in range(WIDTH)]
+        for y in range(HEIGHT)
+    ]
+    # the same grid, in RGB
+    rgb_rows = [[(text, c.ansi_to_rgb(fg), c.ansi_to_rgb(bg)) for text, fg, bg in row] for row in rows]
+
+    for func in (colorise_cells, render_256, render_truecolour):
+        print(f'{func.__name__:>20s}: {len(func(rows, rgb_rows).encode()):>9,d} bytes')
+
+    bench.bench(
+        tests=[((rows, rgb_rows), {}, bench.NoExpectation)],
+        func_groups=[[colorise_cells], [render_256, render_truecolour]],
+        n=100,
+        sort=True,
+    )
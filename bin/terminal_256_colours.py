@@ -3,11 +3,12 @@
 from itertools import starmap
 import types
 import json
-import re
 import functools
 import itertools
 import operator
 
+from pp.colour.styled import Styled
+
 RESET = '\x1b[0m'
 
 p = functools.partial(operator.is_, None)
@@ -53,25 +54,14 @@ def string_grid(grid, pad_top=1, pad_bottom=1):
     return '\n'.join(list(_string_grid(grid)))
 
 
-ansi_colours = re.compile(r"""
-    \x1b     # literal ESC
-    \[       # literal [
-    [;\d]*   # zero or more digits or semicolons
-    [A-Za-z] # a letter
-    """, re.VERBOSE)
-
-
 def print_side_by_side(*grids):
-    lengths = [max(len(ansi_colours.sub('', l))
-                   for l in g.split('\n')) for g in grids]
-    for lines in itertools.zip_longest(*[g.split('\n') for g in grids]):
-        for length, chunk in zip(lengths, lines):
-            if chunk is None or len(chunk) == 0:
-                print(' '*length, end=' ')
-            else:
-                l = len(ansi_colours.sub('', chunk))
-                print(chunk+' '*(length-l), end=' ')
-        print()
+    # each line is measured once, as a Styled string
+    grids = [[Styled(l) for l in g.split('\n')] for g in grids]
+    lengths = [max(l.width for l in g) for g in grids]
+    lines = []
+    for row in itertools.zip_longest(*grids, fillvalue=Styled('')):
+        lines.append(''.join(chunk.ljust(length) + ' ' for length, chunk in zip(lengths, row)))
+    print('\n'.join(lines))
 
 
 def test1():
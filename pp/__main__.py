@@ -0,0 +1,168 @@
+'''
+Pretty-print JSONL/NDJSON (e.g. the output of pp.log) from stdin or files, colourised like ppj.
+
+usage:
+
+$ tail -f app.log | python -m pp
+$ python -m pp app.log.1 app.log --keys msg,level,event.key
+$ python -m pp huge.log --workers 4 > /dev/null
+
+input is read in large binary chunks, and split into lines a chunk at a time (not line by line).
+each chunk is formatted as a whole (by a pool of processes with `--workers`, whose output is written in order),
+and lines that aren't JSON objects/arrays are passed through unchanged.
+with no colour and nothing to reformat, chunks are copied straight through, without being split or decoded.
+'''
+
+from __future__ import annotations
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+import json
+import os
+import queue
+import sys
+import threading
+from typing import IO, ContextManager, Iterable, Iterator
+
+from pp.pp import STYLES, highlight_json, project
+
+CHUNK_SIZE = 1 << 20
+
+def read_chunks(f: IO[bytes], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    '''
+    read a binary file in chunks of up to chunk_size bytes (longer only for longer lines) that each end at the end of a line
+    uses read1, so that a chunk is whatever is available (e.g. from `tail -f`), rather than blocking until it's full
+    '''
+    rest = b''
+    while chunk := f.read1(chunk_size):
+        end = chunk.rfind(b'\n')
+        if end == -1:
+            rest += chunk
+            continue
+        yield rest + chunk[:end + 1]
+        rest = chunk[end + 1:]
+    if rest:
+        yield rest
+
+def format_chunk(chunk: bytes, keys: list[str] | None = None, indent: int | None = None, style: str | None = 'dracula') -> bytes:
+    '''
+    format the lines of a chunk
+    - `keys` projects each JSON object to dotted paths (see pp.project), dropping objects that have none of them
+    - `indent` re-serialises each JSON line with an indent (otherwise lines are only coloured, not parsed)
+    - `style` is a pygments style for highlight_json, or None for no colour
+    '''
+    lines = chunk.decode('utf-8', 'surrogateescape').split('\n')
+    # chunks end at the end of a line (except perhaps the last), so there's nothing after the last newline
+    if not lines[-1]:
+        lines.pop()
+    if keys is None and indent is None:
+        # colour only: no need to parse
+        out = [highlight_json(line, style) if line[:1] in ('{', '[') else line for line in lines] if style else lines
+    else:
+        out = []
+        for line in lines:
+            try:
+                d = json.loads(line) if line[:1] in ('{', '[') else None
+            except ValueError:
+                d = None
+            if keys is not None:
+                if not isinstance(d, dict) or not (d := project(d, keys)):
+                    continue
+            elif d is None:
+                out.append(line)
+                continue
+            line = json.dumps(d, indent=indent, ensure_ascii=False)
+            out.append(highlight_json(line, style) if style else line)
+    return ''.join([f'{line}\n' for line in out]).encode('utf-8', 'surrogateescape')
+
+def format_stream(chunks: Iterable[bytes], out: IO[bytes], workers: int = 0, **kwargs) -> None:
+    '''
+    format chunks of lines (see format_chunk) to a binary stream
+    with `workers`, chunks are formatted in a pool of processes, with a bounded number in flight and written in order
+    '''
+    fmt = partial(format_chunk, **kwargs)
+    if workers <= 1:
+        for chunk in chunks:
+            out.write(fmt(chunk))
+            out.flush()
+        return
+    # a thread writes each chunk as soon as it's formatted (in order), while this one reads and submits the next,
+    # so output isn't held back waiting for more input (e.g. from `tail -f`)
+    pending: queue.Queue[Future | None] = queue.Queue(maxsize=2 * workers)
+    errors = []
+
+    def write():
+        while (future := pending.get()) is not None:
+            if errors:
+                # keep taking chunks, so that the reader isn't blocked
+                continue
+            try:
+                out.write(future.result())
+                out.flush()
+            except BaseException as e:
+                errors.append(e)
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    with ProcessPoolExecutor(workers) as pool:
+        try:
+            for chunk in chunks:
+                if errors:
+                    break
+                pending.put(pool.submit(fmt, chunk))
+        finally:
+            pending.put(None)
+            writer.join()
+    if errors:
+        raise errors[0]
+
+def _open(path: str) -> ContextManager[IO[bytes]]:
+    'open a file, or stdin (which is left open) for "-"'
+    return nullcontext(sys.stdin.buffer) if path == '-' else open(path, 'rb')
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m pp', description='pretty-print JSONL/NDJSON from stdin or files')
+    parser.add_argument('files', nargs='*', default=['-'], help='the files to read, in order (default: stdin)')
+    parser.add_argument('-k', '--keys', default=None, help='only show these (comma-separated, dotted) keys, e.g. msg,level,event.key')
+    parser.add_argument('-i', '--indent', type=int, default=None, help='indent each record over multiple lines')
+    parser.add_argument('-s', '--style', default='dracula', help=f'the pygments style, e.g. {", ".join(STYLES)}')
+    parser.add_argument('--colour', choices=('auto', 'always', 'never'), default='auto', help='colourise output (default: when stdout is a terminal)')
+    parser.add_argument('-w', '--workers', type=int, default=0, help='format chunks in this many processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='the number of bytes to read at a time')
+    args = parser.parse_args(argv)
+
+    out = sys.stdout.buffer
+    colour = args.colour == 'always' or (args.colour == 'auto' and out.isatty())
+    keys = args.keys.split(',') if args.keys else None
+    status = 0
+    try:
+        for path in args.files:
+            try:
+                opened = _open(path)
+            except OSError as e:
+                # report it and carry on with the other files, as cat does
+                print(f'{parser.prog}: {path}: {e.strerror}', file=sys.stderr)
+                status = 1
+                continue
+            with opened as f:
+                if not colour and keys is None and args.indent is None:
+                    # nothing to format
+                    while chunk := f.read1(args.chunk_size):
+                        out.write(chunk)
+                        out.flush()
+                    continue
+                format_stream(
+                    read_chunks(f, args.chunk_size), out, args.workers,
+                    keys=keys, indent=args.indent, style=args.style if colour else None,
+                )
+    except BrokenPipeError:
+        # e.g. piped to head: stop quietly, and don't let the interpreter's own flush fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    if status:
+        sys.exit(status)
+
+if __name__ == '__main__':
+    main()
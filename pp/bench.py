@@ -19,25 +19,83 @@ bench.bench(
     tests=tests,
     func_groups=func_groups,
     n=100_000,
-    sort=('BENCH_SORT' in os.environ)
+    sort=('BENCH_SORT' in os.environ),
+    memory=False, # also trace peak memory, retained memory blocks & GC collections per function
 )
+
+to see how functions scale with input size, sweep over a generator of (args, kwargs) per size:
+
+bench.sweep(
+    gen=lambda size: ((list(range(size)),), {}),
+    func_groups=func_groups,
+    sizes=(10, 100, 1_000, 10_000),
+)
+
+cold starts (imports, first calls, cache priming) are timed in a fresh interpreter per sample,
+by adding a Snippet to a func group (or passing `isolated=True` to time every function cold):
+
+bench.bench(
+    tests=[((), {}, NoExpectation)],
+    func_groups=[[bench.Snippet('import json'), bench.Snippet('import pp.bench')]],
+)
+
+results can be appended to a local history store, and their trends viewed later:
+
+bench.bench(tests=tests, func_groups=func_groups, store=True, suite='katas')
+$ python -m pp.bench history --suite katas
+
+every function is verified against every test (in parallel) before any timing starts,
+failing functions aren't timed, and results can be compared with e.g. `compare=bench.approx(rel_tol=1e-6)`
+
+coroutine functions (`async def`) are awaited inside a single reused event loop,
+optionally with `concurrency` calls in flight at once (via `asyncio.gather`)
 '''
 
-from collections import Counter, namedtuple
+from __future__ import annotations
+from array import array
+import asyncio
+import atexit
+import cProfile
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from functools import lru_cache, wraps
 from itertools import chain, repeat
+import gc
+import hashlib
+import inspect
+import json
+import marshal
+import math
+import platform
 import operator
 import pickle
+import pstats
+import random
+import shutil
+import sqlite3
+import subprocess
+import threading
 import time, sys, os
-from typing import Callable, Any
+import tracemalloc
+from typing import Callable
 import statistics
 
 from pp import pp
+from pp.colour import c
 
 Test = namedtuple('Test', 'args kwargs expected n')
+Result = namedtuple('Result', 'func result correct times mem throughput profile', defaults=(None, None, None))
+MemStats = namedtuple('MemStats', 'peak retained_blocks gc')
+Verdict = namedtuple('Verdict', 'result correct')
+Fit = namedtuple('Fit', 'complexity coef const')
+Sweep = namedtuple('Sweep', 'func sizes medians fit')
 class NoExpectation:
     'Denotes that a test/benchmark has no expected result (i.e. just benchmark it)'
 
+class VerificationError(Exception):
+    'Raised when a function fails verification, and verification is set to fail fast'
+
 def set_function_module(func):
     'Set the module of a function'
     if func.__module__ != '__main__':
@@ -51,34 +109,588 @@ def set_function_module(func):
         func.__module__ = os.path.basename(os.getcwd())
 
 @lru_cache
-def _load_serialised_args(serialised_args):
-    return pickle.loads(serialised_args)
+def _terminal_width() -> int:
+    'The terminal width, looked up once (falls back to 80 columns when the output is piped)'
+    return shutil.get_terminal_size().columns
+
+# how often (in seconds) the progress line is redrawn on a TTY, and printed when piped
+PROGRESS_REFRESH, PROGRESS_REFRESH_PLAIN = 0.25, 5.0
+
+class Progress(threading.Thread):
+    '''
+    Reports the progress of a timing loop from a separate thread, at a fixed refresh rate.
+    The loop itself does no extra work: progress is read from the length hint of its iterator,
+    and the times aren't read until the loop has finished (so as not to hold the GIL while it's timed).
+    On a TTY the line is redrawn in place, otherwise a plain line is printed every refresh.
+    '''
+    def __init__(self, label: str, iterations, per: int = 1, enabled: bool = True, stream=None):
+        super().__init__(daemon=True)
+        self.label, self.iterations, self.per, self.enabled = label, iterations, per, enabled
+        self.n = iterations.__length_hint__()
+        self.stream = stream or sys.stderr
+        self.tty = self.stream.isatty()
+        self.refresh = PROGRESS_REFRESH if self.tty else PROGRESS_REFRESH_PLAIN
+        self.stopped, self.drawn = threading.Event(), False
+
+    def __enter__(self) -> Progress:
+        if self.enabled:
+            self.started_at = time.time()
+            self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if not self.enabled:
+            return
+        self.stopped.set()
+        self.join()
+        if self.tty and self.drawn:
+            self.stream.write('\r\033[K')
+            self.stream.flush()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.refresh):
+            self.draw()
+
+    def draw(self) -> None:
+        done = self.n - self.iterations.__length_hint__()
+        elapsed = time.time() - self.started_at
+        rate = done*self.per / elapsed if elapsed else 0
+        eta = (self.n-done)*self.per / rate if rate else 0
+        msg = '{label:s} {done:,d}/{n:,d} ({pct:5.1f}%) {sep:s} {rate:s} {sep:s} {elapsed:.1f}s {sep:s} eta {eta:.1f}s'.format(**{
+            'label':  self.label,
+            'done':   done*self.per,
+            'n':      self.n*self.per,
+            'pct':    100*done/self.n if self.n else 100,
+            'rate':   _format_rate(rate).strip(),
+            'elapsed': elapsed,
+            'eta':    eta,
+            'sep':    RECORD_SEP,
+        })
+        if self.tty:
+            self.stream.write('\r\033[K' + pp.ps(msg[:_terminal_width()-1], 'brightblack'))
+        else:
+            self.stream.write(msg + '\n')
+        self.stream.flush()
+        self.drawn = True
+
+# the code run by each cold-start worker: it signals that it has started, then waits for a single job.
+# only builtin/frozen modules are imported before the snippet, so that it starts as cold as possible
+_COLD_WORKER = '''
+import marshal, sys, time
+sys.stdout.buffer.write(b"\\n"); sys.stdout.flush()
+setup, stmt, mode, args, pickled = marshal.loads(sys.stdin.buffer.read())
+if pickled:
+    import pickle
+    args = pickle.loads(args)
+ns = {"args": args[0], "kwargs": args[1]}
+exec(setup, ns)
+code = compile(stmt, "<cold>", mode)
+start = time.perf_counter()
+try:
+    result = eval(code, ns)
+except Exception as e:
+    result = e
+elapsed = time.perf_counter() - start
+try:
+    out = marshal.dumps((elapsed, result))
+except ValueError:
+    out = marshal.dumps((elapsed, repr(result)))
+sys.stdout.buffer.write(out)
+'''
+
+# the default (maximum) number of cold samples per snippet, and the number of workers started at once
+COLD_N, COLD_WORKERS = 20, 4
+
+class WorkerPool:
+    '''
+    A pool of pre-started interpreters, each used for a single cold-start sample.
+    Workers are started in batches, and every worker in a batch has finished starting up before
+    any sample is run, so that start-up never overlaps (and adds noise to) a timed sample.
+    Safe to share between threads (e.g. those of verify).
+    '''
+    def __init__(self, size: int = COLD_WORKERS):
+        self.size, self.workers = size, deque()
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _start(self) -> None:
+        batch = [
+            subprocess.Popen([sys.executable, '-c', _COLD_WORKER], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            for _ in range(self.size)
+        ]
+        for worker in batch:
+            worker.stdout.read(1)
+        self.workers.extend(batch)
+
+    def run(self, job: bytes) -> tuple[float, object]:
+        'Run a job in the next ready worker, returning the elapsed time and result'
+        with self.lock:
+            if not self.workers:
+                self._start()
+            worker = self.workers.popleft()
+        out, err = worker.communicate(job)
+        if not out:
+            raise RuntimeError(f'cold-start worker failed:\n{err.decode()}')
+        return marshal.loads(out)
+
+    def close(self) -> None:
+        with self.lock:
+            while self.workers:
+                self.workers.popleft().kill()
+
+_WORKER_POOL: WorkerPool | None = None
+_WORKER_POOL_LOCK = threading.Lock()
+
+def _worker_pool() -> WorkerPool:
+    'The shared WorkerPool, started on first use'
+    global _WORKER_POOL
+    with _WORKER_POOL_LOCK:
+        if _WORKER_POOL is None:
+            _WORKER_POOL = WorkerPool()
+        return _WORKER_POOL
+
+class Snippet:
+    '''
+    A statement to time from a cold start, in a fresh interpreter per sample.
+    - `setup` is run (untimed) first, in the same namespace
+    - the test args & kwargs are available to both as `args` and `kwargs`
+    - if `stmt` is an expression, its value is the result that is compared with the expected result
+    - at most `n` samples are taken, as each one costs an interpreter start-up
+    '''
+    def __init__(self, stmt: str, setup: str = '', name: str | None = None, module: str = 'cold', n: int = COLD_N):
+        self.stmt, self.setup, self.n = stmt, setup, n
+        self.__name__, self.__module__ = name or stmt, module
+        try:
+            compile(stmt, '<cold>', 'eval')
+            self.mode = 'eval'
+        except SyntaxError:
+            self.mode = 'exec'
+
+    def __repr__(self) -> str:
+        return f'Snippet({self.stmt!r}, setup={self.setup!r})'
+
+    @classmethod
+    def from_func(cls, func: Callable, n: int = COLD_N) -> Snippet:
+        'A snippet that imports a function (untimed), then times its first call'
+        name = f'{func.__module__}.{func.__qualname__}'
+        if func.__module__ == '__main__' or func.__module__ not in sys.modules:
+            raise ValueError(f'{name} must be importable to be timed in a fresh interpreter')
+        if '<locals>' in func.__qualname__ or '<lambda>' in func.__qualname__:
+            raise ValueError(f'{name} must be defined at the top level of its module to be timed in a fresh interpreter')
+        if getattr(sys.modules[func.__module__], func.__name__, None) is not func:
+            raise ValueError(f'{name} must be importable by name from its module to be timed in a fresh interpreter')
+        setup, stmt = f'from {func.__module__} import {func.__name__}', f'{func.__name__}(*args, **kwargs)'
+        if inspect.iscoroutinefunction(func):
+            setup, stmt = f'import asyncio\n{setup}', f'asyncio.run({stmt})'
+        return cls(stmt, setup, name=func.__name__, module=func.__module__, n=n)
+
+    def _job(self, args_ser: bytes, kwargs) -> bytes:
+        args = (pickle.loads(args_ser), kwargs)
+        try:
+            return marshal.dumps((self.setup, self.stmt, self.mode, args, False))
+        except ValueError:
+            return marshal.dumps((self.setup, self.stmt, self.mode, pickle.dumps(args), True))
+
+    def sample(self, args_ser: bytes, kwargs, iterations, times: Counter) -> object:
+        'Time one cold run per iteration, recording the times in a Counter, and return the last result'
+        job, result = self._job(args_ser, kwargs), None
+        for _ in iterations:
+            elapsed, result = _worker_pool().run(job)
+            times[elapsed] += 1
+        return result
+
+    def __call__(self, *args, **kwargs) -> object:
+        'Run the snippet once from a cold start, returning its result'
+        return _worker_pool().run(self._job(pickle.dumps(args), kwargs))[1]
+
+@contextmanager
+def _gc_disabled(enabled: bool = True):
+    'Disable the garbage collector for the duration of a timed region, after collecting any garbage'
+    if not enabled or not gc.isenabled():
+        yield
+        return
+    gc.collect()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+@contextmanager
+def _pinned(cpus: set[int] | None = None):
+    'Pin the process to a set of CPUs (where supported) for the duration of a run'
+    if not cpus:
+        yield
+        return
+    if not hasattr(os, 'sched_setaffinity'):
+        pp.pps(f'CPU affinity is not supported on this platform, not pinning to {cpus}', 'yellow')
+        yield
+        return
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
+
+def _time_loop(func, args_ser: bytes, kwargs, iterations, times: Counter) -> None:
+    'Time every call of a function, recording the times in a Counter'
+    # unpickled once, outside the timed calls, so that they only time the function
+    start, args = 0, pickle.loads(args_ser)
+    for _ in iterations:
+        try:
+            start = time.perf_counter()
+            func(*args, **kwargs)
+        except Exception:
+            pass
+        finally:
+            times[time.perf_counter()-start] += 1
+
+@lru_cache
+def _event_loop() -> asyncio.AbstractEventLoop:
+    'A single event loop, reused for every coroutine that is benchmarked'
+    return asyncio.new_event_loop()
+
+async def _atime_call(func, args, kwargs, times: Counter) -> None:
+    'Await a single call of a coroutine function, and record its latency'
+    start = 0
+    try:
+        start = time.perf_counter()
+        await func(*args, **kwargs)
+    except Exception:
+        pass
+    finally:
+        times[time.perf_counter()-start] += 1
+
+async def _atime_loop(func, args_ser: bytes, kwargs, rounds, times: Counter, concurrency: int = 1, n: int = 1) -> None:
+    '''
+    Await rounds of `concurrency` calls of a coroutine function (n in all, so the last round may be smaller),
+    recording the latency of every call
+    '''
+    args = pickle.loads(args_ser)
+    for i in rounds:
+        await asyncio.gather(*[
+            _atime_call(func, args, kwargs, times) for _ in range(min(concurrency, n - i*concurrency))
+        ])
+
+def _time_chunk(func, args_ser: bytes, kwargs, n: int, times: Counter, concurrency: int = 1,
+                progress: bool = False, disable_gc: bool = False, label: str = '') -> float:
+    'Time n calls of a function or coroutine function, adding to `times`, and return the elapsed time'
+    label = label or func.__name__
+    if isinstance(func, Snippet):
+        iterations = iter(range(min(n, func.n)))
+        with Progress(label, iterations, enabled=progress):
+            start = time.perf_counter()
+            func.sample(args_ser, kwargs, iterations, times)
+            return time.perf_counter() - start
+    with _gc_disabled(disable_gc):
+        if inspect.iscoroutinefunction(func):
+            rounds = iter(range(-(-n // concurrency)))
+            with Progress(label, rounds, per=concurrency, enabled=progress):
+                start = time.perf_counter()
+                _event_loop().run_until_complete(_atime_loop(func, args_ser, kwargs, rounds, times, concurrency, n))
+                return time.perf_counter() - start
+        iterations = iter(range(n))
+        with Progress(label, iterations, enabled=progress):
+            start = time.perf_counter()
+            _time_loop(func, args_ser, kwargs, iterations, times)
+            return time.perf_counter() - start
+
+def _call(func, args_ser: bytes, kwargs) -> object:
+    'Call a function (awaiting it if needed) with a fresh copy of the args, returning the result or exception'
+    try:
+        result = func(*pickle.loads(args_ser), **kwargs)
+        if inspect.isawaitable(result):
+            result = _event_loop().run_until_complete(result)
+    except Exception as e:
+        result = e
+    return result
 
-def timeit_func(func, args, kwargs, expected: object = NoExpectation, n: int = 10_000):
+def timeit_func(func, args, kwargs, expected: object = NoExpectation, n: int = 10_000, progress: bool = False, disable_gc: bool = False,
+                compare: Callable | None = None):
     'Time a function with arguments and return the result, whether it is correct, and the times'
 
     if os.environ.get('DEBUG'):
         pp.ppd({'func': func, 'args': args, 'kwargs': kwargs, 'expected': expected, 'n': n})
 
-    start, times = 0, Counter()
+    times = Counter()
     # some functions may modify the input arguments, so a new copy is needed for every test
     # "pickle" is used instead of "deepcopy" as it's much faster
     args_ser = pickle.dumps(args)
     # ensure that the function module is meaningful (replace it if it's just "__main__")
     set_function_module(func)
-    for _ in range(n):
+    _time_chunk(func, args_ser, kwargs, n, times, progress=progress, disable_gc=disable_gc)
+    result = _call(func, args_ser, kwargs)
+    return result, _check(result, expected, compare), times
+
+def atimeit_func(func, args, kwargs, expected: object = NoExpectation, n: int = 10_000, concurrency: int = 1,
+                 progress: bool = False, disable_gc: bool = False, compare: Callable | None = None):
+    '''
+    Time the awaited execution of a coroutine function, with `concurrency` calls in flight at a time
+    Returns the result, whether it is correct, the per-call latencies, and the throughput (calls/second)
+    '''
+    args_ser = pickle.dumps(args)
+    set_function_module(func)
+    times = Counter()
+    elapsed = _time_chunk(func, args_ser, kwargs, n, times, concurrency, progress, disable_gc)
+    result = _call(func, args_ser, kwargs)
+    return result, _check(result, expected, compare), times, times.total() / elapsed
+
+def _timeit(func, args, kwargs, expected: object = NoExpectation, n: int = 10_000, concurrency: int = 1,
+            progress: bool = False, disable_gc: bool = False, compare: Callable | None = None, verdict: Verdict | None = None) -> Result:
+    '''
+    Time a function or coroutine function, returning a Result
+    - if the function has already been verified, its `verdict` is used instead of calling it again
+    '''
+    if verdict is None:
+        if inspect.iscoroutinefunction(func):
+            return Result(func, *atimeit_func(func, args, kwargs, expected, n, concurrency, progress, disable_gc, compare))
+        return Result(func, *timeit_func(func, args, kwargs, expected, n, progress, disable_gc, compare))
+
+    times = Counter()
+    set_function_module(func)
+    elapsed = _time_chunk(func, pickle.dumps(args), kwargs, n, times, concurrency, progress, disable_gc)
+    throughput = times.total() / elapsed if inspect.iscoroutinefunction(func) else None
+    return Result(func, verdict.result, verdict.correct, times, throughput=throughput)
+
+def _timeit_interleaved(funcs: list, args, kwargs, expected: object = NoExpectation, n: int = 10_000, rounds: int = 10,
+                        concurrency: int = 1, progress: bool = False, disable_gc: bool = False,
+                        compare: Callable | None = None, verdicts: dict | None = None) -> list[Result]:
+    '''
+    Time a group of functions in `rounds` rounds of n/rounds calls each (n in all), shuffling the order of the
+    functions every round, so that drift (e.g. thermal throttling/turbo) is spread evenly across them
+    - functions that have already been verified use their verdict (in `verdicts`) instead of being called again
+    '''
+    args_ser, rng, verdicts = pickle.dumps(args), random.Random(), verdicts or {}
+    times, elapsed = {func: Counter() for func in funcs}, dict.fromkeys(funcs, 0.0)
+    for func in funcs:
+        set_function_module(func)
+    for i in range(rounds):
+        order = list(funcs)
+        rng.shuffle(order)
+        for func in order:
+            elapsed[func] += _time_chunk(
+                func, args_ser, kwargs, n // rounds + (i < n % rounds), times[func], concurrency,
+                progress, disable_gc, label=f'{func.__name__} (round {i+1}/{rounds})',
+            )
+    results = []
+    for func in funcs:
+        if func in verdicts:
+            result, correct = verdicts[func]
+        else:
+            result = _call(func, args_ser, kwargs)
+            correct = _check(result, expected, compare)
+        results.append(Result(
+            func, result, correct, times[func],
+            throughput=times[func].total() / elapsed[func] if inspect.iscoroutinefunction(func) else None,
+        ))
+    return results
+
+def equals(result, expected) -> bool:
+    'The default comparison: equality, or (if an exception class is expected) an exception of that class'
+    if isinstance(expected, type) and issubclass(expected, BaseException):
+        return isinstance(result, expected)
+    return result == expected
+
+def approx(rel_tol: float = 1e-9, abs_tol: float = 0.0) -> Callable:
+    'Compare numbers (or sequences of numbers) within a tolerance, as `math.isclose`'
+    def compare(result, expected) -> bool:
+        if isinstance(expected, (list, tuple)):
+            return isinstance(result, (list, tuple)) and len(result) == len(expected) and all(map(compare, result, expected))
         try:
-            start = time.time()
-            func(*_load_serialised_args(args_ser), **kwargs)
-        except Exception:
-            pass
-        finally:
-            times[time.time()-start] += 1
+            return math.isclose(result, expected, rel_tol=rel_tol, abs_tol=abs_tol)
+        except TypeError:
+            return False
+    return compare
+
+def unordered(result, expected) -> bool:
+    'Compare iterables, ignoring the order of their items (but not how many times each appears)'
     try:
-        result = func(*pickle.loads(args_ser), **kwargs)
+        return Counter(result) == Counter(expected)
+    except TypeError:
+        # unhashable items
+        result, expected = list(result), list(expected)
+        return len(result) == len(expected) and all(result.count(i) == expected.count(i) for i in expected)
+
+def same_exception(result, expected) -> bool:
+    'Compare exceptions by their type and args, e.g. expected=ValueError("bad input")'
+    if isinstance(expected, BaseException):
+        return type(result) is type(expected) and result.args == expected.args
+    return equals(result, expected)
+
+def _check(result, expected, compare: Callable | None = None) -> bool:
+    'Whether a result is correct, where a comparison that raises (e.g. given an exception as the result) is a fail'
+    if expected is NoExpectation:
+        return True
+    try:
+        return bool((compare or equals)(result, expected))
+    except Exception:
+        return False
+
+def _verify_call(func, args, kwargs) -> object:
+    'Call a function, returning the result or exception. Coroutines get their own event loop, as this runs in threads'
+    try:
+        if inspect.iscoroutinefunction(func):
+            return asyncio.run(func(*args, **kwargs))
+        return func(*args, **kwargs)
     except Exception as e:
-        result = e
-    return result, expected is NoExpectation or result == expected, times
+        return e
+
+def verify(tests, func_groups, compare: Callable | None = None, workers: int | None = None, fail_fast: bool = False) -> dict[tuple[int, Callable], Verdict]:
+    '''
+    Check every function against every test in a thread pool before any timing
+    (which only overlaps checks that wait, e.g. on Snippet subprocesses, or that release the GIL),
+    returning a Verdict (the result & whether it's correct) per (test index, function)
+    - `compare(result, expected)` is used to check results, e.g. `approx()`, `unordered`, `same_exception`
+    - `fail_fast` raises a VerificationError at the first failure, cancelling any remaining checks
+    '''
+    tests, verdicts = [Test(*test, n=0) for test in tests], {}
+    with ThreadPoolExecutor(workers) as executor:
+        futures = {
+            # each call gets its own copy of the args, in case they are modified
+            executor.submit(_verify_call, func, pickle.loads(pickle.dumps(test.args)), test.kwargs): (i, func)
+            for i, test in enumerate(tests)
+            for func in chain.from_iterable(func_groups)
+        }
+        for future in as_completed(futures):
+            i, func = futures[future]
+            result = future.result()
+            verdicts[i, func] = Verdict(result, _check(result, tests[i].expected, compare))
+            if fail_fast and not verdicts[i, func].correct:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise VerificationError(
+                    f'{func.__module__}.{func.__name__} failed test {i}: {_truncate(repr(result))}, expected {_truncate(repr(tests[i].expected))}'
+                )
+    return verdicts
+
+# tracing memory is slow, so the memory pass is capped at this many calls
+MEMORY_N = 1_000
+
+def _gc_collections() -> int:
+    'The total number of GC collections (across all generations) so far'
+    return sum(s['collections'] for s in gc.get_stats())
+
+def memit_func(func, args, kwargs, n: int = MEMORY_N) -> MemStats:
+    '''
+    Trace the memory used by a function over n calls, in a separate pass from the timed one
+    - peak:            the highest peak of traced memory (in bytes) reached during a single call
+    - retained_blocks: the mean number of memory blocks still allocated after each call (e.g. the result),
+                       i.e. the net change, not the number of allocations made during it
+    - gc:              the number of GC collections triggered during the pass
+    '''
+    args_ser = pickle.dumps(args)
+    set_function_module(func)
+
+    # block counts are stored in a C array so that the bookkeeping doesn't allocate any ints of its own
+    peak, retained, blocks, collections = 0, 0, array('q', [0, 0]), _gc_collections()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        a = pickle.loads(args_ser)
+        for _ in range(n):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            blocks[0] = sys.getallocatedblocks()
+            try:
+                result = func(*a, **kwargs)
+                if inspect.isawaitable(result):
+                    result = _event_loop().run_until_complete(result)
+            except Exception as e:
+                result = e
+            blocks[1] = sys.getallocatedblocks()
+            retained += blocks[1] - blocks[0]
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+            del result
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return MemStats(peak, retained/n, _gc_collections()-collections)
+
+# profiling is slow, so the profiled pass is capped at this many calls
+PROFILE_N = 1_000
+# the number of (self-time) entries to print for each profiled function
+PROFILE_TOP = 10
+
+def _profile_target(func, args_ser: bytes, kwargs, n: int):
+    'Returns a function that calls `func` n times, with copies of the args made up front (so they are not profiled)'
+    args = [pickle.loads(args_ser) for _ in range(n)]
+    if inspect.iscoroutinefunction(func):
+        async def arun():
+            for a in args:
+                try:
+                    await func(*a, **kwargs)
+                except Exception:
+                    pass
+        return lambda: _event_loop().run_until_complete(arun())
+    def run():
+        for a in args:
+            try:
+                func(*a, **kwargs)
+            except Exception:
+                pass
+    return run
+
+class _StackCollector:
+    '''
+    A `sys.setprofile` hook that accumulates the self-time of every distinct call stack,
+    for writing in the "collapsed" format read by flamegraph tools (e.g. flamegraph.pl, speedscope)
+    '''
+    def __init__(self):
+        self.stacks, self.stack, self.last = Counter(), [], time.perf_counter()
+
+    def __call__(self, frame, event, arg) -> None:
+        now = time.perf_counter()
+        if self.stack:
+            self.stacks[tuple(self.stack)] += now - self.last
+        if event == 'call':
+            self.stack.append(f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}')
+        elif event == 'c_call':
+            self.stack.append(f'{getattr(arg, "__module__", None) or "builtins"}:{getattr(arg, "__qualname__", arg)}')
+        elif self.stack and event in ('return', 'c_return', 'c_exception'):
+            self.stack.pop()
+        self.last = time.perf_counter()
+
+    def write(self, filename: str) -> None:
+        'Write the stacks (without the root frame, i.e. the harness) as "a;b;c <microseconds>" lines'
+        with open(filename, 'w') as f:
+            for stack, t in self.stacks.items():
+                if len(stack) > 1 and (us := round(t*1e6)):
+                    print(';'.join(stack[1:]), us, file=f)
+
+def profile_func(func, args, kwargs, n: int = PROFILE_N, out: str | None = None) -> pstats.Stats:
+    '''
+    Profile a function over n calls with cProfile, in a separate pass from the timed one
+    - if `out` is given, `<out>.pstats` and `<out>.collapsed` (flamegraph stacks, from a second pass) are written
+    '''
+    args_ser = pickle.dumps(args)
+    set_function_module(func)
+
+    profiler = cProfile.Profile()
+    run = _profile_target(func, args_ser, kwargs, n)
+    profiler.runcall(run)
+    stats = pstats.Stats(profiler)
+
+    if out:
+        stats.dump_stats(f'{out}.pstats')
+        collector, run = _StackCollector(), _profile_target(func, args_ser, kwargs, n)
+        sys.setprofile(collector)
+        try:
+            run()
+        finally:
+            sys.setprofile(None)
+        collector.write(f'{out}.collapsed')
+    return stats
+
+def _profile_entries(stats: pstats.Stats) -> list[tuple[str, int, float]]:
+    'The (location, calls, self-time) entries of a profile, sorted by self-time, excluding the profiling harness itself'
+    entries = []
+    for (filename, line, name), (_, calls, tt, _, _) in stats.stats.items():
+        if (filename == __file__ and name in ('run', 'arun', '<lambda>')) or name == "<method 'disable' of '_lsprof.Profiler' objects>":
+            continue
+        location = name if filename == '~' else f'{os.path.basename(filename)}:{line}({name})'
+        entries.append((location, calls, tt))
+    return sorted(entries, key=operator.itemgetter(2), reverse=True)
 
 def _sum_times(times: Counter) -> float:
     'sum the values*counts in a Counter'
@@ -90,6 +702,13 @@ def _avg_times(times: Counter) -> float:
 def _median_times(times: Counter) -> float:
     return statistics.median(list(times.elements()))
 
+def _cv_times(times: Counter) -> float:
+    'The coefficient of variation (stdev/mean) of the times, a measure of how noisy they are'
+    total, mean = times.total(), _avg_times(times)
+    if total < 2 or not mean:
+        return 0.0
+    return math.sqrt(sum(c*(t-mean)**2 for t, c in times.items()) / (total-1)) / mean
+
 TEST_STATUS = {
     False: pp.ps('fail', 'red'),
     True:  pp.ps('pass', 'green'),
@@ -116,13 +735,48 @@ def _format_time(i: float) -> str:
         i = i*10**3
     return f'{i:7.03f} {unit}'
 
+def _format_bytes(i: float) -> str:
+    'Format a size in bytes to a human-readable string, e.g. 2048 -> "2.00 KB"'
+    for unit in ('B ', 'KB', 'MB', 'GB'):
+        if i < 1024:
+            break
+        i = i/1024
+    return f'{i:7.02f} {unit}'
+
+def _format_rate(i: float) -> str:
+    'Format a rate in calls/second to a human-readable string, e.g. 12345 -> "12.35 k/s"'
+    unit = ''
+    for unit in ('', 'k', 'M', 'G'):
+        if i < 1000:
+            break
+        i = i/1000
+    return f'{i:6.02f} {unit:1s}/s'
+
+def _throughput(r: Result) -> float:
+    'The measured throughput of a result, or the inverse of the mean time for synchronous functions'
+    if r.throughput is not None:
+        return r.throughput
+    return r.times.total() / _sum_times(r.times)
+
+# optional result columns, shown after Σ and x̄: name -> (header, formatter)
+COLUMNS = {
+    'cv':       ('cv',       lambda r: f'{_cv_times(r.times):10.1%}' if r.times else '-'),
+    'ops/s':    ('ops/s',    lambda r: _format_rate(_throughput(r)) if r.times else '-'),
+    'peak':     ('peak',     lambda r: _format_bytes(r.mem.peak) if r.mem else '-'),
+    'retained': ('retained', lambda r: f'{r.mem.retained_blocks:10,.1f}' if r.mem else '-'),
+    'gc':       ('gc',       lambda r: f'{r.mem.gc:10,d}' if r.mem else '-'),
+}
+NOISE_COLUMNS = ('cv',)
+MEMORY_COLUMNS = ('peak', 'retained', 'gc')
+ASYNC_COLUMNS = ('ops/s',)
+
 RECORD_SEP = '│'
 BORDER_SEP = '─'
 HEADER_SEP = '┆'
 BORDER_END, BORDER_PATTERN = '★', '-⎽__⎽-⎻⎺⎺⎻'
 
 def gen_border():
-    w = os.get_terminal_size().columns
+    w = _terminal_width()
     n = int(w/len(BORDER_PATTERN))
     r = max(int(n%len(BORDER_PATTERN)/2)-1, 0)
     b = (f'{BORDER_END}{" "*r}{BORDER_PATTERN*n}{" "*r}{BORDER_END}'
@@ -143,30 +797,32 @@ def _print_header(s: str, test: Test) -> None:
         'kwargs':   _truncate(str(test.kwargs)),
     }))
 
-def _print_result_header(width: int=1) -> None:
-    msg = '{funcs:s}{status:<5s} {sep:s} {total:^10s} {sep:s} {median:^10s}'.format(**{
-        'funcs':  f'{"function":<{width}s}'.format('function'),
-        'status': 'status',
-        'total':  'Σ ',
-        'median': 'x̄',
+def _print_result_header(width: int=1, columns: tuple=()) -> None:
+    msg = '{funcs:s}{status:<5s} {sep:s} {total:^10s} {sep:s} {median:^10s}{columns:s}'.format(**{
+        'funcs':   f'{"function":<{width}s}'.format('function'),
+        'status':  'status',
+        'total':   'Σ ',
+        'median':  'x̄',
+        'columns': ''.join(f' {HEADER_SEP} {COLUMNS[c][0]:^10s}' for c in columns),
         'sep':     HEADER_SEP,
     })
     border = BORDER_SEP*len(msg)
     print(msg, border, sep='\n')
 
-def _print_result(func: Callable, result: Any, correct: bool, times: Counter, width: int=1, colour: str='', extra: str='') -> None:
+def _print_result(r: Result, width: int=1, colour: str='', extra: str='', columns: tuple=()) -> None:
     fail_sep, status_msg = '\n', ''
-    if not correct:
-        if os.get_terminal_size().columns >= 100:
+    if not r.correct:
+        if _terminal_width() >= 100:
             fail_sep = ' '
-        result = _truncate(str(result))
+        result = _truncate(str(r.result))
         status_msg = pp.ps(f'{fail_sep}>> {result=}', 'yellow')
 
-    msg = '{func_name:s}{status:<s}   {sep:s} {total:s} {sep:s} {median:s} {extra:s}{status_msg:s}'.format(**{
-        'func_name':  pp.ps(f'{func.__module__+"."+func.__name__+", ":<{width}s}', style=colour),
-        'total':      _format_time(_sum_times(times)),
-        'median':     _format_time(_median_times(times)),
-        'status':     TEST_STATUS[correct],
+    msg = '{func_name:s}{status:<s}   {sep:s} {total:s} {sep:s} {median:s}{columns:s} {extra:s}{status_msg:s}'.format(**{
+        'func_name':  pp.ps(f'{r.func.__module__+"."+r.func.__name__+", ":<{width}s}', style=colour),
+        'total':      _format_time(_sum_times(r.times)) if r.times else f'{"-":^10s}',
+        'median':     _format_time(_median_times(r.times)) if r.times else f'{"-":^10s}',
+        'columns':    ''.join(f' {RECORD_SEP} {COLUMNS[c][1](r):>10s}' for c in columns),
+        'status':     TEST_STATUS[r.correct],
         'extra':      extra,
         'status_msg': status_msg,
         'width':      width+2,
@@ -174,24 +830,108 @@ def _print_result(func: Callable, result: Any, correct: bool, times: Counter, wi
     })
     print(msg)
 
+def _print_profile(r: Result, width: int=1, top: int=PROFILE_TOP) -> None:
+    'Print the top self-time entries of a profiled result, under its result row'
+    entries = _profile_entries(r.profile)
+    total = sum(tt for *_, tt in entries) or 1
+    for location, calls, tt in entries[:top]:
+        print(pp.ps('{pad:s}{sep:s} {tt:s} {sep:s} {pct:5.1f}% {sep:s} {calls:>10,d} calls {sep:s} {location:s}'.format(**{
+            'pad':      ' '*width,
+            'tt':       _format_time(tt),
+            'pct':      100*tt/total,
+            'calls':    calls,
+            'location': _truncate(location, 60),
+            'sep':      RECORD_SEP,
+        }), 'brightblack'))
+
 
-def timeit(n=10_000):
-    'Decorator to time a function'
+def timeit(n=10_000, memory: bool=False, concurrency: int=1, progress: bool=True, disable_gc: bool=False,
+           profile: bool=False, profile_top: int=PROFILE_TOP, profile_dir: str | None=None):
+    '''
+    Decorator to time a function
+    - coroutine functions are awaited in a reused event loop, with `concurrency` calls at a time
+    - `progress` reports the progress of long runs to stderr
+    - `disable_gc` disables the garbage collector during the timed calls
+    - `profile` adds a separate profiled pass, printing the top `profile_top` self-time entries
+      (and writing .pstats & .collapsed files to `profile_dir`, if given)
+    '''
     def decorator_with_args(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            result, correct, times = timeit_func(func, args, kwargs, NoExpectation, n)
-            _print_result(func, result, correct, times)
+            r = _timeit(func, args, kwargs, NoExpectation, n, concurrency, progress, disable_gc)
+            columns = NOISE_COLUMNS + (ASYNC_COLUMNS if inspect.iscoroutinefunction(func) else ())
+            if memory:
+                r, columns = r._replace(mem=memit_func(func, args, kwargs, min(n, MEMORY_N))), columns + MEMORY_COLUMNS
+            if profile:
+                r = r._replace(profile=profile_func(func, args, kwargs, min(n, PROFILE_N), _profile_out(profile_dir, func)))
+            _print_result(r, columns=columns)
+            if profile:
+                _print_profile(r, top=profile_top)
         return wrapper
     return decorator_with_args
 
 
-def bench(tests, func_groups, n: int=10_000, sort: bool=False):
-    'Run a series of timed tests on a list of functions'
+def _profile_out(profile_dir: str | None, func: Callable, i: int | None = None) -> str | None:
+    'The path (without extension) to write the profile of a function to, if profiles are being written'
+    if not profile_dir:
+        return None
+    os.makedirs(profile_dir, exist_ok=True)
+    return os.path.join(profile_dir, '.'.join(map(str, filter(None.__ne__, (func.__module__, func.__name__, i)))))
+
+def bench(tests, func_groups, n: int=10_000, sort: bool=False, memory: bool=False, concurrency: int=1, progress: bool=True,
+          disable_gc: bool=False, cpus: set[int] | None=None, interleave: int=0,
+          profile: bool=False, profile_top: int=PROFILE_TOP, profile_dir: str | None=None, isolated: bool=False,
+          store: str | bool | None=None, suite: str | None=None,
+          compare: Callable | None=None, skip_failed: bool=True, fail_fast: bool=False, verify_workers: int | None=None):
+    '''
+    Run a series of timed tests on a list of functions
+    - `memory` adds a separate traced pass per function, reporting peak memory, retained memory blocks & GC collections
+    - coroutine functions are awaited in a reused event loop, with `concurrency` calls at a time,
+      and the throughput (calls/second) is reported alongside the per-call latency
+    - `progress` reports the progress of long runs to stderr (iterations/second, elapsed time & ETA)
+    - to reduce noise between runs:
+      - `disable_gc` disables the garbage collector during timed calls, collecting between functions
+      - `cpus` pins the process to a set of CPUs (e.g. {2}) for the whole run
+      - `interleave` splits n into this many rounds, running the functions in each group in a random
+        order every round (instead of each to completion)
+      the coefficient of variation (cv) of each result's times is reported as a measure of its noise
+    - `profile` adds a separate profiled pass per function, printing the top `profile_top` self-time
+      entries under its result, and writing .pstats & .collapsed (flamegraph) files to `profile_dir`, if given
+    - Snippets are timed from a cold start, in a fresh interpreter per sample (up to `Snippet.n` samples),
+      and `isolated` times every (importable) function this way, i.e. its first call after import
+    - `store` appends every result to a ResultStore (True for the default path, or a path to a database),
+      under the name `suite` (default: the name of the running script), see `python -m pp.bench history`
+    - before any timing, every function is checked against every test in parallel (see `verify`)
+      - `compare(result, expected)` checks results (default: `equals`), e.g. `approx()`, `unordered`, `same_exception`
+      - `skip_failed` skips timing functions that failed a test, and `fail_fast` raises a VerificationError instead
+    '''
+    if isolated:
+        func_groups = [[f if isinstance(f, Snippet) else Snippet.from_func(f) for f in funcs] for funcs in func_groups]
+    results_store = ResultStore(None if store is True else store) if store else None
+    try:
+        with _pinned(cpus):
+            _bench(
+                tests, func_groups, n, sort, memory, concurrency, progress, disable_gc, interleave, profile, profile_top, profile_dir,
+                results_store, suite or os.path.basename(sys.argv[0]).split('.')[0] or 'bench',
+                compare, skip_failed, fail_fast, verify_workers,
+            )
+    finally:
+        if results_store:
+            results_store.close()
+
+def _bench(tests, func_groups, n: int, sort: bool, memory: bool, concurrency: int, progress: bool, disable_gc: bool, interleave: int,
+           profile: bool, profile_top: int, profile_dir: str | None, store: ResultStore | None, suite: str,
+           compare: Callable | None, skip_failed: bool, fail_fast: bool, verify_workers: int | None):
     s, group_colours = '', ['yellow', 'brightred', 'cyan', 'bold']
+    columns = NOISE_COLUMNS + (MEMORY_COLUMNS if memory else ())
+    if any(map(inspect.iscoroutinefunction, chain.from_iterable(func_groups))):
+        columns = NOISE_COLUMNS + ASYNC_COLUMNS + columns[1:]
 
     if os.environ.get('DEBUG'):
-        pp.ppd({'tests': tests, 'func_groups': func_groups, 'n': n, 'sort': sort}, indent=None)
+        pp.ppd({
+            'tests': tests, 'func_groups': func_groups, 'n': n, 'sort': sort, 'memory': memory, 'concurrency': concurrency,
+            'disable_gc': disable_gc, 'interleave': interleave, 'profile': profile, 'profile_dir': profile_dir,
+        }, indent=None)
     for func_group in func_groups:
         for func in func_group:
             set_function_module(func)
@@ -200,28 +940,397 @@ def bench(tests, func_groups, n: int=10_000, sort: bool=False):
     if 'BENCH_SORT' in os.environ:
         sort = True
 
-    for test in tests:
+    verdicts = verify(tests, func_groups, compare, verify_workers, fail_fast)
+    passed = sum(verdict.correct for verdict in verdicts.values())
+    pp.pps(f'verified: {passed}/{len(verdicts)} passed', 'bold' if passed == len(verdicts) else 'red')
+
+    for i, test in enumerate(tests):
         test, results = Test(*test, n=n), []
         _print_header(s, test)
         pp.pps('results:', 'bold')
-        _print_result_header(width)
+        _print_result_header(width, columns)
         for funcs, group_colour in zip(func_groups, group_colours):
+            timed = [func for func in funcs if verdicts[i, func].correct or not skip_failed]
+            if interleave:
+                interleaved = _timeit_interleaved(
+                    timed, *test, interleave, concurrency, progress, disable_gc, compare, {func: verdicts[i, func] for func in timed},
+                )
+                interleaved = {r.func: r for r in interleaved}
             for func in funcs:
-                result, correct, times = timeit_func(func, *test)
-                _print_result(func, result, correct, times, width, group_colour)
-                results.append((func, result, correct, times, width, group_colour))
+                if func not in timed:
+                    r = Result(func, verdicts[i, func].result, False, Counter())
+                elif interleave:
+                    r = interleaved[func]
+                else:
+                    r = _timeit(func, *test, concurrency, progress, disable_gc, compare, verdicts[i, func])
+
+                if isinstance(r.func, Snippet) or not r.times:
+                    # snippets only run in fresh interpreters, so can't be traced or profiled in this one
+                    pass
+                elif memory:
+                    r = r._replace(mem=memit_func(r.func, test.args, test.kwargs, min(n, MEMORY_N)))
+                if profile and r.times and not isinstance(r.func, Snippet):
+                    r = r._replace(profile=profile_func(
+                        r.func, test.args, test.kwargs, min(n, PROFILE_N), _profile_out(profile_dir, r.func, i),
+                    ))
+                _print_result(r, width, group_colour, columns=columns)
+                if r.profile:
+                    _print_profile(r, width, profile_top)
+                results.append((r, group_colour))
+        if store:
+            store.append(suite, test, [r for r, _ in results if r.times])
         if sort:
             pp.pps('\nsorted by time:', 'bold')
-            _print_result_header(width)
-            base, extra = 0, ''
+            _print_result_header(width, columns)
+            base, base_peak, extra = 0, 0, ''
 
-            for _, results in enumerate(sorted(results, key=lambda r: _median_times(r[3]))):
-                if not results[2]:
-                    continue
+            for r, group_colour in sorted((r for r in results if r[0].correct), key=lambda r: _median_times(r[0].times)):
                 if base == 0:
-                    base = _median_times(results[3])
+                    base = _median_times(r.times)
+                    base_peak = r.mem.peak if r.mem else 0
                 else:
-                    x = _median_times(results[3]) / base
+                    x = _median_times(r.times) / base
                     extra = pp.ps(f' ↓ x{x:.2f}', 'bold')
-                _print_result(*results, extra=extra)
+                    if r.mem and base_peak:
+                        extra += pp.ps(f' mem x{r.mem.peak/base_peak:.2f}', 'bold')
+                _print_result(r, width, group_colour, extra=extra, columns=columns)
         s = '\n'
+
+
+# candidate complexity classes for fitting sweeps: name -> f(n)
+COMPLEXITIES = {
+    'O(1)':       lambda n: 1.0,
+    'O(log n)':   lambda n: math.log(n),
+    'O(n)':       lambda n: float(n),
+    'O(n log n)': lambda n: n*math.log(n),
+    'O(n²)':      lambda n: float(n)**2,
+    'O(n³)':      lambda n: float(n)**3,
+}
+
+def fit_complexity(sizes: list[int], times: list[float]) -> Fit:
+    '''
+    Fit t = const + coef*f(n) for each of the COMPLEXITIES, and return the best fit.
+    Errors are weighted by 1/t² (i.e. relative), so that the largest sizes don't drown out the rest.
+    '''
+    best, best_err = Fit('O(1)', 0.0, statistics.mean(times)), math.inf
+    w = [1/t**2 if t else 1.0 for t in times]
+    for name, f in COMPLEXITIES.items():
+        xs = [f(n) for n in sizes]
+        S, Sx, St = sum(w), sum(map(operator.mul, w, xs)), sum(map(operator.mul, w, times))
+        Sxx = sum(wi*x*x for wi, x in zip(w, xs))
+        Sxt = sum(wi*x*t for wi, x, t in zip(w, xs, times))
+        det = S*Sxx - Sx*Sx
+        if abs(det) <= 1e-12 * S*Sxx:
+            # f(n) is constant over the sizes, so only the constant can be fit
+            coef, const = 0.0, St/S
+        else:
+            coef = (S*Sxt - Sx*St) / det
+            const = (St - coef*Sx) / S
+        if coef < 0 or const < 0:
+            # a negative coefficient means that this isn't the shape of the curve
+            continue
+        if coef and coef*max(xs) < 0.2*max(times):
+            # the growing term barely contributes, so this is just fitting noise around a constant
+            continue
+        err = sum(wi*(t - const - coef*x)**2 for wi, x, t in zip(w, xs, times))
+        # prefer the simpler class when the fits are (almost) equally good
+        if err < best_err * 0.9:
+            best, best_err = Fit(name, coef, const), err
+    return best
+
+def find_crossovers(s1: Sweep, s2: Sweep) -> list[tuple[float, Callable]]:
+    '''
+    Find the sizes where one function overtakes the other, as a list of (size, faster function) pairs.
+    The size is interpolated between the swept sizes, on a log-log scale
+    '''
+    crossovers = []
+    d = [math.log(t1/t2) if t1 and t2 else 0.0 for t1, t2 in zip(s1.medians, s2.medians)]
+    for i in range(len(d)-1):
+        if d[i] == 0 or d[i]*d[i+1] >= 0:
+            continue
+        x0, x1 = math.log(s1.sizes[i]), math.log(s1.sizes[i+1])
+        crossovers.append((
+            math.exp(x0 + (x1-x0) * d[i]/(d[i]-d[i+1])),
+            s1.func if d[i+1] < 0 else s2.func,
+        ))
+    return crossovers
+
+CHART_MARKERS = '●◆▲■○◇△□×+'
+
+def _func_name(func: Callable) -> str:
+    return f'{func.__module__}.{func.__name__}'
+
+def _print_sweep_chart(sweeps: list[Sweep], colours: list[str], width: int = 60, height: int = 16) -> None:
+    'Print an ASCII log-log chart of the median time per size of each sweep'
+    sizes = sweeps[0].sizes
+    times = [t for sw in sweeps for t in sw.medians if t > 0]
+    if len(sizes) < 2 or not times:
+        return
+    # (a flat axis when every size or time is the same)
+    x_lo, x_hi = math.log(min(sizes)), math.log(max(sizes))
+    x_hi = x_hi if x_hi > x_lo else x_lo + 1
+    y_lo, y_hi = math.log(min(times)), math.log(max(times))
+    y_hi = y_hi if y_hi > y_lo else y_lo + 1
+
+    grid = [[' ']*width for _ in range(height)]
+    for sw, colour, marker in zip(sweeps, colours, CHART_MARKERS):
+        for size, t in zip(sw.sizes, sw.medians):
+            if t <= 0:
+                continue
+            x = round((math.log(size)-x_lo) / (x_hi-x_lo) * (width-1))
+            y = round((math.log(t)-y_lo) / (y_hi-y_lo) * (height-1))
+            grid[height-1-y][x] = pp.ps(marker, colour)
+
+    for i, row in enumerate(grid):
+        label = ''
+        if i == 0:
+            label = _format_time(math.exp(y_hi))
+        elif i == height-1:
+            label = _format_time(math.exp(y_lo))
+        print(f'{label:>10s} {RECORD_SEP}{"".join(row)}')
+    print(f'{"":>10s} └{BORDER_SEP*width}')
+    print(f'{"":>10s}  {min(sizes):<{width//2},d}{max(sizes):>{width-width//2},d}')
+    for sw, colour, marker in zip(sweeps, colours, CHART_MARKERS):
+        print(f'{"":>12s}{pp.ps(marker, colour)} {_func_name(sw.func)}')
+
+def sweep(gen: Callable[[int], tuple], func_groups, sizes=(10, 100, 1_000, 10_000), n: int=100, concurrency: int=1, progress: bool=True) -> list[Sweep]:
+    '''
+    Time every function over a range of input sizes, and fit the empirical complexity of each.
+    - `gen(size)` returns the (args, kwargs) to call each function with for that size
+    - prints a table of the median time per size, the crossover points where one function
+      overtakes another, and a log-log chart
+    '''
+    if any(size <= 0 for size in sizes):
+        raise ValueError(f'sweep sizes must be positive (for the log scale), not {list(sizes)}')
+    group_colours = ['yellow', 'brightred', 'cyan', 'bold']
+    funcs, colours = [], []
+    for func_group, group_colour in zip(func_groups, group_colours):
+        for func in func_group:
+            set_function_module(func)
+            funcs.append(func)
+            colours.append(group_colour)
+    width = max(len(_func_name(func))+2 for func in funcs)
+
+    medians = {func: [] for func in funcs}
+    for size in sizes:
+        args, kwargs = gen(size)
+        for func in funcs:
+            medians[func].append(_median_times(_timeit(func, args, kwargs, NoExpectation, n, concurrency, progress).times))
+    sweeps = [Sweep(func, list(sizes), medians[func], fit_complexity(sizes, medians[func])) for func in funcs]
+
+    print(pp.ps(gen_border(), 'brightyellow'))
+    pp.pps(f'\nsweep: n: {n:,d}', 'bold')
+    msg = '{funcs:s}{sizes:s} {sep:s} {complexity:^10s}'.format(**{
+        'funcs':      f'{"function":<{width}s}',
+        'sizes':      ''.join(f' {HEADER_SEP} {size:^10,d}' for size in sizes),
+        'complexity': 'O()',
+        'sep':        HEADER_SEP,
+    })
+    print(msg, BORDER_SEP*len(msg), sep='\n')
+    for sw, colour in zip(sweeps, colours):
+        print('{func_name:s}{times:s} {sep:s} {complexity:s}'.format(**{
+            'func_name':  pp.ps(f'{_func_name(sw.func):<{width}s}', style=colour),
+            'times':      ''.join(f' {RECORD_SEP} {_format_time(t)}' for t in sw.medians),
+            'complexity': pp.ps(f'{sw.fit.complexity:^10s}', 'bold'),
+            'sep':        RECORD_SEP,
+        }))
+
+    crossovers = [
+        (s1, s2, size, faster)
+        for i, s1 in enumerate(sweeps) for s2 in sweeps[i+1:]
+        for size, faster in find_crossovers(s1, s2)
+    ]
+    if crossovers:
+        pp.pps('\ncrossovers:', 'bold')
+        for s1, s2, size, faster in crossovers:
+            slower = s2.func if faster is s1.func else s1.func
+            print(f'  {_func_name(faster)} overtakes {_func_name(slower)} at n ≈ {size:,.0f}')
+
+    print()
+    _print_sweep_chart(sweeps, colours)
+    return sweeps
+
+
+# the default location of the results store, if `store=True`
+BENCH_STORE = os.environ.get('BENCH_STORE', os.path.join('~', '.cache', 'pp', 'bench.db'))
+
+@lru_cache
+def _environment() -> tuple[str, str]:
+    'A short fingerprint of the environment that results were measured in, and the details it was made from'
+    info = json.dumps({
+        'python':    f'{platform.python_implementation()} {platform.python_version()}',
+        'system':    f'{platform.system()} {platform.release()}',
+        'machine':   platform.machine(),
+        'processor': platform.processor(),
+        'cpus':      os.cpu_count(),
+        'host':      platform.node(),
+    }, sort_keys=True)
+    return hashlib.sha1(info.encode()).hexdigest()[:12], info
+
+def _test_key(test: Test) -> str:
+    'The key of a test in the ResultStore: its args, truncated to be readable, and a hash of them in full to tell them apart'
+    s = f'{test.args!r}, {test.kwargs!r}'
+    return f'{_truncate(s, 80)} #{hashlib.sha1(s.encode()).hexdigest()[:12]}'
+
+def _stored_name(func: Callable) -> str:
+    'The name a function is stored under: cold (Snippet) timings are kept apart from the warm ones of the same function'
+    return f'cold:{_func_name(func)}' if isinstance(func, Snippet) else _func_name(func)
+
+class ResultStore:
+    '''
+    A local, append-only store of bench results, in SQLite.
+    Results are keyed by (suite, test, function, environment), with an index over those + time
+    (cold-start results are stored under 'cold:' and the function's name, as a separate series),
+    so that the latest runs of each can be queried without scanning the whole history.
+    '''
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS environments (env TEXT PRIMARY KEY, info TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS results (
+            id      INTEGER PRIMARY KEY,
+            ts      REAL    NOT NULL,
+            suite   TEXT    NOT NULL,
+            test    TEXT    NOT NULL,
+            func    TEXT    NOT NULL,
+            env     TEXT    NOT NULL REFERENCES environments (env),
+            n       INTEGER NOT NULL,
+            median  REAL    NOT NULL,
+            mean    REAL    NOT NULL,
+            cv      REAL    NOT NULL,
+            correct INTEGER NOT NULL,
+            peak    INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS results_key ON results (suite, test, func, env, ts);
+    '''
+
+    def __init__(self, path: str | None = None):
+        self.path = os.path.expanduser(path or BENCH_STORE)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(self.SCHEMA)
+
+    def append(self, suite: str, test: Test, results: list[Result], ts: float | None = None) -> None:
+        'Append the results of a test to the store'
+        env, info = _environment()
+        ts, test_s = time.time() if ts is None else ts, _test_key(test)
+        with self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO environments VALUES (?, ?)', (env, info))
+            self.conn.executemany(
+                'INSERT INTO results (ts, suite, test, func, env, n, median, mean, cv, correct, peak) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (ts, suite, test_s, _stored_name(r.func), env, r.times.total(), _median_times(r.times),
+                     _avg_times(r.times), _cv_times(r.times), r.correct, r.mem.peak if r.mem else None)
+                    for r in results
+                ],
+            )
+
+    def series(self, suite: str | None = None, func: str | None = None, env: str | None = None, last: int = 30) -> dict[tuple, list[tuple[float, float]]]:
+        '''
+        The last `last` (timestamp, median) pairs of every (suite, test, func, env), oldest first.
+        Results can be filtered by suite, env, and func (a substring of the function name)
+        '''
+        rows = self.conn.execute('''
+            SELECT suite, test, func, env, ts, median FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY suite, test, func, env ORDER BY ts DESC) AS i
+                FROM results
+                WHERE correct AND (:suite IS NULL OR suite = :suite) AND (:env IS NULL OR env = :env)
+                    AND (:func IS NULL OR instr(func, :func))
+            )
+            WHERE i <= :last
+            ORDER BY suite, test, func, env, ts
+        ''', {'suite': suite, 'func': func, 'env': env, 'last': last})
+        series = {}
+        for *key, ts, median in rows:
+            series.setdefault(tuple(key), []).append((ts, median))
+        return series
+
+    def close(self) -> None:
+        self.conn.close()
+
+SPARKS = '▁▂▃▄▅▆▇█'
+# ANSI colours for the sparklines, from fastest (green) to slowest (red)
+SPARK_COLOURS = tuple(c.from_ansi(n) for n in (46, 82, 118, 154, 190, 226, 220, 214))
+
+def sparkline(values: list[float]) -> str:
+    'Render values as a coloured sparkline, scaled between their min and max'
+    lo, hi = min(values), max(values)
+    levels = [round((v-lo) / (hi-lo) * (len(SPARKS)-1)) if hi > lo else 0 for v in values]
+    return ''.join(SPARK_COLOURS[i].colorise(SPARKS[i], 'fg') for i in levels)
+
+def find_steps(values: list[float], window: int = 5, threshold: float = 0.1) -> list[tuple[int, float]]:
+    '''
+    Find step changes in a series: the indexes where the median of the next `window` values differs from
+    the median of the previous `window` by more than `threshold`, as (index, ratio) pairs.
+    Nearby candidates are clustered, keeping the largest change (or the middle one, when tied)
+    '''
+    clusters = []
+    for i in range(window, len(values)-window+1):
+        before, after = statistics.median(values[i-window:i]), statistics.median(values[i:i+window])
+        # (a median of 0 has no ratio to the other)
+        if not before or not after or abs(math.log(after/before)) < math.log(1+threshold):
+            continue
+        if clusters and i - clusters[-1][-1][0] < window:
+            clusters[-1].append((i, after/before))
+        else:
+            clusters.append([(i, after/before)])
+    steps = []
+    for cluster in clusters:
+        biggest = max(abs(math.log(ratio)) for _, ratio in cluster)
+        tied = [step for step in cluster if abs(math.log(step[1])) == biggest]
+        steps.append(tied[len(tied)//2])
+    return steps
+
+def print_history(store: ResultStore, suite: str | None = None, func: str | None = None, env: str | None = None,
+                  last: int = 30, window: int = 5, threshold: float = 0.1) -> None:
+    'Print the trend of every stored function as a sparkline, flagging any step changes'
+    series = store.series(suite, func, env, last)
+    if not series:
+        pp.pps(f'no results found in {store.path}', 'yellow')
+        return
+    width = max(len(f'{k[0]}/{k[2]}') for k in series) + 2
+    test = None
+    for (suite, test_s, func, env), points in series.items():
+        if test_s != test:
+            test = test_s
+            print(f'\n{pp.ps("test", "bold")}: {test}')
+        medians = [median for _, median in points]
+        msg = '{name:s} {spark:s}{pad:s} {sep:s} {median:s} {sep:s} {env:s} {steps:s}'.format(**{
+            'name':   pp.ps(f'{suite}/{func}'.ljust(width), 'yellow'),
+            'spark':  sparkline(medians),
+            'pad':    ' '*(last-len(medians)),
+            'median': _format_time(medians[-1]),
+            'env':    env,
+            'steps':  ' '.join(
+                pp.ps(
+                    f'{"▲" if ratio > 1 else "▼"} x{ratio:.2f} @ {time.strftime("%Y-%m-%d", time.localtime(points[i][0]))}',
+                    'red' if ratio > 1 else 'green',
+                )
+                for i, ratio in find_steps(medians, window, threshold)
+            ),
+            'sep':    RECORD_SEP,
+        })
+        print(msg)
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m pp.bench', description='view the history of stored bench results')
+    commands = parser.add_subparsers(dest='command', required=True)
+    history = commands.add_parser('history', help='show the trend of every stored function as a sparkline')
+    history.add_argument('--db', default=None, help=f'the results store (default: {BENCH_STORE})')
+    history.add_argument('--suite', default=None, help='only show this suite')
+    history.add_argument('--func', default=None, help='only show functions with names containing this')
+    history.add_argument('--env', default=None, help='only show this environment fingerprint (default: all)')
+    history.add_argument('--last', type=int, default=30, help='the number of runs to show')
+    history.add_argument('--window', type=int, default=5, help='the number of runs either side of a step change')
+    history.add_argument('--threshold', type=float, default=0.1, help='the relative change that counts as a step')
+    args = parser.parse_args(argv)
+
+    store = ResultStore(args.db)
+    try:
+        print_history(store, args.suite, args.func, args.env, args.last, args.window, args.threshold)
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    main()
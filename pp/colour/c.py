@@ -1,8 +1,15 @@
 'This module contains functions for converting between RGB and ANSI colour codes.'
 
 from __future__ import annotations
+from bisect import bisect_right
 from types import MappingProxyType
-from typing import Literal, TypeAlias, NamedTuple, Any, Tuple
+from typing import Literal, TypeAlias, NamedTuple, Any, Iterable, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # the *_many batch functions fall back to pure python
+    np = None
 
 # Valid components of an RGB tuple.
 _RGB_COMPONENT: TypeAlias = Literal['r', 'g', 'b']
@@ -17,6 +24,15 @@ _RGB_COMPONENT_MULTIPLIER: MappingProxyType[_RGB_COMPONENT, int] = MappingProxyT
 })
 
 
+# The 16 system colours (0-7 standard, 8-15 high intensity), as xterm defines them.
+_SYSTEM_RGB: tuple[tuple[int, int, int], ...] = (
+    (0, 0, 0),       (128, 0, 0),     (0, 128, 0),     (128, 128, 0),
+    (0, 0, 128),     (128, 0, 128),   (0, 128, 128),   (192, 192, 192),
+    (128, 128, 128), (255, 0, 0),     (0, 255, 0),     (255, 255, 0),
+    (0, 0, 255),     (255, 0, 255),   (0, 255, 255),   (255, 255, 255),
+)
+
+
 # component _must_ be one of 'r', 'g', or 'b'
 def _ansi_to_rgb_component(n: int, component: _RGB_COMPONENT) -> int:
     '''
@@ -25,9 +41,11 @@ def _ansi_to_rgb_component(n: int, component: _RGB_COMPONENT) -> int:
 
     n = 16 + (36 * r) + (6 * g) + (1 * b)
     '''
-    if n < 16 or n >= 232:
-        return 0
-        # raise ValueError(f'Invalid ANSI colour code for RGB conversion: {n}')
+    if n < 16:
+        return _SYSTEM_RGB[n][_RGB_COMPONENTS.index(component)] if n >= 0 else 0
+    if n >= 232:
+        # 24 greys, from 8 to 238 in steps of 10
+        return (2056 + 2570 * (n - 232)) // 256 if n < 256 else 0
 
     i = (
         (n - 16)  # 16 is the base value
@@ -41,13 +59,18 @@ def _ansi_to_rgb_component(n: int, component: _RGB_COMPONENT) -> int:
     return (14135 + (10280 * i)) // 256
 
 
+# The RGB tuple of every ANSI colour code, shared by every lookup.
+_ANSI_RGB: tuple[tuple[int, int, int], ...] = tuple(
+    tuple(_ansi_to_rgb_component(n, component) for component in _RGB_COMPONENTS)
+    for n in range(256)
+)
+
+
 def ansi_to_rgb(n: int) -> tuple[int, int, int]:
     'Reverses the rgb_to_ansi formula to calculate an RGB tuple given an ANSI colour code.'
-    return (
-        _ansi_to_rgb_component(n, 'r'),
-        _ansi_to_rgb_component(n, 'g'),
-        _ansi_to_rgb_component(n, 'b'),
-    )
+    if 0 <= n < 256:
+        return _ANSI_RGB[n]
+    return (0, 0, 0)
 
 
 def cube_coords_to_ansi(r: int, g: int, b: int) -> int:
@@ -65,6 +88,68 @@ def cube_coords_to_ansi(r: int, g: int, b: int) -> int:
     )
 
 
+# The 0-255 value at which each component of an RGB tuple rounds up to the next cube level,
+# i.e. the midpoints between the levels 0, 95, 135, 175, 215, 255.
+_CUBE_THRESHOLDS: tuple[int, ...] = (48, 115, 155, 195, 235)
+
+# Lookup tables, indexed by a 0-255 RGB component (the nearest cube level),
+# and by the sum of the components (the nearest of the 24 greys to their mean).
+_CUBE_INDEX: tuple[int, ...] = tuple(bisect_right(_CUBE_THRESHOLDS, v) for v in range(256))
+_GREY_INDEX: tuple[int, ...] = tuple(min(range(24), key=lambda i: abs(3 * (8 + 10*i) - v)) for v in range(766))
+
+
+def rgb_to_ansi(r: int, g: int, b: int) -> int:
+    '''
+    Returns the ANSI colour code of the nearest colour (by RGB distance) in the 6x6x6 cube or grey ramp to an RGB tuple.
+    Euclidean distance is separable, so the nearest cube colour is the nearest level of each component,
+    and the nearest grey is the one nearest to the mean of the components: only those two need comparing.
+    '''
+    cube = 16 + 36*_CUBE_INDEX[r] + 6*_CUBE_INDEX[g] + _CUBE_INDEX[b]
+    grey = 232 + _GREY_INDEX[r + g + b]
+    (cr, cg, cb), (v, _, _) = _ANSI_RGB[cube], _ANSI_RGB[grey]
+    if (r-cr)**2 + (g-cg)**2 + (b-cb)**2 <= (r-v)**2 + (g-v)**2 + (b-v)**2:
+        return cube
+    return grey
+
+
+if np is not None:
+    _ANSI_RGB_NP = np.array(_ANSI_RGB, dtype=np.uint8)
+    # the contribution of each component to the ANSI colour code, which sum to at most 231 (so fit in a uint8)
+    _CUBE_ANSI_NP = tuple(
+        np.array([v * _RGB_COMPONENT_MULTIPLIER[component] for v in _CUBE_INDEX], dtype=np.uint8) + (16 if component == 'r' else 0)
+        for component in _RGB_COMPONENTS
+    )
+    _GREY_ANSI_NP = np.array(_GREY_INDEX, dtype=np.uint8) + 232
+
+
+def ansi_to_rgb_many(codes: Iterable[int]) -> Any:
+    '''
+    Converts many ANSI colour codes (0-255) to RGB tuples in one pass.
+    With numpy, takes an array (of any shape) and returns a uint8 array with an extra axis of size 3,
+    otherwise takes any iterable and returns a list of tuples.
+    '''
+    if np is None:
+        return [_ANSI_RGB[n] for n in codes]
+    return _ANSI_RGB_NP[np.asarray(codes)]
+
+
+def rgb_to_ansi_many(pixels: Iterable[tuple[int, int, int]]) -> Any:
+    '''
+    Converts many RGB tuples (0-255) to the ANSI colour codes of their nearest colours in one pass, as rgb_to_ansi.
+    With numpy, takes an integer array whose last axis has size 3 (e.g. an image of shape (h, w, 3)),
+    and returns a uint8 array without it, otherwise takes any iterable and returns a list of ints.
+    '''
+    if np is None:
+        return [rgb_to_ansi(r, g, b) for r, g, b in pixels]
+    pixels = np.asarray(pixels).astype(np.int32)
+    r, g, b = _CUBE_ANSI_NP
+    cube = r[pixels[..., 0]] + g[pixels[..., 1]] + b[pixels[..., 2]]
+    grey = _GREY_ANSI_NP[pixels.sum(axis=-1)]
+    cube_d = ((pixels - _ANSI_RGB_NP[cube]) ** 2).sum(axis=-1)
+    grey_d = ((pixels - _ANSI_RGB_NP[grey]) ** 2).sum(axis=-1)
+    return np.where(cube_d <= grey_d, cube, grey)
+
+
 # Valid (supported) ANSI styles.
 _ANSI_STYLES: TypeAlias = Literal['fg', 'bg']
 _ANSI_ESCAPE_CODES: MappingProxyType[_ANSI_STYLES, str] = MappingProxyType({
@@ -74,6 +159,12 @@ _ANSI_ESCAPE_CODES: MappingProxyType[_ANSI_STYLES, str] = MappingProxyType({
 
 RESET: str = '\033[0m'
 
+# The fg/bg escape codes of every ANSI colour code.
+_ANSI_ESCAPES: MappingProxyType[_ANSI_STYLES, tuple[str, ...]] = MappingProxyType({
+    style: tuple(f'\033[{escape};{n}m' for n in range(256))
+    for style, escape in _ANSI_ESCAPE_CODES.items()
+})
+
 
 class ANSIColour(NamedTuple):
     'Represents a terminal colour in both RGB and ANSI formats.'
@@ -86,19 +177,36 @@ class ANSIColour(NamedTuple):
 
     def escape_code(self, style: _ANSI_STYLES) -> str:
         'Returns the ANSI escape code for setting the colour.'
+        if 0 <= self.ansi_n < 256:
+            return _ANSI_ESCAPES[style][self.ansi_n]
+        if self.ansi_n < 0:
+            raise ValueError(f'Invalid ANSI colour code: {self.ansi_n}')
+        # not one of the 256 colours, e.g. the blank from_ansi(256)
         return self.__escape(_ANSI_ESCAPE_CODES[style])
 
     def colorise(self, text: Any, style: _ANSI_STYLES = 'bg') -> str:
         'Returns the text with the colour applied.'
+        if 0 <= self.ansi_n < 256:
+            return f'{_ANSI_ESCAPES[style][self.ansi_n]}{text}{RESET}'
         return f'{self.escape_code(style)}{text}{RESET}'
 
 
+# Every ANSI colour, so that each is only created once.
+ANSI_COLOURS: tuple[ANSIColour, ...] = tuple(ANSIColour(ansi_n=n, rgb=_ANSI_RGB[n]) for n in range(256))
+
+
 def from_cube_coords(r: int, g: int, b: int) -> ANSIColour:
     'Creates an ANSIColour from an RGB tuple.'
-    ansi = cube_coords_to_ansi(r, g, b)
-    return ANSIColour(rgb=ansi_to_rgb(ansi), ansi_n=ansi)
+    if not (0 <= r < 6 and 0 <= g < 6 and 0 <= b < 6):
+        raise ValueError(f'Invalid colour cube coordinates (each must be 0-5): {(r, g, b)}')
+    # cube_coords_to_ansi, without the function call
+    return ANSI_COLOURS[16 + 36*r + 6*g + b]
 
 
 def from_ansi(n: int) -> ANSIColour:
     'Creates an ANSIColour from an ANSI colour code.'
+    if 0 <= n < 256:
+        return ANSI_COLOURS[n]
+    if n < 0:
+        raise ValueError(f'Invalid ANSI colour code: {n}')
     return ANSIColour(ansi_n=n, rgb=ansi_to_rgb(n))
@@ -1,71 +1,135 @@
 from __future__ import annotations
+from array import array
+from bisect import bisect_right
+from functools import cached_property, lru_cache
 from itertools import repeat
 from itertools import chain
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from itertools import starmap
-from functools import partial
 import operator
 import os
-import re
+from types import MappingProxyType
 from typing import List, TypeAlias, Iterable, Literal, Iterator, Dict
 
 from pp.colour import c
+from pp.colour.c import np
+from pp.colour.styled import ESCAPES, Styled
+from pp.colour.space import (
+    linear_to_rgb, linear_to_rgb_many, oklab_to_rgb, oklab_to_rgb_many,
+    rgb_to_linear, rgb_to_linear_many, rgb_to_oklab, rgb_to_oklab_many,
+)
 
 Cell: TypeAlias = c.ANSIColour
 Row = List[Cell]
 
+_NO_SEP = Styled('')
+
 
-@dataclass
 class Face:
-    rows: List[Row]
-    with_rotations: bool = True
-    rotations: List[Face] = field(default_factory=list)
-    flipped_rotations: List[Face] = field(default_factory=list)
+    '''
+    A square grid of ANSI colours, stored as a flat array of their codes (an array('H'), as the blank colour is 256).
+    Rotations and flips are views that share the array, and index into it through an affine transform,
+    i.e. (row i, column j) -> offset + i*row_step + j*col_step, each made when first needed.
+    '''
+    __slots__ = ('codes', 'width', 'offset', 'row_step', 'col_step', '_views')
 
-    def __post_init__(self):
-        if self.with_rotations:
-            self.rotations = [Face._rot90(
-                self.rows, n, flip=False) for n in range(4)]
-            self.flipped_rotations = [Face._rot90(
-                self.rows, n, flip=True) for n in range(4)]
+    def __init__(self, rows: Iterable[Iterable[Cell]] = (), codes: array | None = None, width: int | None = None):
+        if codes is None:
+            rows = [list(row) for row in rows]
+            codes, width = array('H', [cell.ansi_n for row in rows for cell in row]), len(rows)
+        self.codes, self.width = codes, width
+        self.offset, self.row_step, self.col_step = 0, width, 1
+        self._views: dict[tuple[int, bool], Face] | None = None
 
     @staticmethod
-    def _rot90(rows: List[Row], n: int = 1, flip: bool = False) -> Face:
-        'Rotate a matrix 90 degrees, n times, optionally flipped'
-        if flip:
-            rows = list(reversed(rows))
-        for _ in range(n):
-            rows = list(zip(*rows[::-1]))
-        return Face(rows, with_rotations=False)
+    def _view(codes: array, width: int, offset: int, row_step: int, col_step: int) -> Face:
+        'Creates a face that indexes (but doesn\'t copy) codes'
+        face = Face(codes=codes, width=width)
+        face.offset, face.row_step, face.col_step = offset, row_step, col_step
+        return face
 
     def rot90(self, n: int = 1, flip: bool = False) -> Face:
         'Rotate a matrix 90 degrees, n times, optionally flipped'
-        if flip:
-            return self.flipped_rotations[n]
-        return self.rotations[n]
+        key = (n % 4, flip)
+        if self._views is None:
+            self._views = {}
+        elif key in self._views:
+            return self._views[key]
+
+        w = self.width
+        def index(i: int, j: int) -> int:
+            # the rotated (clockwise) cell (i, j) was (w-1-j, i), and a flip reverses the rows
+            for _ in range(key[0]):
+                i, j = w - 1 - j, i
+            if flip:
+                i = w - 1 - i
+            return self.offset + i*self.row_step + j*self.col_step
+
+        offset = index(0, 0)
+        view = self._views[key] = Face._view(self.codes, w, offset, index(1, 0) - offset, index(0, 1) - offset)
+        return view
+
+    def _line(self, start: int, step: int) -> array:
+        'The w codes from start, every step'
+        stop = start + step*self.width
+        return self.codes[start:stop if stop >= 0 else None:step]
+
+    def row_codes(self, i: int) -> array:
+        'The ANSI codes of a row'
+        return self._line(self.offset + (i % self.width)*self.row_step, self.col_step)
+
+    def _key(self) -> bytes:
+        'The codes of the face as they are now, row by row (whatever the view), e.g. to cache what\'s made from them'
+        return b''.join([self.row_codes(i).tobytes() for i in range(self.width)])
+
+    def edge(self, side: Literal['ts', 'bs', 'lhs', 'rhs']) -> tuple[int, ...]:
+        'The ANSI codes along an edge: the top/bottom row (left-to-right), or the left/right column (top-to-bottom)'
+        if side == 'ts':
+            return tuple(self.row_codes(0))
+        if side == 'bs':
+            return tuple(self.row_codes(-1))
+        if side == 'lhs':
+            return tuple(self._line(self.offset, self.row_step))
+        if side == 'rhs':
+            return tuple(self._line(self.offset + (self.width - 1)*self.col_step, self.row_step))
+        raise ValueError(f'Invalid edge: {side}')
 
-    def __iter__(self) -> Iterator[Row]:
-        yield from self.rows
+    @property
+    def rows(self) -> List[Row]:
+        return list(self)
 
-    def __next__(self) -> Row:
-        return next(self.__iter__())
+    def __iter__(self) -> Iterator[Row]:
+        for i in range(self.width):
+            yield self[i]
 
     def __getitem__(self, i: int) -> Row:
-        return self.rows[i]
+        return [c.from_ansi(n) for n in self.row_codes(i)]
+
+    def __repr__(self) -> str:
+        return f'Face({[list(self.row_codes(i)) for i in range(self.width)]})'
+
+    def __eq__(self, other: object) -> bool:
+        'Faces are equal if they have the same colours in the same places (whether or not they are views)'
+        if not isinstance(other, Face):
+            return NotImplemented
+        return self.width == other.width and self._key() == other._key()
+
+    # (their codes can be changed in place, so faces aren't hashable)
+    __hash__ = None
 
     @staticmethod
     def empty_face(width: int = 6) -> Face:
-        return Face([[c.from_ansi(256)] * width] * width)
+        return Face(codes=array('H', [256]) * (width*width), width=width)
+
+    def row_widths(self, cell_width: int = 15) -> tuple[int, ...]:
+        'The visible width of each row of iter_s, where a cell is as wide as its RGB text if that\'s wider'
+        return tuple(_row_width(self.row_codes(i).tobytes(), cell_width) for i in range(self.width))
 
-    def iter_s(self, padding_top: int = 0, padding_bottom: int = 0, cell_width: int = 15) -> Iterable[str]:
-        for row in self.__iter__():
-            p = [cell.colorise(' '*cell_width) for cell in row]
-            # r = [cell.colorise(f'{cell.ansi_n:^{cell_width}}') for cell in row]
-            r = [cell.colorise(f'{str(cell.rgb):^{cell_width}}')
-                 for cell in row]
+    def str_width(self, cell_width: int = 15) -> int:
+        return max(self.row_widths(cell_width))
 
-            for row in chain(repeat(p, padding_top), [r], repeat(p, padding_bottom)):
-                yield ''.join(row)
+    def iter_s(self, padding_top: int = 0, padding_bottom: int = 0, cell_width: int = 15) -> Iterable[Styled]:
+        return iter(_render_face(self._key(), self.width, padding_top, padding_bottom, cell_width))
 
     def print(self, padding_top: int = 0, padding_bottom: int = 0, cell_width: int = 6) -> None:
         'Print the face, with optional cell padding top/bottom to make it more "square"'
@@ -73,12 +137,37 @@ class Face:
         print('\n'.join(self.iter_s(padding_top, padding_bottom, cell_width)))
 
 
-ANSI_COLOURS = re.compile(r"""
-    \x1b     # literal ESC
-    \[       # literal [
-    [;\d]*   # zero or more digits or semicolons
-    [A-Za-z] # a letter
-    """, re.VERBOSE)
+ANSI_COLOURS = ESCAPES
+
+
+@lru_cache(maxsize=4096)
+def _render_row(codes: tuple[int, ...], cell_width: int) -> tuple[Styled, Styled]:
+    'The padding and RGB text lines of a row of cells, shared by every face (or rotation) with the same row'
+    row = [c.from_ansi(n) for n in codes]
+    p = Styled(''.join([cell.colorise(' '*cell_width) for cell in row]), cell_width * len(row))
+    # r = [cell.colorise(f'{cell.ansi_n:^{cell_width}}') for cell in row]
+    text = [f'{str(cell.rgb):^{cell_width}}' for cell in row]
+    r = Styled(''.join([cell.colorise(t) for cell, t in zip(row, text)]), sum(map(len, text)))
+    return p, r
+
+
+@lru_cache(maxsize=4096)
+def _row_width(codes: bytes, cell_width: int) -> int:
+    'The visible width of a row of cells (the bytes of their codes)'
+    return sum(max(cell_width, len(str(c.ansi_to_rgb(n)))) for n in array('H', codes))
+
+
+@lru_cache(maxsize=1024)
+def _render_face(codes: bytes, width: int, padding_top: int, padding_bottom: int, cell_width: int) -> tuple[Styled, ...]:
+    '''
+    The lines of a face (see Face._key), rendered once per face and arguments (while they are among the most recently used)
+    It's keyed on the codes rather than the face, as they can be changed in place.
+    '''
+    codes, lines = array('H', codes), []
+    for i in range(width):
+        p, r = _render_row(tuple(codes[i*width:(i+1)*width]), cell_width)
+        lines.extend(chain(repeat(p, padding_top), [r], repeat(p, padding_bottom)))
+    return tuple(lines)
 
 
 @dataclass
@@ -98,16 +187,20 @@ class Faces:
             for row in zip(*face_row):
                 yield row
 
-    def iter_s(self, padding_top: int = 0, padding_bottom: int = 0, cell_width: int = 6) -> Iterable[str]:
+    def iter_s(self, padding_top: int = 0, padding_bottom: int = 0, cell_width: int = 6) -> Iterable[Styled]:
         for face_row in self.faces:
             for row in zip(*[face.iter_s(padding_top, padding_bottom, cell_width) for face in face_row]):
-                yield ''.join(row)
+                yield _NO_SEP.join(row)
+
+    def str_width(self, cell_width: int = 6) -> int:
+        'The visible width of the widest line of iter_s'
+        return max(
+            max(map(sum, zip(*[face.row_widths(cell_width) for face in face_row])), default=0)
+            for face_row in self.faces
+        )
 
     def as_str(self, padding_top: int = 0, padding_bottom: int = 0, cell_width: int = 6) -> str:
-        s = ''
-        for row in self.iter_s(padding_top, padding_bottom, cell_width):
-            s += row + '\n'
-        return s
+        return ''.join([f'{row}\n' for row in self.iter_s(padding_top, padding_bottom, cell_width)])
 
     def print(self, padding_top: int = 0, padding_bottom: int = 0, cell_width: int = 6) -> None:
         'Print the faces of the cube, with optional cell padding top/bottom to make it more "square"'
@@ -122,26 +215,97 @@ def distance(c1: tuple[int, int, int], c2: tuple[int, int, int]) -> float:
 # r = interp_xyz(c1, c2, 20)
 
 
-def lerp(v0: float, v1: float, t: int) -> float:
+def lerp(v0: float, v1: float, t: float) -> float:
     '''
     Precise method for iterpolation, which guarantees v = v1 when t = 1.
     This method is monotonic only when v0 * v1 < 0.
     Lerping between same values might not produce the same value
     (from: https://en.wikipedia.org/wiki/Linear_interpolation#Programming_language_support)
     '''
-    return round((1 - (t/10)) * v0 + (t/10) * v1, 2)
+    return (1 - t) * v0 + t * v1
 
 
 def interp(v0: float, v1: float, n_t: int) -> list[float]:
-    i = partial(lerp, v0, v1)
-    ts = list(map(lambda x: x/((n_t-1)/10), range(0, n_t)))
-    return list(map(i, ts))
+    'Returns n_t values evenly spaced from v0 to v1 (inclusive)'
+    if n_t == 1:
+        return [v0]
+    return [lerp(v0, v1, i / (n_t - 1)) for i in range(n_t)]
 
 
 def interp_xyz(c1: tuple[int, int, int], c2: tuple[int, int, int], n_t: int) -> list[float]:
     return list(zip(*starmap(interp, zip(c1, c2, repeat(n_t)))))
 
 
+Space: TypeAlias = Literal['srgb', 'linear', 'oklab']
+# Converters to/from each space that gradients can be interpolated in: many (with numpy) and one at a time.
+_SPACES = {
+    'srgb':   ((lambda rgb: np.asarray(rgb, dtype=np.float64), lambda v: np.rint(np.clip(v, 0, 255)).astype(np.uint8)),
+               (lambda *rgb: rgb, lambda *v: tuple(round(min(max(i, 0), 255)) for i in v))),
+    'linear': ((rgb_to_linear_many, linear_to_rgb_many), (rgb_to_linear, linear_to_rgb)),
+    'oklab':  ((rgb_to_oklab_many, oklab_to_rgb_many), (rgb_to_oklab, oklab_to_rgb)),
+}
+
+
+def gradient(stops: Iterable[tuple[int, int, int]], k: int, space: Space = 'oklab',
+             positions: Iterable[float] | None = None) -> tuple[tuple[int, int, int], ...]:
+    '''
+    Returns k RGB colours evenly sampled along a gradient through the RGB colour stops, from the first to the last
+    - `space` is the colour space to interpolate in: 'oklab' (perceptually even), 'linear' (light), or 'srgb' (naive)
+    - `positions` are the positions of the stops (increasing, from 0 to 1), which are evenly spaced by default
+    Gradients are cached by their arguments, as e.g. progress bars & heatmaps generate the same ones every frame.
+    '''
+    stops = tuple(map(tuple, stops))
+    positions = tuple(positions) if positions is not None else tuple(i / max(len(stops) - 1, 1) for i in range(len(stops)))
+    if not stops or k < 1:
+        raise ValueError(f'Invalid gradient: {len(stops)} stops, {k} samples')
+    if len(positions) != len(stops) or any(p1 < p0 for p0, p1 in zip(positions, positions[1:])):
+        raise ValueError(f'Invalid positions for {len(stops)} stops: {positions}')
+    if space not in _SPACES:
+        raise ValueError(f'Invalid space: {space}')
+    return _gradient(stops, k, space, positions)
+
+
+@lru_cache(maxsize=256)
+def _gradient(stops: tuple[tuple[int, int, int], ...], k: int, space: Space, positions: tuple[float, ...]) -> tuple[tuple[int, int, int], ...]:
+    ts = [i / (k - 1) if k > 1 else 0.0 for i in range(k)]
+    if np is not None:
+        to_space, from_space = _SPACES[space][0]
+        values = to_space(stops)
+        # np.interp is piecewise-linear between the stops (and clamps outside them), one axis at a time
+        samples = np.stack([np.interp(ts, positions, values[:, axis]) for axis in range(3)], axis=-1)
+        return tuple(map(tuple, from_space(samples).tolist()))
+
+    to_space, from_space = _SPACES[space][1]
+    values, samples = [to_space(*stop) for stop in stops], []
+    for t in ts:
+        t = min(max(t, positions[0]), positions[-1])
+        i = min(bisect_right(positions, t), len(positions) - 1)
+        p0, p1 = positions[i - 1] if i else positions[0], positions[i]
+        u = (t - p0) / (p1 - p0) if p1 > p0 else 0.0
+        v0 = values[i - 1] if i else values[0]
+        samples.append(from_space(*(lerp(a, b, u) for a, b in zip(v0, values[i]))))
+    return tuple(samples)
+
+
+# Each edge of a face, and the edge of the face it joins
+OPPOSITE_EDGES = MappingProxyType({'ts': 'bs', 'bs': 'ts', 'lhs': 'rhs', 'rhs': 'lhs'})
+# (edge type, edge codes) -> every (cube name, face rotation/flip) with that edge, in the order they are searched
+EdgeIndex: TypeAlias = Dict[tuple[str, tuple[int, ...]], List[tuple[str, Face]]]
+
+
+def _edge_index(cubes: Dict[str, RGBCube]) -> EdgeIndex:
+    'Index every edge of every face of the cubes, under each of the 8 rotations/flips'
+    index = {}
+    for name, cube in cubes.items():
+        for face in cube.faces:
+            for rot in range(4):
+                for flip in (False, True):
+                    view = face.rot90(rot, flip=flip)
+                    for edge_type in OPPOSITE_EDGES:
+                        index.setdefault((edge_type, view.edge(edge_type)), []).append((name, view))
+    return index
+
+
 @dataclass
 class RGBCube:
     faces: Faces
@@ -152,33 +316,20 @@ class RGBCube:
 
     @property
     def str_width(self) -> int:
-        return max(len(ANSI_COLOURS.sub('', line)) for line in self.faces.iter_s())
+        return self.faces.str_width()
 
     @staticmethod
     def compare_rows(r1: Row, r2: Row) -> bool:
         return all(c1 == c2 for c1, c2 in zip(r1, r2))
 
+    @cached_property
+    def edge_index(self) -> EdgeIndex:
+        return _edge_index({None: self})
+
     def find_face_with_edge(self, face: Face, edge_type: str = 'ts') -> Face:
-        if edge_type == 'ts':
-            edge = face[0]
-        elif edge_type == 'bs':
-            edge = face[-1]
-        elif edge_type == 'lhs':
-            edge = [r[0] for r in face]
-        elif edge_type == 'rhs':
-            edge = [r[-1] for r in face]
-
-        for face in self.faces:
-            for rot in range(4):
-                for flip in (False, True):
-                    if edge_type == 'ts' and RGBCube.compare_rows(face.rot90(rot, flip=flip)[-1], edge):
-                        return face.rot90(rot, flip=flip)
-                    elif edge_type == 'bs' and RGBCube.compare_rows(face.rot90(rot, flip=flip)[0], edge):
-                        return face.rot90(rot, flip=flip)
-                    elif edge_type == 'lhs' and RGBCube.compare_rows([r[-1] for r in face.rot90(rot, flip=flip)], edge):
-                        return face.rot90(rot, flip=flip)
-                    elif edge_type == 'rhs' and RGBCube.compare_rows([r[0] for r in face.rot90(rot, flip=flip)], edge):
-                        return face.rot90(rot, flip=flip)
+        'Find a rotation/flip of one of the faces, whose opposite edge matches the edge of the face'
+        for _, view in self.edge_index.get((OPPOSITE_EDGES[edge_type], face.edge(edge_type)), ()):
+            return view
 
     @staticmethod
     def from_ranges(c1: Literal[c._RGB_COMPONENT], c2: c._RGB_COMPONENT, c3: c._RGB_COMPONENT) -> RGBCube:
@@ -191,15 +342,12 @@ class RGBCube:
         '''
         faces = []
         for r1 in range(6):
-            face = []
-            for r2 in range(6):
-                row = []
-                for r3 in range(6):
-                    row.append(
-                        c.from_cube_coords(**{c1: r1, c2: r2, c3: r3})
-                    )
-                face.append(row)
-            faces.append([Face(face)])
+            codes = array('H', [
+                c.cube_coords_to_ansi(**{c1: r1, c2: r2, c3: r3})
+                for r2 in range(6)
+                for r3 in range(6)
+            ])
+            faces.append([Face(codes=codes, width=6)])
         return RGBCube(Faces(faces))
 
 
@@ -210,30 +358,36 @@ class RGBCubeCollection:
     def __post_init__(self):
         self.width = os.get_terminal_size().columns
 
+    @cached_property
+    def edge_index(self) -> EdgeIndex:
+        'The edges of the faces of all the cubes, built when first searched (so cubes shouldn\'t change after)'
+        return _edge_index(self.cubes)
+
     def print(self, grid_sep: str = ' '*2, padding_top: int = 0, padding_bottom: int = 0, cell_width: int = 6) -> None:
+        widths = {name: cube.faces.str_width(cell_width) for name, cube in self.cubes.items()}
         groups, current_group, current_width = [], {}, 0
         for name, cube in self.cubes.items():
-            if sum(c.str_width for c in current_group.values()) + cube.str_width <= self.width:
+            if current_width + widths[name] <= self.width:
                 current_group[name] = cube
+                current_width += widths[name]
             else:
                 groups.append(current_group)
-                current_group = {name: cube}
+                current_group, current_width = {name: cube}, widths[name]
         groups.append(current_group)
 
+        # built up and printed at once, rather than a line at a time
+        lines = []
         for g in groups:
-            for name, c in g.items():
-                print(f'{name:<{c.str_width}s}', end=grid_sep)
-            print()
+            lines.append(''.join(f'{name:<{widths[name]}s}{grid_sep}' for name in g))
             for rows in zip(*[c.faces.iter_s(padding_top, padding_bottom, cell_width) for n, c in g.items()]):
-                print(grid_sep.join(rows))
+                lines.append(grid_sep.join(rows))
+        print('\n'.join(lines))
 
 def find_face_with_edge(collection: RGBCubeCollection, face_name: str, face: Face, edge_type: str) -> Face:
-    for n, cube in collection.cubes.items():
-        if n == face_name:
-            continue
-        f = cube.find_face_with_edge(face, edge_type)
-        if f:
-            return f, n
+    'Find a rotation/flip of a face in any other cube, whose opposite edge matches the edge of the face'
+    for n, view in collection.edge_index.get((OPPOSITE_EDGES[edge_type], face.edge(edge_type)), ()):
+        if n != face_name:
+            return view, n
 
 
 def create_cube(f1, f1_name, cube_collection):
@@ -257,7 +411,8 @@ def create_cube(f1, f1_name, cube_collection):
     print(f'c1: {c1}, c2: {c2}')
 
     g = interp_xyz(c1, c2, 10)
-    for r, g, b in g:
+    # (shown to 2 decimal places, as lerp once rounded them)
+    for r, g, b in (tuple(round(v, 2) for v in rgb) for rgb in g):
         print(
             '\033[48;5;{};{};{}m'.format(
                 int(r), int(g), int(b)
@@ -0,0 +1,191 @@
+'''
+Previews images in the terminal: PPM (P6), PGM (P5), and raw RGB/grey buffers.
+
+    image.render('photo.ppm')                              # fit to the terminal, 256 colours
+    image.render('photo.ppm', columns=120, mode='truecolour')
+    image.render(image.Image(buf, 640, 480))               # a raw RGB buffer (or mmap)
+
+Files are memory-mapped, and read a band of rows at a time, so large images are never loaded whole.
+Each band is downsampled with a box filter (the average of each block of pixels), then each character cell
+shows two pixels, as an upper half block (▀) with the top pixel as its fg and the bottom pixel as its bg,
+rendered with coalesced escapes (see pp.colour.render) and written once per band.
+'''
+
+from __future__ import annotations
+import mmap
+import os
+import shutil
+import sys
+from typing import IO, Any, Iterator
+
+from pp.colour import c, render as _render
+from pp.colour.c import np
+from pp.colour.quantise import quantiser
+
+UPPER_HALF_BLOCK = '▀'
+# the number of lines (2 rows of pixels each) rendered per band
+BAND_LINES = 32
+
+
+class Image:
+    '''
+    An 8-bit RGB (or grey) image, backed by any buffer (e.g. bytes or an mmap) of rows of pixels from `offset`.
+    Samples run from 0 to `maxval` (which is scaled to 255 when the image is downsampled).
+    Use Image.open to memory-map a PPM/PGM file, and close it (or use it as a context manager) when done.
+    '''
+
+    def __init__(self, buf: Any, width: int, height: int, channels: int = 3, offset: int = 0, maxval: int = 255):
+        if channels not in (1, 3):
+            raise ValueError(f'Invalid channels: {channels}')
+        if not 0 < maxval <= 255:
+            raise ValueError(f'Only 8-bit images are supported, not maxval {maxval}')
+        if len(buf) - offset < width * height * channels:
+            raise ValueError(f'Buffer too small for a {width}x{height}x{channels} image')
+        self.buf, self.width, self.height, self.channels, self.offset = buf, width, height, channels, offset
+        self.maxval = maxval
+        self._file = None
+
+    @staticmethod
+    def open(path: str, width: int | None = None, height: int | None = None, channels: int = 3) -> Image:
+        'Memory-map a PPM/PGM file, or a raw file of pixels if the width and height are given'
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if width is not None and height is not None:
+            image = Image(buf, width, height, channels)
+        else:
+            image = Image(buf, *_parse_header(buf))
+        image._file = buf
+        return image
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> Image:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def rows(self, start: int, stop: int) -> memoryview:
+        'The bytes of rows [start, stop), without copying'
+        row = self.width * self.channels
+        return memoryview(self.buf)[self.offset + start*row:self.offset + stop*row]
+
+
+def _parse_header(buf: Any) -> tuple[int, int, int, int, int]:
+    'Parse a binary PPM/PGM header, returning the width, height, channels, offset of the pixels, and maxval'
+    magic = bytes(buf[:2])
+    if magic not in (b'P6', b'P5'):
+        raise ValueError(f'Not a binary PPM/PGM file: {magic!r}')
+    fields, i = [], 2
+    while len(fields) < 3:
+        while buf[i:i+1].isspace():
+            i += 1
+        if buf[i:i+1] == b'#':
+            # comments run to the end of the line
+            while buf[i:i+1] not in (b'\n', b''):
+                i += 1
+            continue
+        start = i
+        while buf[i:i+1].isdigit():
+            i += 1
+        if start == i:
+            raise ValueError(f'Invalid PPM/PGM header at byte {i}')
+        fields.append(int(buf[start:i]))
+    width, height, maxval = fields
+    if not 0 < maxval <= 255:
+        raise ValueError(f'Only 8-bit images are supported, not maxval {maxval}')
+    # a single whitespace character separates the header from the pixels
+    return width, height, 3 if magic == b'P6' else 1, i + 1, maxval
+
+
+def _bounds(n: int, size: int) -> list[int]:
+    'The edges of n (nearly) equal blocks covering size pixels'
+    return [i * size // n for i in range(n + 1)]
+
+
+def _downsample(image: Image, columns: int, height: int, band_lines: int) -> Iterator[Any]:
+    '''
+    Box filter the image to columns x height pixels, yielding bands of (up to) 2*band_lines rows:
+    uint8 arrays of shape (rows, columns, 3) with numpy, otherwise lists of rows of RGB tuples
+    Samples are scaled from 0-maxval to 0-255 as they are averaged.
+    '''
+    xs, ys, ch, maxval = _bounds(columns, image.width), _bounds(height, image.height), image.channels, image.maxval
+    for band in range(0, height, 2 * band_lines):
+        band_ys = ys[band:band + 2*band_lines + 1]
+
+        if np is not None:
+            with image.rows(band_ys[0], band_ys[-1]) as rows:
+                pixels = np.frombuffer(rows, dtype=np.uint8).reshape(-1, image.width, ch)
+                # sum each block of columns, then each block of rows, and divide by the size of the blocks
+                sums = np.add.reduceat(pixels, xs[:-1], axis=1, dtype=np.uint32)
+                # (the view of the buffer must be gone before it's released)
+                del pixels
+            sums = np.add.reduceat(sums, [y - band_ys[0] for y in band_ys[:-1]], axis=0)
+            sizes = np.outer(np.diff(band_ys), np.diff(xs))[..., None]
+            if maxval != 255:
+                # sum*255 / (size*maxval), in 64 bits as sum*255 can overflow 32
+                sums, sizes = sums.astype(np.int64) * 255, sizes * maxval
+            averages = ((sums + sizes // 2) // sizes).astype(np.uint8)
+            yield np.repeat(averages, 3, axis=2) if ch == 1 else averages
+            continue
+
+        with image.rows(band_ys[0], band_ys[-1]) as rows:
+            rows, width, pixels = rows.tobytes(), image.width * ch, []
+        for y0, y1 in zip(band_ys, band_ys[1:]):
+            block_rows = [rows[(y - band_ys[0]) * width:(y - band_ys[0] + 1) * width] for y in range(y0, y1)]
+            row = []
+            for x0, x1 in zip(xs, xs[1:]):
+                size = (y1 - y0) * (x1 - x0) * maxval
+                # the sum of a channel in a block is the sum of strided slices of its rows (scaled by 255/maxval)
+                v = [
+                    (sum(sum(r[x0*ch + i:x1*ch:ch]) for r in block_rows) * 255 + size // 2) // size
+                    for i in range(ch)
+                ]
+                row.append((v[0], v[1], v[2]) if ch == 3 else (v[0], v[0], v[0]))
+            pixels.append(row)
+        yield pixels
+
+
+def _colours(band: Any, mode: _render.Mode, metric: str) -> list[list]:
+    'The colours of each pixel in a band, as the Renderer takes them'
+    if mode == 'truecolour':
+        if np is not None:
+            return [list(map(tuple, row)) for row in band.tolist()]
+        return band
+    if metric == 'oklab':
+        q = quantiser('oklab')
+        return q.many(band).tolist() if np is not None else [q.many(row) for row in band]
+    if np is not None:
+        return c.rgb_to_ansi_many(band).tolist()
+    return [c.rgb_to_ansi_many(row) for row in band]
+
+
+def render(image: Image | str, columns: int | None = None, mode: _render.Mode = '256', metric: str = 'rgb',
+           out: IO[str] | None = None, band_lines: int = BAND_LINES) -> None:
+    '''
+    Render an image (or a PPM/PGM file) to the terminal, `columns` wide (default: the width of the terminal)
+    - `mode` is '256' or 'truecolour', and 256 colours are quantised by 'rgb' or (perceptual) 'oklab' `metric`
+    - `band_lines` is the number of lines read, downsampled and written at a time
+    '''
+    if isinstance(image, (str, os.PathLike)):
+        with Image.open(image) as image:
+            return render(image, columns, mode, metric, out, band_lines)
+
+    out = out or sys.stdout
+    columns = min(columns or shutil.get_terminal_size().columns, image.width)
+    # pixels are square (two to a character cell), so the height scales with the width
+    height = max(round(image.height * columns / image.width), 1)
+
+    renderer = _render.Renderer(mode)
+    for band in _downsample(image, columns, height, band_lines):
+        colours = _colours(band, mode, metric)
+        lines = []
+        for top, bottom in zip(colours[::2], colours[1::2] + [None]):
+            lines.append(renderer.render_line(zip(
+                [UPPER_HALF_BLOCK] * columns, top, bottom or [None] * columns,
+            )))
+        out.write('\n'.join(lines) + '\n')
+    out.flush()
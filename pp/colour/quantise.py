@@ -0,0 +1,127 @@
+'''
+Quantises arbitrary (truecolour) RGB colours to the nearest xterm-256 colour, by RGB or perceptual (OKLab, see pp.colour.space) distance.
+
+    q = quantise.quantiser('oklab')
+    q(255, 128, 0)   # -> 208
+    q.many(image)    # (h, w, 3) uint8 array -> (h, w) uint8 array of ANSI colour codes
+
+Every lookup is a single index into a precomputed grid of (2**bits)³ ANSI colour codes (32³ by default),
+built once per process, or memory-mapped from a `cache` file. c.rgb_to_ansi is exact for RGB distance.
+'''
+
+from __future__ import annotations
+from functools import lru_cache
+from itertools import product
+import mmap
+import os
+from typing import Any, Iterable, Literal, TypeAlias
+
+from pp.colour import c
+from pp.colour.c import np
+from pp.colour.space import rgb_to_oklab, rgb_to_oklab_many
+
+Metric: TypeAlias = Literal['rgb', 'oklab']
+
+# The candidate colours: the cube and the grey ramp. The 16 system colours are left out, as terminal themes change them.
+PALETTE: range = range(16, 256)
+
+# The header of a cache file: a magic number, format version, bits and (padded) metric, so that a grid is only
+# ever loaded by a Quantiser that would have built the same one.
+_CACHE_MAGIC, _CACHE_VERSION = b'PPQG', 1
+_CACHE_HEADER_SIZE = 16
+
+def _cache_header(metric: Metric, bits: int) -> bytes:
+    return (_CACHE_MAGIC + bytes([_CACHE_VERSION, bits]) + metric.encode()).ljust(_CACHE_HEADER_SIZE, b'\0')
+
+# The OKLab coordinates of each of the PALETTE colours.
+_PALETTE_OKLAB: tuple[tuple[float, float, float], ...] = tuple(rgb_to_oklab(*c.ansi_to_rgb(n)) for n in PALETTE)
+
+
+def nearest_ansi(r: int, g: int, b: int, metric: Metric = 'rgb') -> int:
+    'Returns the ANSI colour code of the nearest PALETTE colour to an RGB tuple, by exhaustive search for OKLab.'
+    if metric == 'rgb':
+        return c.rgb_to_ansi(r, g, b)
+    L, A, B = rgb_to_oklab(r, g, b)
+    _, n = min(((L-pl)*(L-pl) + (A-pa)*(A-pa) + (B-pb)*(B-pb), n) for n, (pl, pa, pb) in zip(PALETTE, _PALETTE_OKLAB))
+    return n
+
+
+class Quantiser:
+    '''
+    Maps RGB colours to ANSI colour codes via a lookup grid, whose cells each hold the nearest colour to their centre.
+    - `bits` is the number of high bits of each component used to index the grid: 8 is exact, but takes 16MB
+    - `cache` is a file path to memory-map the grid from, which is built and written there if it doesn't exist
+      (or was built with a different metric, bits, or format)
+    '''
+
+    def __init__(self, metric: Metric = 'oklab', bits: int = 5, cache: str | None = None):
+        if metric not in ('rgb', 'oklab'):
+            raise ValueError(f'Invalid metric: {metric}')
+        if not 1 <= bits <= 8:
+            raise ValueError(f'Invalid bits: {bits}')
+        self.metric, self.bits, self.shift = metric, bits, 8 - bits
+
+        self.grid = self._load(cache) if cache and os.path.exists(cache) else None
+        if self.grid is None:
+            self.grid = self._build()
+            if cache:
+                os.makedirs(os.path.dirname(cache) or '.', exist_ok=True)
+                with open(cache, 'wb') as f:
+                    f.write(_cache_header(metric, bits))
+                    f.write(self.grid)
+        self._grid_np = np.frombuffer(self.grid, dtype=np.uint8) if np is not None else None
+
+    def _load(self, path: str) -> memoryview | None:
+        'Memory-maps a grid from a file, or returns None if it was built with a different metric, bits or format.'
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size != _CACHE_HEADER_SIZE + (1 << 3*self.bits):
+                return None
+            if f.read(_CACHE_HEADER_SIZE) != _cache_header(self.metric, self.bits):
+                return None
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))[_CACHE_HEADER_SIZE:]
+
+    def _centres(self) -> list[int]:
+        'The 0-255 value at the centre of each cell, along one axis of the grid.'
+        return [(v << self.shift) + (1 << self.shift >> 1) for v in range(1 << self.bits)]
+
+    def _build(self) -> bytes:
+        'Finds the nearest colour to the centre of every cell, in r, g, b (row-major) order.'
+        centres = self._centres()
+        if np is None:
+            return bytes(nearest_ansi(r, g, b, self.metric) for r, g, b in product(centres, repeat=3))
+
+        axis = np.array(centres, dtype=np.uint8)
+        rgb = np.stack(np.meshgrid(axis, axis, axis, indexing='ij'), axis=-1).reshape(-1, 3)
+        if self.metric == 'rgb':
+            return c.rgb_to_ansi_many(rgb).astype(np.uint8).tobytes()
+
+        palette = np.array(_PALETTE_OKLAB)
+        codes = np.empty(len(rgb), dtype=np.uint8)
+        # in chunks, to bound the (chunk x palette) distance matrix
+        for i in range(0, len(rgb), 1 << 15):
+            lab = rgb_to_oklab_many(rgb[i:i + (1 << 15)])
+            d = ((lab[:, None, :] - palette[None, :, :]) ** 2).sum(axis=-1)
+            codes[i:i + (1 << 15)] = d.argmin(axis=1) + PALETTE.start
+        return codes.tobytes()
+
+    def __call__(self, r: int, g: int, b: int) -> int:
+        'Returns the ANSI colour code of the nearest colour to an RGB tuple.'
+        s, bits = self.shift, self.bits
+        return self.grid[(((r >> s) << bits | (g >> s)) << bits) | (b >> s)]
+
+    def many(self, pixels: Iterable[tuple[int, int, int]]) -> Any:
+        '''
+        Quantises many RGB tuples in one pass.
+        With numpy, takes an integer array whose last axis has size 3 (e.g. an image of shape (h, w, 3)),
+        and returns a uint8 array without it, otherwise takes any iterable and returns a list of ints.
+        '''
+        if self._grid_np is None:
+            return [self(r, g, b) for r, g, b in pixels]
+        p = np.asarray(pixels).astype(np.intp) >> self.shift
+        return self._grid_np[((p[..., 0] << self.bits | p[..., 1]) << self.bits) | p[..., 2]]
+
+
+@lru_cache
+def quantiser(metric: Metric = 'oklab', bits: int = 5) -> Quantiser:
+    'Returns a Quantiser, built once per process per metric and bits.'
+    return Quantiser(metric, bits)
@@ -0,0 +1,196 @@
+'''
+Renders grids of coloured cells to terminal strings, in 256-colour or truecolour (24-bit) mode.
+
+    r = render.Renderer('truecolour')
+    print(r.render([[('a', (255, 0, 0), None), ('b', (255, 0, 0), 21)]]))
+
+Each cell is (text, fg, bg), where a colour is an ANSI colour code, an ANSIColour, an RGB tuple, or None (the default).
+The renderer tracks the current fg/bg, so an escape is only emitted when the colour changes
+(with fg & bg combined in one), and a line is only reset once, at its end, where colorise resets every cell.
+In 256-colour mode RGB tuples are quantised to their nearest colour, ANSI colours are never converted.
+
+For animation, a Screen only redraws the cells that changed since its last frame:
+
+    with render.Screen('truecolour') as screen:
+        for frame in frames:
+            screen.draw(frame)
+'''
+
+from __future__ import annotations
+from itertools import accumulate
+import sys
+from typing import IO, Iterable, Literal, Sequence, Tuple, TypeAlias, Union
+
+from pp.colour import c
+
+Mode: TypeAlias = Literal['256', 'truecolour']
+Colour: TypeAlias = Union[int, c.ANSIColour, Tuple[int, int, int], None]
+Cell: TypeAlias = Tuple[str, Colour, Colour]
+
+# SGR parameters for each ANSI colour code
+_ANSI_PARAMS: dict[str, tuple[str, ...]] = {
+    style: tuple(f'{escape};{n}' for n in range(256))
+    for style, escape in (('fg', '38;5'), ('bg', '48;5'))
+}
+_RGB_ESCAPES = {'fg': '38;2', 'bg': '48;2'}
+# the most colours to remember the parameters of, per style (truecolour images can have millions)
+_PARAMS_MAX = 1 << 16
+
+
+class Renderer:
+    'Renders rows of cells, emitting escape codes only when the fg/bg colour changes.'
+
+    def __init__(self, mode: Mode = '256'):
+        if mode not in ('256', 'truecolour'):
+            raise ValueError(f'Invalid mode: {mode}')
+        self.mode = mode
+        # colour -> SGR parameters, per style
+        self._params: dict[str, dict[Colour, str | None]] = {'fg': {None: None}, 'bg': {None: None}}
+
+    def _param(self, colour: Colour, style: str) -> str | None:
+        'Returns the SGR parameters that set a colour, e.g. "38;5;196", or None for the default colour.'
+        try:
+            return self._params[style][colour]
+        except KeyError:
+            pass
+        if isinstance(colour, c.ANSIColour):
+            # codes outside 0-255 (e.g. the blank c.from_ansi(256)) are ignored by terminals, i.e. the default
+            param = _ANSI_PARAMS[style][colour.ansi_n] if 0 <= colour.ansi_n < 256 else None
+        elif isinstance(colour, int):
+            param = _ANSI_PARAMS[style][colour]
+        elif self.mode == 'truecolour':
+            r, g, b = colour
+            param = f'{_RGB_ESCAPES[style]};{r};{g};{b}'
+        else:
+            param = _ANSI_PARAMS[style][c.rgb_to_ansi(*colour)]
+        if len(self._params[style]) >= _PARAMS_MAX:
+            self._params[style] = {None: None}
+        self._params[style][colour] = param
+        return param
+
+    def render_line(self, cells: Iterable[Cell]) -> str:
+        'Renders a row of cells, resetting the colour at the end (if one was set).'
+        fg_params, bg_params, parts, fg, bg = self._params['fg'], self._params['bg'], [], None, None
+        for text, cell_fg, cell_bg in cells:
+            # the cache lookups inline, as this runs for every cell
+            try:
+                cell_fg = fg_params[cell_fg]
+            except KeyError:
+                cell_fg = self._param(cell_fg, 'fg')
+            try:
+                cell_bg = bg_params[cell_bg]
+            except KeyError:
+                cell_bg = self._param(cell_bg, 'bg')
+            if cell_fg == fg:
+                if cell_bg == bg:
+                    parts.append(text)
+                    continue
+                if cell_bg is None:
+                    # going back to a default colour needs a reset, then whatever is still set
+                    escape = f'\033[0;{cell_fg}m' if cell_fg else '\033[0m'
+                else:
+                    escape = f'\033[{cell_bg}m'
+            elif cell_bg == bg:
+                if cell_fg is None:
+                    escape = f'\033[0;{cell_bg}m' if cell_bg else '\033[0m'
+                else:
+                    escape = f'\033[{cell_fg}m'
+            elif cell_fg is None or cell_bg is None:
+                escape = f'\033[0;{cell_fg or cell_bg}m' if cell_fg or cell_bg else '\033[0m'
+            else:
+                escape = f'\033[{cell_fg};{cell_bg}m'
+            parts.append(escape)
+            parts.append(text)
+            fg, bg = cell_fg, cell_bg
+        if fg is not None or bg is not None:
+            parts.append(c.RESET)
+        return ''.join(parts)
+
+    def render(self, rows: Iterable[Iterable[Cell]]) -> str:
+        'Renders rows of cells as lines.'
+        return '\n'.join(map(self.render_line, rows))
+
+
+# Escape codes for moving the cursor (1-based), clearing the screen/rest of the line, and hiding/showing the cursor.
+_MOVE = '\033[{};{}H'
+_CLEAR, _CLEAR_LINE = '\033[2J', '\033[K'
+_HIDE_CURSOR, _SHOW_CURSOR = '\033[?25l', '\033[?25h'
+
+
+def _changed_spans(old: Sequence[Cell], new: Sequence[Cell], gap: int) -> list[tuple[int, int]]:
+    'Returns the (start, end) of each run of changed cells, merging runs less than `gap` unchanged cells apart.'
+    spans, start, end = [], None, 0
+    for x, (old_cell, new_cell) in enumerate(zip(old, new)):
+        if old_cell == new_cell:
+            continue
+        if start is None:
+            start = x
+        elif x - end >= gap:
+            spans.append((start, end))
+            start = x
+        end = x + 1
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+
+class Screen:
+    '''
+    A screen buffer, which draws frames (rows of cells) by writing only the cells that changed since the last frame:
+    a cursor move and the coalesced escapes of each changed span, in one write per frame.
+    - `gap` is the number of unchanged cells between changes below which they're redrawn, rather than moved past
+      (a cursor move is ~8 bytes)
+    Cells are assumed to be as wide as their text.
+    '''
+
+    def __init__(self, mode: Mode = '256', out: IO[str] | None = None, gap: int = 8):
+        self.renderer, self.out, self.gap = Renderer(mode), out or sys.stdout, gap
+        self.frame: list[list[Cell]] | None = None
+
+    def __enter__(self) -> Screen:
+        self.out.write(_HIDE_CURSOR)
+        self.clear()
+        return self
+
+    def __exit__(self, *_) -> None:
+        # leave the cursor below the last frame
+        self.out.write(f'{c.RESET}{_MOVE.format(len(self.frame or ()) + 1, 1)}{_SHOW_CURSOR}')
+        self.out.flush()
+
+    def clear(self) -> None:
+        'Forgets the last frame, so that the next is drawn in full.'
+        self.frame = None
+
+    def diff(self, rows: Sequence[Sequence[Cell]]) -> str:
+        'Returns the output that draws a frame over the last one, and makes it the last frame.'
+        render_line, gap, parts = self.renderer.render_line, self.gap, []
+        if self.frame is None:
+            parts.append(_CLEAR)
+            previous = []
+        else:
+            previous = self.frame
+        for y, row in enumerate(rows):
+            old = previous[y] if y < len(previous) else None
+            if old == row:
+                continue
+            if old is None or len(old) != len(row):
+                parts.append(f'{_MOVE.format(y + 1, 1)}{render_line(row)}{_CLEAR_LINE}')
+                continue
+            columns = None
+            for start, end in _changed_spans(old, row, gap):
+                if columns is None:
+                    columns = list(accumulate((len(text) for text, _, _ in row), initial=0))
+                parts.append(f'{_MOVE.format(y + 1, columns[start] + 1)}{render_line(row[start:end])}')
+        # clear any rows left over from a taller frame
+        for y in range(len(rows), len(previous)):
+            parts.append(f'{_MOVE.format(y + 1, 1)}{_CLEAR_LINE}')
+        self.frame = [list(row) for row in rows]
+        return ''.join(parts)
+
+    def draw(self, rows: Sequence[Sequence[Cell]]) -> int:
+        'Draws a frame, returning the number of characters written.'
+        s = self.diff(rows)
+        if s:
+            self.out.write(s)
+            self.out.flush()
+        return len(s)
@@ -0,0 +1,108 @@
+'''
+Conversions from sRGB to linear-light RGB and OKLab (and back), for mixing and comparing colours.
+
+Mixing sRGB values darkens and muddies the midpoints: linear light mixes as light does,
+and OKLab (via https://bottosson.github.io/posts/oklab/) mixes and compares as perceived.
+The *_many functions take arrays whose last axis has size 3 with numpy, otherwise lists of tuples.
+'''
+
+from __future__ import annotations
+from typing import Any, Iterable
+
+from pp.colour.c import np
+
+# linear-light RGB -> LMS cone response, and (cube-rooted) LMS -> OKLab
+_LMS = (
+    (0.4122214708, 0.5363325363, 0.0514459929),
+    (0.2119034982, 0.6806995451, 0.1073969566),
+    (0.0883024619, 0.2817188376, 0.6299787005),
+)
+_LAB = (
+    (0.2104542553, 0.7936177850, -0.0040720468),
+    (1.9779984951, -2.4285922050, 0.4505937099),
+    (0.0259040371, 0.7827717662, -0.8086757660),
+)
+# and their inverses
+_LMS_INV = (
+    (4.0767416621, -3.3077115913, 0.2309699292),
+    (-1.2684380046, 2.6097574011, -0.3413193965),
+    (-0.0041960863, -0.7034186147, 1.7076147010),
+)
+_LAB_INV = (
+    (1.0, 0.3963377774, 0.2158037573),
+    (1.0, -0.1055613458, -0.0638541728),
+    (1.0, -0.0894841775, -1.2914855480),
+)
+
+
+def _mul(m: tuple, v: tuple) -> tuple[float, float, float]:
+    'Multiplies a 3x3 matrix by a vector.'
+    return tuple(r0*v[0] + r1*v[1] + r2*v[2] for r0, r1, r2 in m)
+
+
+def _cbrt(v: float) -> float:
+    'The real cube root, of negative numbers too.'
+    return v ** (1/3) if v >= 0 else -((-v) ** (1/3))
+
+
+def srgb_to_linear(v: float) -> float:
+    'Converts an sRGB component (0-255) to linear light (0-1).'
+    v /= 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def linear_to_srgb(v: float) -> int:
+    'Converts a linear light component (0-1) to sRGB (0-255), clipping out of gamut values.'
+    v = min(max(v, 0.0), 1.0)
+    return round(255 * (v * 12.92 if v <= 0.0031308 else 1.055 * v ** (1/2.4) - 0.055))
+
+
+def rgb_to_linear(r: int, g: int, b: int) -> tuple[float, float, float]:
+    'Converts an sRGB colour to linear light.'
+    return (srgb_to_linear(r), srgb_to_linear(g), srgb_to_linear(b))
+
+
+def linear_to_rgb(r: float, g: float, b: float) -> tuple[int, int, int]:
+    'Converts a linear light colour to sRGB.'
+    return (linear_to_srgb(r), linear_to_srgb(g), linear_to_srgb(b))
+
+
+def rgb_to_oklab(r: int, g: int, b: int) -> tuple[float, float, float]:
+    'Converts an sRGB colour to OKLab, where euclidean distance approximates perceived difference.'
+    return _mul(_LAB, [_cbrt(v) for v in _mul(_LMS, rgb_to_linear(r, g, b))])
+
+
+def oklab_to_rgb(L: float, a: float, b: float) -> tuple[int, int, int]:
+    'Converts an OKLab colour to sRGB, clipping out of gamut values.'
+    return linear_to_rgb(*_mul(_LMS_INV, [v**3 for v in _mul(_LAB_INV, (L, a, b))]))
+
+
+def rgb_to_linear_many(rgb: Iterable[tuple[int, int, int]]) -> Any:
+    'Converts many sRGB colours to linear light in one pass.'
+    if np is None:
+        return [rgb_to_linear(*p) for p in rgb]
+    v = np.asarray(rgb, dtype=np.float64) / 255
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_rgb_many(linear: Iterable[tuple[float, float, float]]) -> Any:
+    'Converts many linear light colours to sRGB (as uint8s) in one pass.'
+    if np is None:
+        return [linear_to_rgb(*p) for p in linear]
+    v = np.clip(np.asarray(linear, dtype=np.float64), 0.0, 1.0)
+    v = np.where(v <= 0.0031308, v * 12.92, 1.055 * v ** (1/2.4) - 0.055)
+    return np.rint(255 * v).astype(np.uint8)
+
+
+def rgb_to_oklab_many(rgb: Iterable[tuple[int, int, int]]) -> Any:
+    'Converts many sRGB colours to OKLab in one pass.'
+    if np is None:
+        return [rgb_to_oklab(*p) for p in rgb]
+    return np.cbrt(rgb_to_linear_many(rgb) @ np.array(_LMS).T) @ np.array(_LAB).T
+
+
+def oklab_to_rgb_many(lab: Iterable[tuple[float, float, float]]) -> Any:
+    'Converts many OKLab colours to sRGB (as uint8s) in one pass.'
+    if np is None:
+        return [oklab_to_rgb(*p) for p in lab]
+    return linear_to_rgb_many((np.asarray(lab, dtype=np.float64) @ np.array(_LAB_INV).T) ** 3 @ np.array(_LMS_INV).T)
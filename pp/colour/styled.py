@@ -0,0 +1,77 @@
+'''
+Styled text: strings with ANSI escapes that know their visible (terminal column) width, for laying out coloured output.
+
+    s = Styled(' ').join([Styled.colour('hello', c.from_ansi(196)), Styled.colour('世界', c.from_ansi(21))])
+    s.width  # -> 10 (wide characters take 2 columns, escapes none)
+
+Widths are counted as text is styled and joined, so measuring never needs to strip escapes from the result.
+'''
+
+from __future__ import annotations
+from functools import lru_cache
+import re
+import unicodedata
+from typing import Iterable
+
+from pp.colour import c
+
+ESCAPES = re.compile(r"""
+    \x1b     # literal ESC
+    \[       # literal [
+    [;\d]*   # zero or more digits or semicolons
+    [A-Za-z] # a letter
+    """, re.VERBOSE)
+
+
+@lru_cache(maxsize=4096)
+def char_width(ch: str) -> int:
+    'The number of terminal columns a character takes: 2 for wide (e.g. CJK) characters, 0 for combining/format ones'
+    if unicodedata.combining(ch) or unicodedata.category(ch) in ('Mn', 'Me', 'Cf'):
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+
+
+def text_width(text: str) -> int:
+    'The number of terminal columns that (unstyled) text takes'
+    if text.isascii():
+        return len(text)
+    return sum(map(char_width, text))
+
+
+def visible_width(s: str) -> int:
+    'The number of terminal columns that a string with ANSI escapes takes'
+    return text_width(ESCAPES.sub('', s) if '\x1b' in s else s)
+
+
+class Styled(str):
+    'A string with ANSI escapes, which knows its visible width'
+
+    width: int
+
+    def __new__(cls, s: str = '', width: int | None = None) -> Styled:
+        'Wrap a string, measuring it (once) unless its width is given'
+        obj = super().__new__(cls, s)
+        obj.width = visible_width(s) if width is None else width
+        return obj
+
+    @classmethod
+    def colour(cls, text: str, colour: c.ANSIColour, style: c._ANSI_STYLES = 'bg') -> Styled:
+        'Colour (unstyled) text'
+        return cls(colour.colorise(text, style), text_width(text))
+
+    def join(self, items: Iterable[str]) -> Styled:
+        'Join strings with this one (as str.join), summing the widths of any that are Styled'
+        items, width = list(items), 0
+        for i in items:
+            width += i.width if isinstance(i, Styled) else visible_width(i)
+        return Styled(str.join(self, items), width + self.width * max(len(items) - 1, 0))
+
+    def __add__(self, other: str) -> Styled:
+        return Styled(str.__add__(self, other), self.width + (other.width if isinstance(other, Styled) else visible_width(other)))
+
+    def __radd__(self, other: str) -> Styled:
+        return Styled(str.__add__(other, self), visible_width(other) + self.width)
+
+    def ljust(self, width: int, fillchar: str = ' ') -> Styled:
+        'Pad to a visible width'
+        return self + fillchar * (width - self.width) if width > self.width else self
@@ -23,16 +23,63 @@ usage examples to log messages:
 
     logger.debug('This is a debug message', 'arg1', 'arg2', {'key': 'value'})
     # {"timestamp": "2024-12-09T15:05:43.904749+10:00", "msg": "This is a debug message", "event": {"args": ["arg1", "arg2"], "key": "value"}}
+
+    # the fast path for structured events (fields go straight to the JSON encoder, see EventRecord)
+    logger.event('This is an event', key='value', duration_ms=12.5)
+    # {"timestamp": "2024-12-09T15:05:43.904851+10:00", "msg": "This is an event", "event": {"key": "value", "duration_ms": 12.5}}
+    ```
+
+usage example to aggregate records in process, logging a snapshot every minute instead of shipping every line:
+    ```python
+    logger = getLogger('my_logger', metrics=Metrics(interval=60, fields=['duration_ms']))
+    logger.info('request', {'duration_ms': 12.5})
+    # {"timestamp": ..., "msg": "metrics", "event": {"interval_s": 60.0, "counts": [{"name": "my_logger", "level": "INFO", "msg": "request", "n": 1}],
+    #  "histograms": [{"name": "my_logger", "msg": "request", "field": "duration_ms", "n": 1, "sum": 12.5, "min": 12.5, "max": 12.5, "p50": 12.5, ...}]}}
+    ```
+
+usage example to time a block (or function) as a span, logged as one record with its duration and parent span:
+    ```python
+    with span('load', logger, table='users'):
+        ...
+    # {"timestamp": ..., "msg": "load", "event": {"span_id": "9f2c...", "parent_id": null, "trace_id": "9f2c...", "duration_ms": 12.3, "table": "users"}}
     ```
+
+usage examples to query log files (including their rotated backups, oldest first):
+    ```python
+    for record in query('info.log', level=LogLevel.WARNING, name='my_logger', event={'key': 'value'}):
+        print(record['msg'])
+
+    # with a sidecar index (info.log.idx) of timestamp -> byte offset, so time ranges seek rather than scan
+    query('info.log', since='2024-12-09T15:00:00+10:00', until=datetime(2024, 12, 9, 16), index=True)
+    ```
+    Files are memory-mapped, and lines are only parsed as JSON once a byte search of the raw line
+    (for the name and event fields, then the level and timestamp) finds that they could match.
 '''
 
-from datetime import datetime
+from __future__ import annotations
+from array import array
+import atexit
+from bisect import bisect_left, bisect_right
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone, tzinfo
+import functools
+import glob
+import inspect
 import io
 import json
 import logging
 from logging.handlers import  TimedRotatingFileHandler
+from math import floor, inf, isfinite, log2
+import mmap
 import os
+from random import getrandbits, random
+import re
 import sys
+import threading
+import time
+from time import perf_counter_ns
+import types
+from typing import Callable, Iterator
 
 from pp.pp import _json_default
 
@@ -48,6 +95,42 @@ class LogLevel:
 
 DEFAULT_LOG_LEVEL = LogLevel.INFO
 
+class EventRecord(logging.LogRecord):
+    '''
+    The record of logger.event: its fields are carried as they are (as `fields`) to LogFormatter, rather than as args.
+    It skips the work of a LogRecord that LogFormatter doesn't use: finding the caller (which is left blank)
+    and checking its args for a mapping.
+    `line` is the (context, line, original msg) that a LogFormatter last formatted it as, for other handlers to reuse.
+    '''
+    def __init__(self, name: str, level: int, msg: str, fields: dict):
+        ct = time.time()
+        self.name, self.msg, self.args, self.fields, self.line = name, msg, (), fields, None
+        self.levelno, self.levelname = level, logging.getLevelName(level)
+        self.pathname, self.filename, self.module, self.lineno, self.funcName = '', '', '', 0, None
+        self.exc_info = self.exc_text = self.stack_info = self.taskName = None
+        self.created, self.msecs = ct, (ct - int(ct)) * 1000
+        self.relativeCreated = (ct - _START) * 1000
+        self.thread, self.threadName = threading.get_ident(), threading.current_thread().name
+        self.process, self.processName = os.getpid(), 'MainProcess'
+        if 'multiprocessing' in sys.modules:
+            self.processName = sys.modules['multiprocessing'].current_process().name
+
+# (for the relativeCreated of EventRecords)
+_START = time.time()
+# the second that the local timezone was last looked up in, and its (fixed offset) timezone then
+_LOCAL_TZ: tuple[int, tzinfo] = (-1, timezone.utc)
+
+def _isoformat(t: float) -> str:
+    'A time as a local ISO 8601 string, like datetime.fromtimestamp(t).astimezone() but with the timezone cached per second.'
+    global _LOCAL_TZ
+    second, tz = _LOCAL_TZ
+    if int(t) != second:
+        # the UTC offset can only change on a second
+        tz = datetime.fromtimestamp(t).astimezone().tzinfo
+        _LOCAL_TZ = (int(t), tz)
+    return datetime.fromtimestamp(t, tz).isoformat()
+
+
 class LogFormatter(logging.Formatter):
     'Custom log formatter that formats log messages as JSON, aka "Structured Logging".'
     def __init__(self, defaults: dict = {}):
@@ -57,10 +140,16 @@ class LogFormatter(logging.Formatter):
         '''
         self.defaults = defaults
         super().__init__()
+        # for EventRecords: one encoder, and the context (which never changes) encoded once
+        self._encode = json.JSONEncoder(default=_json_default).encode
+        self._context = f', "context": {self._encode(defaults)}' if defaults else ''
 
     def format(self, record) -> str:
         'Formats the log message as JSON.'
 
+        if record.__class__ is EventRecord:
+            return self._format_event(record)
+
         args, kwargs = None, {}
         if isinstance(record.args, tuple):
             if len(record.args) == 1:
@@ -84,18 +173,376 @@ class LogFormatter(logging.Formatter):
         record.args = ()
         return super().format(record)
 
+    def _format_event(self, record: EventRecord) -> str:
+        '''
+        Formats an EventRecord as the same JSON as format, by encoding its fields straight into the line.
+        (It has no args, exception or stack for Formatter.format to add.)
+        As in format, the line replaces the msg, for the other handlers (which have plain formatters).
+        It's also kept on the record, with this formatter's context and the original msg, so that
+        other LogFormatters with the same context don't encode it again (and those without can).
+        '''
+        if record.line is not None:
+            context, line, msg = record.line
+            if context == self._context:
+                return line
+        else:
+            msg = record.msg
+        encode = self._encode
+        record.msg = record.message = line = (
+            f'{{"timestamp": "{_isoformat(record.created)}", '
+            f'"level": {encode(record.levelname)}, "name": {encode(record.name)}, "msg": {encode(msg)}, '
+            f'"event": {encode(record.fields)}{self._context}}}'
+        )
+        record.line = (self._context, line, msg)
+        return line
+
+
+def _event(logger: logging.Logger, msg: str, level: int = LogLevel.INFO, **fields) -> None:
+    '''
+    Logs a message with event fields, e.g. logger.event('request', path='/', duration_ms=12.5),
+    on a fast path (see EventRecord) that the loggers of getLogger have as their `event` method.
+    `level` is the level to log at, so it can't be the name of a field.
+    '''
+    if logger.isEnabledFor(level):
+        logger.handle(EventRecord(logger.name, level, msg, fields))
+
+
+def _event_fields(record: logging.LogRecord) -> dict:
+    'The event fields of a record: its kwargs, as LogFormatter reads them.'
+    if record.__class__ is EventRecord:
+        return record.fields
+    if isinstance(record.args, dict):
+        return record.args
+    if isinstance(record.args, tuple) and len(record.args) > 1 and isinstance(record.args[-1], dict):
+        return record.args[-1]
+    return {}
+
+# the number of histogram buckets per power of 2, so each is 2**(1/8) (~9%) wider than the last
+HISTOGRAM_BUCKETS_PER_POWER = 8
+# the quantiles reported for each histogram
+HISTOGRAM_QUANTILES = (0.5, 0.9, 0.99)
+
+def _bucket(v: float) -> int | None:
+    'The log-scale histogram bucket of a value, or None for values <= 0.'
+    return floor(log2(v) * HISTOGRAM_BUCKETS_PER_POWER) if v > 0 else None
+
+def _bucket_bounds(bucket: int | None) -> tuple[float, float]:
+    'The (lower, upper) bounds of a histogram bucket.'
+    if bucket is None:
+        return 0.0, 0.0
+    return 2 ** (bucket / HISTOGRAM_BUCKETS_PER_POWER), 2 ** ((bucket + 1) / HISTOGRAM_BUCKETS_PER_POWER)
+
+
+class _Shard:
+    'The counts and histograms of one thread, and a lock that is only ever contended while they are flushed.'
+    __slots__ = ('lock', 'counts', 'histograms', 'thread')
+
+    def __init__(self):
+        self.lock, self.thread = threading.Lock(), threading.current_thread()
+        # (name, level, msg) -> count
+        self.counts: dict[tuple, int] = {}
+        # (name, msg, field) -> [n, sum, min, max, {bucket: count}]
+        self.histograms: dict[tuple, list] = {}
+
+
+class Metrics(logging.Filter):
+    '''
+    Aggregates the records of a logger in process, and logs a snapshot of them every `interval` seconds,
+    as a single record with the msg 'metrics':
+    - counts per (name, level, msg)
+    - log-bucketed histograms (with n, sum, min, max & quantiles) of numeric event fields, per (name, msg)
+    It's a filter (that passes every record), so that it sees each record before any handler formats it.
+    Each thread aggregates into its own shard, so the only lock taken per record is uncontended.
+    - `fields` are the event fields to keep histograms of (default: every numeric field)
+    - `interval` is the number of seconds between snapshots, or None to only snapshot on flush()/close()
+    '''
+
+    def __init__(self, interval: float | None = 60.0, fields: list[str] | None = None, level: int = LogLevel.INFO):
+        super().__init__()
+        self.interval, self.fields, self.level = interval, fields, level
+        self.logger: logging.Logger | None = None
+        self._local, self._lock, self._shards = threading.local(), threading.Lock(), []
+        self._last_flush = time.monotonic()
+        self._stopped, self._thread = threading.Event(), None
+
+    def attach(self, logger: logging.Logger) -> Metrics:
+        'Aggregate the records of a logger, and log snapshots to it.'
+        self.logger = logger
+        logger.addFilter(self)
+        if self.interval is not None and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='pp.log.Metrics', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def close(self) -> None:
+        'Stop the snapshot thread, and log a last snapshot.'
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
+        atexit.unregister(self.close)
+        self.flush()
+
+    def _shard(self) -> _Shard:
+        'Create the shard of the current thread.'
+        shard = self._local.shard = _Shard()
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        'Count a record, and add its numeric event fields to their histograms.'
+        if record.__class__ is not EventRecord and 'metrics_snapshot' in record.__dict__:
+            return True
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+        key = (record.name, record.levelname, msg)
+        fields = _event_fields(record)
+        if self.fields is not None:
+            fields = {f: fields[f] for f in self.fields if f in fields}
+        shard.lock.acquire()
+        try:
+            counts = shard.counts
+            counts[key] = counts.get(key, 0) + 1
+            for field, v in fields.items():
+                # (not bools, and not inf/nan, which can't be bucketed or compared)
+                if v.__class__ is not int and (v.__class__ is not float or not isfinite(v)):
+                    continue
+                # _bucket, inline as this runs for every record
+                b = floor(log2(v) * HISTOGRAM_BUCKETS_PER_POWER) if v > 0 else None
+                hkey = (record.name, msg, field)
+                h = shard.histograms.get(hkey)
+                if h is None:
+                    shard.histograms[hkey] = [1, v, v, v, {b: 1}]
+                    continue
+                h[0] += 1
+                h[1] += v
+                if v < h[2]:
+                    h[2] = v
+                elif v > h[3]:
+                    h[3] = v
+                h[4][b] = h[4].get(b, 0) + 1
+        finally:
+            shard.lock.release()
+        return True
+
+    def snapshot(self) -> dict:
+        'Merge (and reset) the shards of every thread, returning their counts and histograms.'
+        counts, histograms = {}, {}
+        with self._lock:
+            shards = list(self._shards)
+            # forget the shards of threads that have finished, as they won't record any more
+            self._shards = [s for s in self._shards if s.thread.is_alive()]
+        for shard in shards:
+            with shard.lock:
+                shard_counts, shard.counts = shard.counts, {}
+                shard_histograms, shard.histograms = shard.histograms, {}
+            for key, n in shard_counts.items():
+                counts[key] = counts.get(key, 0) + n
+            for key, (n, total, lo, hi, buckets) in shard_histograms.items():
+                h = histograms.get(key)
+                if h is None:
+                    histograms[key] = [n, total, lo, hi, dict(buckets)]
+                    continue
+                h[0] += n
+                h[1] += total
+                h[2], h[3] = min(h[2], lo), max(h[3], hi)
+                for b, bn in buckets.items():
+                    h[4][b] = h[4].get(b, 0) + bn
+
+        now = time.monotonic()
+        interval, self._last_flush = now - self._last_flush, now
+        return {
+            'interval_s': round(interval, 3),
+            'counts': [
+                {'name': name, 'level': level, 'msg': msg, 'n': n}
+                for (name, level, msg), n in counts.items()
+            ],
+            'histograms': [
+                {'name': name, 'msg': msg, 'field': field, **_summarise(*h)}
+                for (name, msg, field), h in histograms.items()
+            ],
+        }
+
+    def flush(self) -> None:
+        'Log a snapshot, if anything was recorded since the last.'
+        snapshot = self.snapshot()
+        if self.logger is not None and (snapshot['counts'] or snapshot['histograms']):
+            self.logger.log(self.level, 'metrics', snapshot, extra={'metrics_snapshot': True})
+
+
+def _summarise(n: int, total: float, lo: float, hi: float, buckets: dict) -> dict:
+    'The summary of a histogram: its n, sum, min, max, (estimated) quantiles, and (lower bound, count) of each bucket.'
+    # (the None bucket, of values <= 0, is below all the others, whose numbers are negative for values < 1)
+    ordered = sorted(buckets.items(), key=lambda item: -inf if item[0] is None else item[0])
+    quantiles, seen, i = {}, 0, 0
+    for b, bn in ordered:
+        seen += bn
+        while i < len(HISTOGRAM_QUANTILES) and seen >= HISTOGRAM_QUANTILES[i] * n:
+            lower, upper = _bucket_bounds(b)
+            # the middle of the bucket, within the values seen
+            quantiles[f'p{HISTOGRAM_QUANTILES[i]*100:g}'] = min(max((lower + upper) / 2, lo), hi)
+            i += 1
+    return {
+        'n': n, 'sum': total, 'min': lo, 'max': hi, **quantiles,
+        'buckets': [[_bucket_bounds(b)[0], bn] for b, bn in ordered],
+    }
+
+
+# the innermost span of the current context (thread/task), or _UNSAMPLED inside a span that isn't being traced
+_SPAN: ContextVar[Span | object | None] = ContextVar('pp.log.span', default=None)
+_UNSAMPLED = object()
+
+
+class Span:
+    '''
+    Times a block (or every call of a function), and logs one record for it when it ends, through a logger's handlers:
+    its msg is the span's name, and its event holds the span_id, parent_id, trace_id (the root span's id), duration_ms,
+    the span's context, and the error (exception type) if it raised.
+    Spans nest via contextvars, so each thread/task has its own stack of them.
+    Create them with `span`.
+    '''
+    __slots__ = ('name', 'logger', 'level', 'sample', 'ctx', 'span_id', 'parent_id', 'trace_id', 'start', '_token')
+
+    def __init__(self, name: str, logger: logging.Logger | None, level: int, sample: float, ctx: dict):
+        self.name, self.logger, self.level, self.sample, self.ctx = name, logger, level, sample, ctx
+        self.span_id = self.parent_id = self.trace_id = self._token = None
+
+    def set(self, **ctx) -> None:
+        'Add to the context of the span, e.g. once a result is known.'
+        self.ctx.update(ctx)
+
+    @property
+    def sampled(self) -> bool:
+        'Whether the span is being traced (it has only been entered if so).'
+        return self.span_id is not None
+
+    def __enter__(self) -> Span:
+        parent = _SPAN.get()
+        if parent is _UNSAMPLED:
+            # inside an untraced span: nothing to do, even on exit
+            return self
+        if parent is None and self.sample < 1.0 and random() >= self.sample:
+            # only the root's sampling decision is passed down
+            self._token = _SPAN.set(_UNSAMPLED)
+            return self
+        logger = self.logger or (parent.logger if parent is not None else logging.getLogger())
+        if not logger.isEnabledFor(self.level):
+            # skipped for its level: its children are parented to the nearest traced span instead
+            return self
+        self.logger, self.span_id = logger, f'{getrandbits(64):016x}'
+        if parent is not None:
+            self.parent_id, self.trace_id = parent.span_id, parent.trace_id
+        else:
+            self.trace_id = self.span_id
+        self._token = _SPAN.set(self)
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = perf_counter_ns()
+        if self._token is None:
+            return
+        _SPAN.reset(self._token)
+        self._token = None
+        if self.span_id is None:
+            return
+        fields = {
+            # (first, so that the context can't replace the span's own fields)
+            **self.ctx,
+            'span_id':     self.span_id,
+            'parent_id':   self.parent_id,
+            'trace_id':    self.trace_id,
+            'duration_ms': (end - self.start) / 1e6,
+        }
+        if exc_type is not None:
+            fields['error'] = exc_type.__name__
+        # (the level was checked on entry)
+        self.logger.handle(EventRecord(self.logger.name, self.level, self.name, fields))
+        self.span_id = None
+
+    def __call__(self, func: Callable) -> Callable:
+        'Use the span as a decorator, timing each call of a (sync or async) function in a new span.'
+        name, logger, level, sample, ctx = self.name, self.logger, self.level, self.sample, self.ctx
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                parent = _SPAN.get()
+                if parent is _UNSAMPLED:
+                    return await func(*args, **kwargs)
+                if parent is None and sample < 1.0 and random() >= sample:
+                    token = _SPAN.set(_UNSAMPLED)
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        _SPAN.reset(token)
+                with Span(name, logger, level, sample, dict(ctx)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # the sampling decision of __enter__, inline so that untraced calls don't create a Span
+            parent = _SPAN.get()
+            if parent is _UNSAMPLED:
+                return func(*args, **kwargs)
+            if parent is None and sample < 1.0 and random() >= sample:
+                token = _SPAN.set(_UNSAMPLED)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    _SPAN.reset(token)
+            with Span(name, logger, level, sample, dict(ctx)):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def span(name: str, logger: logging.Logger | str | None = None, level: int = LogLevel.INFO, sample: float = 1.0, **ctx) -> Span:
+    '''
+    A timing span, as a context manager or decorator:
+        ```python
+        with span('load', logger, table='users') as s:
+            rows = load()
+            s.set(rows=len(rows))
+        # {"timestamp": ..., "level": "INFO", "name": "my_logger", "msg": "load",
+        #  "event": {"table": "users", "rows": 100, "span_id": "9f2c...", "parent_id": null, "trace_id": "9f2c...", "duration_ms": 12.3}}
+
+        @span('handle', logger, sample=0.01)
+        def handle(request): ...
+        ```
+    - `logger` logs the span's record (a logger or its name), by default the parent span's logger, or the root logger
+    - `sample` is the fraction of root spans that are traced, and spans nested in them are traced with them.
+      An untraced span (or one whose logger ignores `level`) only costs a context variable lookup or two.
+      A span whose logger ignores `level` doesn't stop the spans nested in it being traced (as children of its parent).
+    - `ctx` is added to the span's event (but can't replace its span_id, parent_id, trace_id or duration_ms)
+    '''
+    if isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    return Span(name, logger, level, sample, ctx)
+
 
 def _getLogger(
     name:     str,
     level:    int                   = logging.CRITICAL,
     handlers: list[logging.Handler] = [],
     context:  dict                  = {},
+    metrics:  Metrics | None        = None,
 ) -> logging.Logger:
     '''
     Creates a logger with the given name, level, and handlers.
     - If no handlers are provided, the logger will not output any logs.
     - This function requires the handlers to be initialized when passed as args.
     - the same log level is applied to all handlers.
+    - `metrics` aggregates the logger's records (replacing any it had before).
     '''
 
     # create the root logger
@@ -126,6 +573,16 @@ def _getLogger(
         # only set the first handler to use the custom formatter
         logger.handlers[0].setFormatter(LogFormatter(defaults=context))
 
+    # the fast path for structured events
+    logger.event = types.MethodType(_event, logger)
+
+    # close/remove any existing metrics
+    for f in [f for f in logger.filters if isinstance(f, Metrics)]:
+        logger.removeFilter(f)
+        f.close()
+    if metrics is not None:
+        metrics.attach(logger)
+
     return logger
 
 
@@ -135,6 +592,7 @@ def getLogger(
     stream:   io.TextIOBase       = sys.stdout,
     files:    dict[LogLevel, str] = {},
     context:  dict                = {},
+    metrics:  Metrics | None      = None,
 ) -> logging.Logger:
     '''
     Creates a logger with the given name, level, and handlers.
@@ -147,6 +605,7 @@ def getLogger(
     - `level` is the log level for the logger and all handlers (default is INFO).
         - if `level` is not provided, it will check the environment variable `LOG_LEVEL` and use its value if it exists
         - otherwise it defaults to `LogLevel.INFO`.
+    - `metrics` is an optional Metrics, which aggregates the logger's records and logs periodic snapshots of them.
     '''
 
     if level == -1:
@@ -168,4 +627,222 @@ def getLogger(
         handler.setLevel(flevel)
         handlers.append(handler)
 
-    return _getLogger(name, level, handlers, context=context)
+    return _getLogger(name, level, handlers, context=context, metrics=metrics)
+
+
+# the suffixes that TimedRotatingFileHandler gives backups, e.g. info.log.2024-12-09
+_ROTATED_SUFFIX = re.compile(r'\d{4}-\d{2}-\d{2}(_\d{2}(-\d{2}){0,2})?')
+# the (leading) fields of a LogFormatter line that are read without parsing it
+_TIMESTAMP_FIELD, _LEVEL_FIELD = b'"timestamp": "', b'"level": "'
+# the number of bytes between entries in an index
+INDEX_BLOCK = 1 << 16
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MISSING = object()
+
+def log_files(filename: str) -> list[str]:
+    'The rotated backups of a log file (oldest first), then the file itself, of those that exist.'
+    backups = sorted(
+        path for path in glob.glob(f'{glob.escape(filename)}.*')
+        if _ROTATED_SUFFIX.fullmatch(path[len(filename) + 1:])
+    )
+    return backups + ([filename] if os.path.exists(filename) else [])
+
+def _micros(t: datetime | str) -> int:
+    'A datetime (or ISO string, in local time if naive) as microseconds since the epoch.'
+    if isinstance(t, str):
+        t = datetime.fromisoformat(t)
+    if t.tzinfo is None:
+        t = t.astimezone()
+    return (t - _EPOCH) // timedelta(microseconds=1)
+
+def _field(buf, prefix: bytes, start: int, end: int) -> bytes | None:
+    'The value of the first string field with a prefix (e.g. b\'"level": "\') in a line, without parsing it.'
+    i = buf.find(prefix, start, end)
+    if i == -1:
+        return None
+    i += len(prefix)
+    return buf[i:buf.find(b'"', i, end)]
+
+def _line_micros(buf, start: int, end: int) -> int | None:
+    'The timestamp of a line, or None if it has none.'
+    ts = _field(buf, _TIMESTAMP_FIELD, start, end)
+    try:
+        return _micros(ts.decode()) if ts else None
+    except ValueError:
+        return None
+
+def _lines(buf, start: int, stop: int, needles: list[bytes]) -> Iterator[tuple[int, int]]:
+    '''
+    The (start, end) of each line in buf[start:stop] that contains all the needles.
+    The search skips straight to each occurrence of the first needle, so lines without it are never looked at.
+    '''
+    if not needles:
+        while start < stop:
+            end = buf.find(b'\n', start, stop)
+            end = stop if end == -1 else end
+            yield start, end
+            start = end + 1
+        return
+    first, *rest = needles
+    while (i := buf.find(first, start, stop)) != -1:
+        line_start = buf.rfind(b'\n', start, i) + 1 or start
+        end = buf.find(b'\n', i, stop)
+        end = stop if end == -1 else end
+        if all(buf.find(needle, line_start, end) != -1 for needle in rest):
+            yield line_start, end
+        start = end + 1
+
+
+class LogIndex:
+    '''
+    A sparse sidecar index of a log file (at `{path}.idx`): the timestamp and byte offset of the first line
+    after every INDEX_BLOCK bytes, so that a time range maps to a range of bytes without scanning.
+    It's extended as the file grows, and rebuilt if the file is replaced (e.g. when it's rotated).
+    Assumes that timestamps are in order within a file, as one process writes them.
+    '''
+
+    def __init__(self, path: str, size: int = 0, micros: array | None = None, offsets: array | None = None):
+        self.path, self.size = path, size
+        self.micros, self.offsets = micros or array('q'), offsets or array('q')
+
+    @staticmethod
+    def open(path: str, buf) -> LogIndex:
+        'Load the index of a (memory-mapped) log file, updating (and saving) it if the file has changed.'
+        index = LogIndex.load(path)
+        if index is None or index.size > len(buf) or (
+            # a different file (of at least the same size) with the same name
+            index.offsets and index.micros[0] != _line_micros(buf, index.offsets[0], len(buf))
+        ):
+            index = LogIndex(path)
+        if index.size < len(buf):
+            index.update(buf)
+            try:
+                index.save()
+            except OSError:
+                # e.g. a read-only directory: the index still works for this query
+                pass
+        return index
+
+    @staticmethod
+    def load(path: str) -> LogIndex | None:
+        'Load the sidecar index of a log file, if it has one.'
+        try:
+            with open(f'{path}.idx', 'rb') as f:
+                data = array('q', f.read())
+        except (OSError, ValueError):
+            return None
+        if len(data) % 2 == 0:
+            return None
+        return LogIndex(path, data[0], data[1::2], data[2::2])
+
+    def save(self) -> None:
+        'Write the index beside the log file (atomically).'
+        data = array('q', [self.size])
+        for m, o in zip(self.micros, self.offsets):
+            data.extend((m, o))
+        with open(f'{self.path}.idx.tmp', 'wb') as f:
+            data.tofile(f)
+        os.replace(f'{self.path}.idx.tmp', f'{self.path}.idx')
+
+    def update(self, buf) -> None:
+        'Index the (whole) lines of the file after the last indexed block.'
+        offset = self.offsets[-1] + INDEX_BLOCK if self.offsets else 0
+        end = buf.rfind(b'\n') + 1
+        while offset < end:
+            if offset and buf[offset - 1] != ord('\n'):
+                # the start of the next line (there is one, as the last line ends before `end`)
+                offset = buf.find(b'\n', offset, end) + 1
+            micros = _line_micros(buf, offset, buf.find(b'\n', offset, end))
+            if micros is not None:
+                self.micros.append(micros)
+                self.offsets.append(offset)
+            offset += INDEX_BLOCK
+        self.size = max(end, self.size)
+
+    def range(self, since: int | None, until: int | None, size: int) -> tuple[int, int]:
+        'The (start, stop) bytes of a file of `size` that hold the lines from `since` to `until` (in epoch µs).'
+        start, stop = 0, size
+        if since is not None:
+            # the block before the first entry at or after since, as it can end with lines at since
+            i = bisect_left(self.micros, since)
+            start = self.offsets[i - 1] if i else 0
+        if until is not None:
+            i = bisect_right(self.micros, until)
+            stop = self.offsets[i] if i < len(self.offsets) else size
+        return start, stop
+
+
+def query(
+    filename: str | list[str],
+    level:    int | str | None        = None,
+    since:    datetime | str | None   = None,
+    until:    datetime | str | None   = None,
+    name:     str | None              = None,
+    event:    dict                    = {},
+    where:    Callable[[dict], bool] | None = None,
+    index:    bool                    = False,
+) -> Iterator[dict]:
+    '''
+    Yields the records (parsed JSON lines) of log files that match every filter, in order.
+    - `filename` is a log file (read with its rotated backups, see log_files) or a list of files
+    - `level` is the minimum level (e.g. LogLevel.WARNING or 'WARNING')
+    - `since`/`until` are the (inclusive) time range, as datetimes or ISO strings (local time if naive)
+    - `name` is a logger name, which also matches its children (e.g. 'app' matches 'app.db')
+    - `event` is a dict of fields that the record's event must have equal values for
+    - `where` is any other test of a record
+    - `index` uses (and builds/updates) a sidecar LogIndex of each file, to seek to the time range
+    '''
+    files = log_files(filename) if isinstance(filename, str) else filename
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    since_us = _micros(since) if since is not None else None
+    until_us = _micros(until) if until is not None else None
+
+    # byte strings that a matching line must contain, the longest (i.e. likely rarest) first
+    needles = []
+    if name is not None:
+        # without the closing quote, to match children too
+        needles.append(b'"name": ' + json.dumps(name).encode()[:-1])
+    for k, v in event.items():
+        # only values that are always encoded the same way (e.g. 1 == 1.0 == True)
+        if v is None or isinstance(v, str):
+            needles.append(json.dumps({k: v})[1:-1].encode())
+    needles.sort(key=len, reverse=True)
+
+    for path in files:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                continue
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with buf:
+            start, stop = 0, len(buf)
+            if index and (since_us is not None or until_us is not None):
+                start, stop = LogIndex.open(path, buf).range(since_us, until_us, stop)
+
+            for line_start, line_end in _lines(buf, start, stop, needles):
+                if level is not None:
+                    levelname = _field(buf, _LEVEL_FIELD, line_start, line_end)
+                    n = logging.getLevelName(levelname.decode()) if levelname else None
+                    if not isinstance(n, int) or n < level:
+                        continue
+                if since_us is not None or until_us is not None:
+                    micros = _line_micros(buf, line_start, line_end)
+                    if micros is None or (since_us is not None and micros < since_us) or (until_us is not None and micros > until_us):
+                        continue
+                try:
+                    record = json.loads(buf[line_start:line_end])
+                except ValueError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                if name is not None:
+                    record_name = record.get('name', '')
+                    if record_name != name and not record_name.startswith(f'{name}.'):
+                        continue
+                if event:
+                    record_event = record.get('event')
+                    if not isinstance(record_event, dict) or any(record_event.get(k, _MISSING) != v for k, v in event.items()):
+                        continue
+                if where is not None and not where(record):
+                    continue
+                yield record
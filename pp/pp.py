@@ -1,13 +1,16 @@
 from dataclasses import asdict, is_dataclass, dataclass
 from datetime import datetime
+from functools import lru_cache
 import json
 import random
+import re
 from types import FunctionType
 
 from pygments import highlight, console
 from pygments.lexers import JsonLexer, OutputLexer
 from pygments.formatters import Terminal256Formatter
 from pygments.styles import get_style_by_name, get_all_styles
+from pygments.token import Keyword, Name, Number, Punctuation, String
 
 STYLES = (
     'dracula', 'fruity', 'gruvbox-dark', 'gruvbox-light', 'lightbulb', 'material', 'native',
@@ -66,3 +69,55 @@ def ps(s: str, style: str='yellow', random_style: bool=False) -> str:
 def pps(s: str, style: str='yellow', random_style: bool=False) -> None:
     'pretty-print a string'
     print(ps(s, style=style, random_style=random_style))
+
+# JSON tokens, one group per kind: a key (a string followed by a colon), a string, a number, a constant, punctuation
+_JSON_TOKENS = re.compile(r'''
+    ("[^"\\]*(?:\\.[^"\\]*)*")(?=\s*:)
+  | ("[^"\\]*(?:\\.[^"\\]*)*")
+  | (-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (true|false|null)
+  | ([\[\]{},:][\[\]{},:\s]*)
+''', re.VERBOSE)
+_JSON_TOKEN_TYPES = (Name.Tag, String.Double, Number, Keyword.Constant, Punctuation)
+_RESET = '\x1b[0m'
+
+@lru_cache
+def _json_colours(style: str) -> tuple:
+    'the escape code that starts each kind of _JSON_TOKENS (by group number), in the colours pygments uses for a style'
+    style_string = Terminal256Formatter(style=get_style_by_name(style)).style_string
+    colours = [None]
+    for ttype in _JSON_TOKEN_TYPES:
+        # unstyled token types inherit their parent's style
+        while ttype.parent is not None and str(ttype) not in style_string:
+            ttype = ttype.parent
+        # reset first, so that no bold/colour carries over from the last token
+        start = style_string.get(str(ttype), ('',))[0]
+        colours.append(start.replace('\x1b[', '\x1b[0;', 1) if start else _RESET)
+    return tuple(colours)
+
+def highlight_json(code: str, style: str='dracula') -> str:
+    '''
+    colourise a JSON string (like ppd, but with a single regex pass rather than the pygments lexer)
+    each token only sets its style (carried over whitespace), with one reset at the end
+    '''
+    colours = _json_colours(style)
+    return _JSON_TOKENS.sub(lambda m: colours[m.lastindex] + m[0], code) + _RESET
+
+def project(d: dict, keys: list) -> dict:
+    '''
+    pick keys from a dict, where each key is a dotted path into nested dicts (e.g. 'event.key')
+    the result keeps the nesting, and leaves out any paths that are missing
+    '''
+    result = {}
+    for key in keys:
+        path, value = key.split('.'), d
+        for k in path:
+            if not isinstance(value, dict) or k not in value:
+                break
+            value = value[k]
+        else:
+            target = result
+            for k in path[:-1]:
+                target = target.setdefault(k, {})
+            target[path[-1]] = value
+    return result
@@ -0,0 +1,246 @@
+from pp import bench
+
+class TestMemit:
+    def test_memit_peak(self):
+        'A function that builds a large list should have a larger peak than one that does nothing'
+
+        def big(n): return list(range(n))
+        def noop(n): return None
+
+        big_mem, noop_mem = bench.memit_func(big, (10_000,), {}, n=10), bench.memit_func(noop, (10_000,), {}, n=10)
+
+        assert big_mem.peak > 10_000 * 8
+        assert big_mem.peak > noop_mem.peak
+        assert noop_mem.retained_blocks < 1
+
+    def test_format_bytes(self):
+        assert bench._format_bytes(512) == ' 512.00 B '
+        assert bench._format_bytes(2048) == '   2.00 KB'
+
+class TestTimeit:
+    def test_args_unpickled_once(self, monkeypatch):
+        'The args are unpickled before the timed calls, not in them'
+        import pickle
+
+        loads, calls = pickle.loads, []
+        monkeypatch.setattr(pickle, 'loads', lambda *a: calls.append(1) or loads(*a))
+        def f(xs): return len(xs)
+
+        result, correct, times = bench.timeit_func(f, (list(range(1000)),), {}, 1000, n=100)
+        assert (result, correct, times.total()) == (1000, True, 100)
+        assert len(calls) <= 2
+
+class TestAsync:
+    def test_timeit_awaits_coroutines(self):
+        'The result of a coroutine function should be awaited, not the coroutine object'
+        import asyncio
+
+        async def f(x):
+            await asyncio.sleep(0)
+            return x * 2
+
+        result, correct, times, throughput = bench.atimeit_func(f, (2,), {}, 4, n=22, concurrency=5)
+
+        assert (result, correct) == (4, True)
+        assert times.total() == 22
+        assert throughput > 0
+        assert bench.timeit_func(f, (2,), {}, 4, n=10)[:2] == (4, True)
+
+class TestSweep:
+    SIZES = [10, 100, 1_000, 10_000, 100_000]
+
+    def test_fit_complexity(self):
+        import math
+
+        for expected, f in {
+            'O(1)':       lambda n: 1e-6,
+            'O(n)':       lambda n: 1e-6 + 5e-9*n,
+            'O(n log n)': lambda n: 1e-6 + 1e-9*n*math.log(n),
+            'O(n²)':      lambda n: 1e-7 + 1e-10*n*n,
+        }.items():
+            assert bench.fit_complexity(self.SIZES, [f(n) for n in self.SIZES]).complexity == expected
+
+    def test_find_crossovers(self):
+        'A linear function with a large constant should overtake a quadratic one as the size grows'
+        def lin(): pass
+        def quad(): pass
+
+        s1 = bench.Sweep(lin,  self.SIZES, [1e-3 + 1e-8*n for n in self.SIZES], None)
+        s2 = bench.Sweep(quad, self.SIZES, [1e-9*n*n for n in self.SIZES], None)
+
+        (size, faster), = bench.find_crossovers(s1, s2)
+        assert 100 < size < 10_000
+        assert faster is lin
+
+    def test_sweep_chart_flat(self, capsys):
+        'A chart of a single size, or of equal times, should be drawn on a flat axis'
+        def f(): pass
+
+        bench._print_sweep_chart([bench.Sweep(f, [10, 10], [1e-6, 1e-6], None)], ['bold'])
+        assert '●' in capsys.readouterr().out
+
+    def test_sweep_sizes(self):
+        import pytest
+
+        def f(): pass
+        with pytest.raises(ValueError):
+            bench.sweep(lambda size: ((size,), {}), [[f]], sizes=(0, 10))
+
+class TestProgress:
+    def test_progress_plain(self, monkeypatch):
+        'When not on a TTY, progress is printed as plain lines'
+        import io, time
+
+        monkeypatch.setattr(bench, 'PROGRESS_REFRESH_PLAIN', 0.01)
+        stream, iterations = io.StringIO(), iter(range(10))
+        with bench.Progress('f', iterations, stream=stream):
+            next(iterations)
+            time.sleep(0.05)
+
+        line = stream.getvalue().splitlines()[0]
+        assert line.startswith('f 1/10 ( 10.0%)')
+        assert '\033' not in line
+
+class TestNoise:
+    def test_cv_times(self):
+        from collections import Counter
+
+        assert bench._cv_times(Counter({1.0: 10})) == 0
+        assert round(bench._cv_times(Counter({1.0: 1, 3.0: 1})), 4) == round(2**0.5 / 2, 4)
+
+    def test_timeit_interleaved(self):
+        'Every function should get all n calls, split over the rounds'
+        def f(x): return x+1
+        def g(x): return x+2
+
+        r1, r2 = bench._timeit_interleaved([f, g], (1,), {}, 2, n=102, rounds=4, disable_gc=True)
+
+        assert (r1.func, r1.correct, r1.times.total()) == (f, True, 102)
+        assert (r2.func, r2.correct, r2.times.total()) == (g, False, 102)
+
+class TestProfile:
+    def test_profile_func(self, tmp_path):
+        'The profile should contain the function, and write pstats & collapsed stacks'
+        def f(xs): return sorted(xs)
+
+        stats = bench.profile_func(f, ([3, 1, 2],), {}, n=10, out=str(tmp_path / 'f'))
+        locations = [location for location, *_ in bench._profile_entries(stats)]
+
+        assert any(location.endswith('(f)') for location in locations)
+        assert not any('disable' in location for location in locations)
+        assert (tmp_path / 'f.pstats').exists()
+        assert any(
+            line.split(' ')[0].endswith(':f;builtins:sorted')
+            for line in (tmp_path / 'f.collapsed').read_text().splitlines()
+        )
+
+class TestCold:
+    def test_snippet(self):
+        'A snippet should run in a fresh interpreter, with the test args available'
+        result, correct, times = bench.timeit_func(bench.Snippet('sorted(args[0])', n=2), ([3, 1, 2],), {}, [1, 2, 3])
+
+        assert (result, correct, times.total()) == ([1, 2, 3], True, 2)
+
+    def test_snippet_is_cold(self):
+        'Modules imported by the harness should not already be imported in the worker'
+        assert bench.Snippet("__import__('sys').modules.get('pickle') is None")() is True
+
+    def test_snippet_from_main_func(self):
+        import pytest
+
+        def f(): pass
+        f.__module__ = '__main__'
+        with pytest.raises(ValueError):
+            bench.Snippet.from_func(f)
+
+    def test_snippet_from_unimportable_func(self):
+        'Functions that can\'t be imported by name are rejected when the snippet is made, not when it runs'
+        import pytest
+
+        def local(): pass
+        with pytest.raises(ValueError, match='top level'):
+            bench.Snippet.from_func(local)
+        with pytest.raises(ValueError, match='top level'):
+            bench.Snippet.from_func(lambda: None)
+        with pytest.raises(ValueError, match='by name'):
+            bench.Snippet.from_func(bench.Snippet.from_func)
+        assert bench.Snippet.from_func(bench.memit_func).stmt == 'memit_func(*args, **kwargs)'
+
+class TestHistory:
+    def test_store_series(self, tmp_path):
+        'Only the last n results of each function should be returned, oldest first'
+        from collections import Counter
+
+        def f(): pass
+        store = bench.ResultStore(str(tmp_path / 'bench.db'))
+        test = bench.Test((1,), {}, None, 1)
+        for i in range(10):
+            store.append('suite', test, [bench.Result(f, None, True, Counter({float(i): 1}))], ts=float(i))
+
+        (key, points), = store.series(suite='suite', last=3).items()
+        store.close()
+
+        assert key[0] == 'suite' and key[2].endswith('.f')
+        assert points == [(7.0, 7.0), (8.0, 8.0), (9.0, 9.0)]
+
+    def test_store_cold_series(self, tmp_path):
+        'Cold-start and warm results of the same function are separate series'
+        from collections import Counter
+
+        store = bench.ResultStore(str(tmp_path / 'bench.db'))
+        test = bench.Test((1,), {}, None, 1)
+        cold = bench.Snippet.from_func(bench.memit_func)
+        for i in range(3):
+            store.append('suite', test, [
+                bench.Result(bench.memit_func, None, True, Counter({1.0: 1})),
+                bench.Result(cold, None, True, Counter({100.0: 1})),
+            ], ts=float(i))
+
+        series = {key[2]: [median for _, median in points] for key, points in store.series(suite='suite').items()}
+        store.close()
+
+        assert series == {'pp.bench.memit_func': [1.0]*3, 'cold:pp.bench.memit_func': [100.0]*3}
+
+    def test_find_steps(self):
+        assert bench.find_steps([1.0]*10) == []
+        assert bench.find_steps([1.0]*10 + [2.0]*10) == [(10, 2.0)]
+        assert bench.find_steps([1.0]*10 + [0.0]*10) == []
+        assert bench.find_steps([0.0]*10 + [1.0]*10) == []
+
+    def test_test_key(self):
+        'Tests whose args only differ after the truncated part have different keys'
+        a, b = bench.Test(('x'*100 + 'a',), {}, None, 1), bench.Test(('x'*100 + 'b',), {}, None, 1)
+        assert bench._test_key(a) != bench._test_key(b)
+        assert bench._test_key(a) == bench._test_key(bench.Test(('x'*100 + 'a',), {}, None, 1))
+
+class TestVerify:
+    def test_verify(self):
+        'Every function should be checked against every test, with exceptions as results'
+        def ok(x): return x * 2
+        def bad(x): raise ValueError(x)
+
+        verdicts = bench.verify([((1,), {}, 2), ((2,), {}, 4)], [[ok], [bad]])
+
+        assert verdicts[0, ok] == (2, True) and verdicts[1, ok] == (4, True)
+        assert isinstance(verdicts[1, bad].result, ValueError) and not verdicts[1, bad].correct
+
+    def test_verify_fail_fast(self):
+        import pytest
+
+        def bad(x): return None
+        with pytest.raises(bench.VerificationError):
+            bench.verify([((1,), {}, 2)], [[bad]], fail_fast=True)
+
+    def test_verify_snippets(self):
+        'Snippets share a pool of cold-start workers, which must be safe to use from verify\'s threads'
+        snippets = [bench.Snippet('sorted(args[0])', n=1) for _ in range(8)]
+        verdicts = bench.verify([(([3, 1, 2],), {}, [1, 2, 3])], [snippets], workers=8)
+        assert all(v.correct for v in verdicts.values()) and len(verdicts) == 8
+
+    def test_comparators(self):
+        assert bench.equals(ValueError('x'), ValueError)
+        assert bench.approx(rel_tol=1e-6)([0.1 + 0.2, 1.0], [0.3, 1.0])
+        assert not bench.approx()(0.1 + 0.2, 0.3 + 1e-6)
+        assert bench.unordered([3, 1, 2], [1, 2, 3]) and not bench.unordered([1, 1, 2], [1, 2, 2])
+        assert bench.unordered([[1], [2]], [[2], [1]])
+        assert bench.same_exception(ValueError('x'), ValueError('x')) and not bench.same_exception(ValueError('y'), ValueError('x'))
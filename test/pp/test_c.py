@@ -30,3 +30,51 @@ class TestC:
             results[n] = c.ansi_to_rgb(n)
 
         assert results == expected
+
+    def test_rgb_to_ansi(self):
+        'Every cube colour should round trip, and in-between colours should map to the nearest one'
+        for n in range(16, 232):
+            assert c.rgb_to_ansi(*c.ansi_to_rgb(n)) == n
+        assert c.rgb_to_ansi(47, 100, 236) == c.cube_coords_to_ansi(0, 1, 5)
+
+    def test_many_python(self, monkeypatch):
+        monkeypatch.setattr(c, 'np', None)
+
+        assert c.ansi_to_rgb_many(range(256)) == [c.ansi_to_rgb(n) for n in range(256)]
+        assert c.rgb_to_ansi_many([(0, 0, 0), (95, 0, 255), (47, 100, 236)]) == [16, 57, c.rgb_to_ansi(47, 100, 236)]
+
+    def test_many_numpy(self):
+        import pytest
+        np = pytest.importorskip('numpy')
+
+        codes = np.arange(256).reshape(16, 16)
+        rgb = c.ansi_to_rgb_many(codes)
+        assert rgb.shape == (16, 16, 3)
+        assert rgb.reshape(-1, 3).tolist() == [list(c.ansi_to_rgb(n)) for n in range(256)]
+
+        pixels = np.random.default_rng(0).integers(0, 256, (64, 3))
+        assert c.rgb_to_ansi_many(pixels).tolist() == [c.rgb_to_ansi(*p) for p in pixels.tolist()]
+
+    def test_ansi_to_rgb_system_and_greys(self):
+        assert c.ansi_to_rgb(0) == (0, 0, 0)
+        assert c.ansi_to_rgb(9) == (255, 0, 0)
+        assert c.ansi_to_rgb(15) == (255, 255, 255)
+        assert [c.ansi_to_rgb(n)[0] for n in range(232, 256)] == list(range(8, 248, 10))
+
+    def test_from_ansi_interned(self):
+        'Colours should be created once, and match a freshly built one'
+        for n in range(256):
+            assert c.from_ansi(n) is c.ANSI_COLOURS[n]
+            assert c.from_ansi(n).colorise('x', 'fg') == f'\033[38;5;{n}mx{c.RESET}'
+        assert c.from_cube_coords(r=1, g=2, b=3) is c.from_ansi(c.cube_coords_to_ansi(1, 2, 3))
+        assert c.from_ansi(256).escape_code('bg') == '\033[48;5;256m'
+
+    def test_out_of_range(self):
+        'Negative codes and coordinates outside the cube are rejected, rather than wrapping around'
+        import pytest
+
+        for make in (lambda: c.from_ansi(-1), lambda: c.ANSIColour(-1, (0, 0, 0)).colorise('x'),
+                     lambda: c.ANSIColour(-1, (0, 0, 0)).escape_code('fg'),
+                     lambda: c.from_cube_coords(6, 0, 0), lambda: c.from_cube_coords(0, -1, 0)):
+            with pytest.raises(ValueError):
+                make()
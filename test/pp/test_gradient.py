@@ -0,0 +1,128 @@
+import pytest
+
+from pp.colour import gradient
+
+
+class TestGradient:
+    def test_interp(self):
+        assert gradient.interp(0, 10, 3) == [0, 5, 10]
+        assert gradient.interp(0, 10, 1) == [0]
+
+    def test_gradient_endpoints(self):
+        for space in ('srgb', 'linear', 'oklab'):
+            g = gradient.gradient([(255, 0, 0), (0, 255, 0), (0, 0, 255)], 5, space)
+            assert len(g) == 5
+            assert g[0] == (255, 0, 0) and g[2] == (0, 255, 0) and g[-1] == (0, 0, 255)
+
+    def test_gradient_spaces(self):
+        'The midpoint between black and white is darkest in sRGB, and lightest in linear light'
+        mid = {space: gradient.gradient([(0, 0, 0), (255, 255, 255)], 3, space)[1] for space in ('srgb', 'linear', 'oklab')}
+        assert mid['srgb'] == (128, 128, 128)
+        assert mid['linear'] == (188, 188, 188)
+        assert 95 < mid['oklab'][0] < 105
+
+    def test_gradient_positions(self):
+        g = gradient.gradient([(0, 0, 0), (100, 100, 100), (200, 200, 200)], 5, 'srgb', positions=[0, 0.75, 1])
+        assert g == ((0, 0, 0), (33, 33, 33), (67, 67, 67), (100, 100, 100), (200, 200, 200))
+        with pytest.raises(ValueError):
+            gradient.gradient([(0, 0, 0), (1, 1, 1)], 5, positions=[1, 0])
+
+    def test_gradient_cached(self):
+        assert gradient.gradient([[1, 2, 3], [4, 5, 6]], 10) is gradient.gradient(((1, 2, 3), (4, 5, 6)), 10)
+
+    def test_gradient_python(self, monkeypatch):
+        'The pure-python fallback should match numpy (to within rounding)'
+        stops, expected = [(255, 0, 0), (0, 128, 255), (20, 20, 20)], {}
+        for space in ('srgb', 'linear', 'oklab'):
+            expected[space] = gradient.gradient(stops, 9, space)
+        gradient._gradient.cache_clear()
+        monkeypatch.setattr(gradient, 'np', None)
+        for space in ('srgb', 'linear', 'oklab'):
+            for a, b in zip(gradient.gradient(stops, 9, space), expected[space]):
+                assert all(abs(i - j) <= 1 for i, j in zip(a, b))
+        gradient._gradient.cache_clear()
+
+
+class TestFace:
+    @staticmethod
+    def codes(face):
+        return [[cell.ansi_n for cell in row] for row in face]
+
+    def test_rot90(self):
+        'Views should match rotating (clockwise) a copy of the rows, and share the codes'
+        face = gradient.RGBCube.from_ranges('r', 'g', 'b').faces.faces[2][0]
+        for n in range(4):
+            for flip in (False, True):
+                rows = self.codes(face)[::-1] if flip else self.codes(face)
+                for _ in range(n):
+                    rows = [list(row) for row in zip(*rows[::-1])]
+                view = face.rot90(n, flip=flip)
+                assert self.codes(view) == rows
+                assert view.codes is face.codes and face.rot90(n, flip=flip) is view
+                # views of views compose
+                assert self.codes(view.rot90(1)) == [list(row) for row in zip(*rows[::-1])]
+
+    def test_edge(self):
+        face = gradient.Face([[gradient.c.from_ansi(16 + 6*i + j) for j in range(3)] for i in range(3)])
+        assert face.edge('ts') == (16, 17, 18)
+        assert face.edge('bs') == (28, 29, 30)
+        assert face.edge('lhs') == (16, 22, 28)
+        assert face.edge('rhs') == (18, 24, 30)
+        assert face.rot90(1).edge('ts') == (28, 22, 16)
+
+    def test_eq(self):
+        'Faces compare by their colours, including views against copies'
+        face = gradient.Face([[gradient.c.from_ansi(16 + 6*i + j) for j in range(3)] for i in range(3)])
+        assert face == gradient.Face(face.rows) and face.rot90(1) == gradient.Face(face.rot90(1).rows)
+        assert face != face.rot90(1) and face != gradient.Face.empty_face(3) != gradient.Face.empty_face(2)
+
+    def test_find_face_with_edge(self):
+        'The edge index should find the same faces as checking every rotation/flip of every face'
+        import itertools
+
+        cubes = {''.join(k): gradient.RGBCube.from_ranges(*k) for k in itertools.permutations('rgb')}
+        # (without __post_init__, which needs a terminal)
+        collection = gradient.RGBCubeCollection.__new__(gradient.RGBCubeCollection)
+        collection.cubes = cubes
+
+        def scan(face_name, face, edge_type):
+            for name, cube in cubes.items():
+                for candidate in cube.faces:
+                    for rot, flip in itertools.product(range(4), (False, True)):
+                        view = candidate.rot90(rot, flip=flip)
+                        if name != face_name and view.edge(gradient.OPPOSITE_EDGES[edge_type]) == face.edge(edge_type):
+                            return view, name
+
+        for face in cubes['rgb'].faces:
+            for edge_type in gradient.OPPOSITE_EDGES:
+                assert gradient.find_face_with_edge(collection, 'rgb', face, edge_type) == scan('rgb', face, edge_type)
+
+    def test_str_width(self):
+        'Cached widths should match measuring the rendered lines'
+        from pp.colour.styled import visible_width
+
+        cube = gradient.RGBCube.from_ranges('g', 'r', 'b')
+        for cell_width in (6, 15):
+            lines = list(cube.faces.iter_s(1, 1, cell_width))
+            assert cube.faces.str_width(cell_width) == max(map(visible_width, lines)) == max(line.width for line in lines)
+
+    def test_iter_s_memoised(self):
+        'Rendered lines should be reused, and padding lines shared by faces with the same colours'
+        cube = gradient.RGBCube.from_ranges('r', 'g', 'b')
+        face = cube.faces.faces[0][0]
+        lines = list(face.iter_s(1, 1, 6))
+        assert all(a is b for a, b in zip(lines, face.iter_s(1, 1, 6)))
+
+        # the same colours, in a different face
+        copy = gradient.Face(face.rows)
+        assert copy.codes is not face.codes
+        assert list(copy.iter_s(1, 0, 6))[0] is lines[0]
+
+    def test_iter_s_changed(self):
+        'A face changed in place is rendered again'
+        face = gradient.Face.empty_face(2)
+        before = list(face.iter_s(0, 0, 6))
+        face.codes[0] = 196
+        after = list(face.iter_s(0, 0, 6))
+        assert after != before and after == list(gradient.Face(face.rows).iter_s(0, 0, 6))
+        assert face.row_widths(15) == gradient.Face(face.rows).row_widths(15)
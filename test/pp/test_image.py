@@ -0,0 +1,63 @@
+import io
+
+from pp.colour import c, image
+
+
+def write_ppm(path, width, height, pixels, magic='P6', maxval=255):
+    with open(path, 'wb') as f:
+        f.write(f'{magic}\n# comment\n{width} {height}\n{maxval}\n'.encode() + bytes(pixels))
+
+
+class TestImage:
+    def test_open(self, tmp_path):
+        write_ppm(tmp_path / 'a.ppm', 2, 1, [1, 2, 3, 4, 5, 6])
+        with image.Image.open(str(tmp_path / 'a.ppm')) as img:
+            assert (img.width, img.height, img.channels) == (2, 1, 3)
+            assert img.rows(0, 1).tobytes() == bytes([1, 2, 3, 4, 5, 6])
+
+    def test_downsample(self):
+        'Each output pixel should be the average of its block'
+        pixels = [0, 0, 0, 10, 20, 30, 100, 100, 100, 200, 200, 200] * 2
+        img = image.Image(bytes(pixels), 4, 2)
+        (band,) = image._downsample(img, 2, 1, image.BAND_LINES)
+        band = [list(map(tuple, row)) for row in band.tolist()] if c.np is not None else band
+        assert band == [[(5, 10, 15), (150, 150, 150)]]
+
+    def test_downsample_python(self, monkeypatch):
+        'The pure-python fallback should match numpy, including greyscale'
+        pixels = bytes(range(256)) * 12
+        for ch in (1, 3):
+            img = image.Image(pixels, 32, 96 // ch, ch)
+            expected = [list(map(tuple, row)) for band in image._downsample(img, 5, 7, 2) for row in (
+                band.tolist() if c.np is not None else band
+            )]
+            monkeypatch.setattr(image, 'np', None)
+            assert [row for band in image._downsample(img, 5, 7, 2) for row in band] == expected
+            monkeypatch.undo()
+
+    def test_maxval(self, tmp_path, monkeypatch):
+        'Samples of images with a maxval below 255 are scaled up to 0-255'
+        write_ppm(tmp_path / 'a.pgm', 4, 1, [0, 1, 0, 0], magic='P5', maxval=1)
+        write_ppm(tmp_path / 'b.ppm', 1, 1, [3, 7, 15], maxval=15)
+        for _ in range(2):
+            with image.Image.open(str(tmp_path / 'a.pgm')) as img:
+                assert img.maxval == 1
+                (band,) = image._downsample(img, 2, 1, image.BAND_LINES)
+                band = [list(map(tuple, row)) for row in band.tolist()] if image.np is not None else band
+                assert band == [[(128, 128, 128), (0, 0, 0)]]
+            with image.Image.open(str(tmp_path / 'b.ppm')) as img:
+                (band,) = image._downsample(img, 1, 1, image.BAND_LINES)
+                band = [list(map(tuple, row)) for row in band.tolist()] if image.np is not None else band
+                assert band == [[(51, 119, 255)]]
+            monkeypatch.setattr(image, 'np', None)
+
+    def test_render(self, tmp_path):
+        'Each line should show two rows of pixels as half blocks'
+        write_ppm(tmp_path / 'a.pgm', 4, 3, [0, 0, 255, 255] * 3, magic='P5')
+        out = io.StringIO()
+        image.render(str(tmp_path / 'a.pgm'), columns=4, out=out)
+        lines = out.getvalue().splitlines()
+
+        assert len(lines) == 2
+        assert lines[0] == '\033[38;5;16;48;5;16m▀▀\033[38;5;231;48;5;231m▀▀' + c.RESET
+        assert lines[1] == '\033[38;5;16m▀▀\033[38;5;231m▀▀' + c.RESET
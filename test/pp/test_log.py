@@ -0,0 +1,335 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from pp import log
+
+TZ = timezone(timedelta(hours=10))
+START = datetime(2024, 12, 9, 12, 0, tzinfo=TZ)
+
+def _record(i, level='INFO', name='app', **event):
+    return {
+        'timestamp': (START + timedelta(seconds=i)).isoformat(),
+        'level':     level,
+        'name':      name,
+        'msg':       f'message {i}',
+        'event':     event,
+    }
+
+def _write(path, records):
+    with open(path, 'w') as f:
+        for r in records:
+            f.write(json.dumps(r) + '\n')
+
+class TestQuery:
+    def test_query_logger_output(self, tmp_path):
+        'Query the output of a logger'
+
+        path = str(tmp_path / 'info.log')
+        logger = log.getLogger('test_query', level=log.LogLevel.INFO, stream=None, files={log.LogLevel.INFO: path})
+        logger.info('one', {'key': 'a'})
+        logger.warning('two', {'key': 'b'})
+        logger.info('three', {'key': 'b'})
+        for h in logger.handlers:
+            h.close()
+
+        assert [r['msg'] for r in log.query(path)] == ['one', 'two', 'three']
+        assert [r['msg'] for r in log.query(path, level='WARNING')] == ['two']
+        assert [r['msg'] for r in log.query(path, event={'key': 'b'})] == ['two', 'three']
+
+    def test_query_filters(self, tmp_path):
+        'Filter by level, name, event fields and a predicate'
+
+        path = str(tmp_path / 'app.log')
+        _write(path, [
+            _record(0, 'DEBUG', 'app', key='a'),
+            _record(1, 'ERROR', 'app.db', key='a', n=1),
+            _record(2, 'INFO', 'apple', key='a'),
+            _record(3, 'WARNING', 'web', key='b', n=2),
+        ])
+        with open(path, 'a') as f:
+            f.write('not json, but "name": "app\n')
+
+        msgs = lambda **kwargs: [r['msg'] for r in log.query(path, **kwargs)]
+        assert msgs(level=log.LogLevel.INFO) == ['message 1', 'message 2', 'message 3']
+        assert msgs(name='app') == ['message 0', 'message 1']
+        assert msgs(event={'key': 'a', 'n': 1.0}) == ['message 1']
+        assert msgs(where=lambda r: r['event'].get('n', 0) > 1) == ['message 3']
+
+    def test_query_time_range(self, tmp_path, monkeypatch):
+        'A time range gives the same records with and without an index'
+
+        monkeypatch.setattr(log, 'INDEX_BLOCK', 256)
+        path = str(tmp_path / 'app.log')
+        _write(path, [_record(i) for i in range(500)])
+
+        since, until = START + timedelta(seconds=100), (START + timedelta(seconds=200)).isoformat()
+        expected = [f'message {i}' for i in range(100, 201)]
+        assert [r['msg'] for r in log.query(path, since=since, until=until)] == expected
+        assert [r['msg'] for r in log.query(path, since=since, until=until, index=True)] == expected
+        assert os.path.exists(f'{path}.idx')
+
+        # the index is extended as the file grows
+        with open(path, 'a') as f:
+            for i in range(500, 600):
+                f.write(json.dumps(_record(i)) + '\n')
+        since = START + timedelta(seconds=550)
+        assert [r['msg'] for r in log.query(path, since=since, index=True)] == [f'message {i}' for i in range(550, 600)]
+
+        # and rebuilt when the file is replaced
+        _write(path, [_record(i + 1000) for i in range(500)])
+        since = START + timedelta(seconds=1100)
+        assert len(list(log.query(path, since=since, until=since, index=True))) == 1
+
+    def test_query_rotated_files(self, tmp_path):
+        'Rotated backups are read oldest first, and other files beside them are not'
+
+        path = str(tmp_path / 'app.log')
+        _write(f'{path}.2024-12-08', [_record(1)])
+        _write(f'{path}.2024-12-07', [_record(0)])
+        _write(path, [_record(2)])
+        _write(f'{path}.bak', [_record(3)])
+
+        assert log.log_files(path) == [f'{path}.2024-12-07', f'{path}.2024-12-08', path]
+        assert [r['msg'] for r in log.query(path)] == ['message 0', 'message 1', 'message 2']
+
+class TestMetrics:
+    def test_metrics_snapshot(self):
+        'Counts and histograms are merged from every thread, then reset'
+        import threading
+
+        metrics = log.Metrics(interval=None)
+        logger = log.getLogger('test_metrics', level=log.LogLevel.INFO, stream=None, metrics=metrics)
+
+        def work():
+            for i in range(1, 101):
+                logger.info('req', {'duration_ms': i, 'ok': True, 'user': 'a'})
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        logger.warning('slow', 'arg', {'duration_ms': 0})
+        logger.debug('ignored', {'duration_ms': 1})
+
+        snapshot = metrics.snapshot()
+        assert sorted((c['level'], c['msg'], c['n']) for c in snapshot['counts']) == [('INFO', 'req', 400), ('WARNING', 'slow', 1)]
+
+        [h] = [h for h in snapshot['histograms'] if h['msg'] == 'req']
+        assert h['field'] == 'duration_ms'
+        assert (h['n'], h['sum'], h['min'], h['max']) == (400, 4 * 5050, 1, 100)
+        assert sum(n for _, n in h['buckets']) == 400
+        # quantiles are within a bucket (~9%) of the truth
+        assert abs(h['p50'] - 50) / 50 < 0.1 and abs(h['p99'] - 99) / 99 < 0.1
+
+        assert metrics.snapshot()['counts'] == []
+
+    def test_metrics_non_finite(self):
+        'inf and nan are counted, but left out of histograms'
+
+        metrics = log.Metrics(interval=None)
+        logger = log.getLogger('test_metrics_non_finite', level=log.LogLevel.INFO, stream=None, metrics=metrics)
+        logger.info('req', {'duration_ms': float('nan')})
+        logger.info('req', {'duration_ms': 2.0})
+        logger.info('req', {'duration_ms': float('inf')})
+        logger.info('req', {'duration_ms': -float('inf')})
+
+        snapshot = metrics.snapshot()
+        assert snapshot['counts'][0]['n'] == 4
+        [h] = snapshot['histograms']
+        assert (h['n'], h['sum'], h['min'], h['max']) == (1, 2.0, 2.0, 2.0)
+
+    def test_metrics_below_one(self):
+        'Values <= 0 come before those below 1 (e.g. sub-millisecond durations) in histograms'
+
+        metrics = log.Metrics(interval=None)
+        logger = log.getLogger('test_metrics_below_one', level=log.LogLevel.INFO, stream=None, metrics=metrics)
+        for v in [0.0]*6 + [0.25]*4:
+            logger.info('req', {'duration_ms': v})
+
+        [h] = metrics.snapshot()['histograms']
+        assert h['buckets'] == [[0.0, 6], [0.25, 4]]
+        assert h['p50'] == 0.0 and h['p90'] == h['p99'] == 0.25
+
+    def test_metrics_flush(self, tmp_path):
+        'A snapshot is logged as a single record, which is not counted itself'
+
+        path = str(tmp_path / 'info.log')
+        metrics = log.Metrics(interval=None, fields=['duration_ms'])
+        logger = log.getLogger('test_flush', level=log.LogLevel.INFO, stream=None, files={log.LogLevel.INFO: path}, metrics=metrics)
+        logger.info('req', {'duration_ms': 2.5, 'size': 10})
+        metrics.flush()
+        metrics.flush()
+        for h in logger.handlers:
+            h.close()
+
+        [record] = log.query(path, event={}, where=lambda r: r['msg'] == 'metrics')
+        assert record['event']['counts'] == [{'name': 'test_flush', 'level': 'INFO', 'msg': 'req', 'n': 1}]
+        assert [h['field'] for h in record['event']['histograms']] == ['duration_ms']
+
+class TestSpan:
+    def _logger(self, name):
+        import io
+
+        stream = io.StringIO()
+        return log.getLogger(name, level=log.LogLevel.INFO, stream=stream), stream
+
+    def _records(self, stream):
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_span_nesting(self):
+        'Nested spans log one record each, linked by their ids'
+
+        logger, stream = self._logger('test_span')
+        with log.span('outer', logger, table='t') as outer:
+            with log.span('inner'):
+                pass
+            outer.set(rows=3)
+
+        inner, outer = self._records(stream)
+        assert (inner['name'], inner['msg'], outer['msg']) == ('test_span', 'inner', 'outer')
+        assert inner['event']['parent_id'] == outer['event']['span_id']
+        assert inner['event']['trace_id'] == outer['event']['trace_id'] == outer['event']['span_id']
+        assert outer['event']['parent_id'] is None
+        assert outer['event']['table'] == 't' and outer['event']['rows'] == 3
+        assert outer['event']['duration_ms'] >= inner['event']['duration_ms'] >= 0
+
+    def test_span_decorator(self):
+        'Each call of a decorated (sync or async) function is a span, and errors are recorded'
+        import asyncio
+        import pytest
+
+        logger, stream = self._logger('test_span_decorator')
+
+        @log.span('f', logger)
+        def f(x):
+            if x < 0:
+                raise ValueError(x)
+            return x * 2
+
+        @log.span('g', logger)
+        async def g():
+            return f(1)
+
+        assert f(2) == 4
+        assert asyncio.run(g()) == 2
+        with pytest.raises(ValueError):
+            f(-1)
+
+        records = self._records(stream)
+        assert [r['msg'] for r in records] == ['f', 'f', 'g', 'f']
+        assert records[1]['event']['parent_id'] == records[2]['event']['span_id']
+        assert 'error' not in records[0]['event'] and records[3]['event']['error'] == 'ValueError'
+
+    def test_span_sampling(self):
+        'Spans nested in an untraced span are not traced either'
+
+        logger, stream = self._logger('test_span_sampling')
+
+        @log.span('child', logger)
+        def child():
+            with log.span('grandchild', logger) as s:
+                return s.sampled
+
+        with log.span('root', logger, sample=0.0) as root:
+            assert not root.sampled
+            assert child() is False
+        with log.span('debug', logger, level=log.LogLevel.DEBUG) as s:
+            assert not s.sampled
+
+        assert stream.getvalue() == ''
+        assert log._SPAN.get() is None
+
+    def test_span_level(self):
+        'Spans inside a span skipped for its level are traced, as children of the nearest traced span'
+
+        logger, stream = self._logger('test_span_level')
+        with log.span('outer', logger, span_id='x', duration_ms=-1):
+            with log.span('debug', logger, level=log.LogLevel.DEBUG) as debug:
+                assert not debug.sampled
+                with log.span('inner', logger) as inner:
+                    assert inner.sampled
+
+        inner, outer = self._records(stream)
+        assert inner['event']['parent_id'] == outer['event']['span_id'] != 'x'
+        assert outer['event']['duration_ms'] >= 0
+        assert log._SPAN.get() is None
+
+class TestEvent:
+    def test_event_matches_info(self):
+        'logger.event logs the same JSON as logger.info with a dict of fields'
+        import io
+
+        stream = io.StringIO()
+        logger = log.getLogger('test_event', level=log.LogLevel.INFO, stream=stream, context={'app': 'a'})
+        logger.info('request', {'path': '/', 'status': 200, 'at': datetime(2024, 12, 9)})
+        logger.event('request', path='/', status=200, at=datetime(2024, 12, 9))
+        logger.event('ignored', level=log.LogLevel.DEBUG, path='/')
+
+        info, event = stream.getvalue().splitlines()
+        # (but for the time)
+        assert json.loads(info)['timestamp'][:16] == json.loads(event)['timestamp'][:16]
+        assert info.split('", ', 1)[1] == event.split('", ', 1)[1]
+
+    def test_event_handlers(self, tmp_path):
+        'Events are encoded once, for every handler, and other formatters can format them'
+        import io
+
+        stream, other = io.StringIO(), io.StringIO()
+        path = str(tmp_path / 'info.log')
+        logger = log.getLogger('test_event_handlers', level=log.LogLevel.INFO, stream=stream, files={log.LogLevel.INFO: path})
+        handler = logging.StreamHandler(other)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(name)s %(lineno)d %(threadName)s'))
+        logger.addHandler(handler)
+
+        logger.event('request', status=200)
+        for h in logger.handlers:
+            h.close()
+
+        with open(path) as f:
+            assert f.read() == stream.getvalue()
+        assert json.loads(stream.getvalue())['event'] == {'status': 200}
+        assert other.getvalue() == 'INFO test_event_handlers 0 MainThread\n'
+
+    def test_event_file(self, tmp_path):
+        'Events and spans are written to the default file handler as JSON, like any other record'
+
+        path = str(tmp_path / 'info.log')
+        logger = log.getLogger('test_event_file', level=log.LogLevel.INFO, stream=None, files={log.LogLevel.INFO: path})
+        logger.info('classic', {'k': 0})
+        logger.event('fast', k=1)
+        with log.span('sp', logger):
+            pass
+        for h in logger.handlers:
+            h.close()
+
+        records = list(log.query(path))
+        assert [r['msg'] for r in records] == ['classic', 'fast', 'sp']
+        assert records[1]['event'] == {'k': 1} and 'span_id' in records[2]['event']
+
+    def test_event_contexts(self):
+        'LogFormatters with different contexts each format an event with their own'
+        import io
+
+        first, second = io.StringIO(), io.StringIO()
+        logger = log.getLogger('test_event_contexts', level=log.LogLevel.INFO, stream=first, context={'app': 'a'})
+        handler = logging.StreamHandler(second)
+        handler.setFormatter(log.LogFormatter(defaults={'app': 'b'}))
+        logger.addHandler(handler)
+
+        logger.event('request', status=200)
+        assert json.loads(first.getvalue())['context'] == {'app': 'a'}
+        assert json.loads(second.getvalue())['context'] == {'app': 'b'}
+        assert json.loads(second.getvalue())['msg'] == 'request'
+
+    def test_event_metrics(self):
+        'Metrics reads the fields of events'
+
+        metrics = log.Metrics(interval=None)
+        logger = log.getLogger('test_event_metrics', level=log.LogLevel.INFO, stream=None, metrics=metrics)
+        logger.event('request', duration_ms=2.0)
+        logger.event('request', duration_ms=4.0)
+
+        [h] = metrics.snapshot()['histograms']
+        assert (h['n'], h['sum']) == (2, 6.0)
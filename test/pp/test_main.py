@@ -0,0 +1,123 @@
+import io
+import json
+import sys
+
+from pp import __main__ as cli
+
+LINES = [
+    {'level': 'INFO', 'msg': 'one', 'event': {'key': 1}},
+    {'level': 'DEBUG', 'msg': 'two', 'event': {}},
+    {'other': 3},
+]
+TEXT = ''.join(json.dumps(line) + '\n' for line in LINES) + 'not json\n'
+
+class TestReadChunks:
+    def test_read_chunks_end_at_lines(self):
+        'Chunks end at the end of a line, and join back into the input'
+
+        data = TEXT.encode() * 50 + b'no newline'
+        chunks = list(cli.read_chunks(io.BufferedReader(io.BytesIO(data)), chunk_size=64))
+
+        assert b''.join(chunks) == data
+        assert all(chunk.endswith(b'\n') for chunk in chunks[:-1])
+
+class TestFormatChunk:
+    def test_format_chunk_no_colour(self):
+        'Without keys, indent or colour, lines pass through'
+
+        assert cli.format_chunk(TEXT.encode(), style=None) == TEXT.encode()
+
+    def test_format_chunk_colour(self):
+        'JSON lines are highlighted, other lines pass through'
+
+        from pp.colour.styled import ESCAPES
+
+        out = cli.format_chunk(TEXT.encode()).decode()
+        assert ESCAPES.sub('', out) == TEXT
+        assert out.splitlines()[-1] == 'not json'
+
+    def test_format_chunk_keys(self):
+        'Keys project each record, and records with none of them are dropped'
+
+        out = cli.format_chunk(TEXT.encode(), keys=['msg', 'event.key'], style=None).decode()
+        assert [json.loads(line) for line in out.splitlines()] == [
+            {'msg': 'one', 'event': {'key': 1}},
+            {'msg': 'two'},
+        ]
+
+    def test_format_chunk_indent(self):
+        'Records are re-serialised with an indent'
+
+        out = cli.format_chunk(b'{"a": 1}\n', indent=2, style=None)
+        assert out == b'{\n  "a": 1\n}\n'
+
+    def test_format_chunk_invalid_utf8(self):
+        'Bytes that are not UTF-8 pass through unchanged'
+
+        data = b'\xff\xfe {"a": 1}\n'
+        assert cli.format_chunk(data, style=None) == data
+        assert cli.format_chunk(data, style='dracula') == data
+
+class TestFormatStream:
+    def test_format_stream_workers_keep_order(self):
+        'Chunks formatted in a pool are written in order'
+
+        chunks = [f'{{"n": {i}}}\n'.encode() for i in range(20)]
+        out = io.BytesIO()
+        cli.format_stream(chunks, out, workers=2, keys=['n'], style=None)
+
+        assert out.getvalue() == b''.join(chunks)
+
+    def test_format_stream_workers_stream(self):
+        'Each chunk formatted in a pool is written without waiting for more input'
+        import threading
+
+        written = threading.Event()
+
+        class Out(io.BytesIO):
+            def write(self, b):
+                written.set()
+                return super().write(b)
+
+        def chunks():
+            yield b'{"n": 1}\n'
+            # (as from `tail -f`: no more input until the first chunk is out)
+            assert written.wait(10)
+            yield b'{"n": 2}\n'
+
+        out = Out()
+        cli.format_stream(chunks(), out, workers=2, style=None, keys=['n'])
+        assert out.getvalue() == b'{"n": 1}\n{"n": 2}\n'
+
+class TestMain:
+    def test_main_files(self, tmp_path, capsysbinary):
+        'Files are read in order, and copied when there is nothing to format'
+
+        a, b = tmp_path / 'a.log', tmp_path / 'b.log'
+        a.write_text(TEXT)
+        b.write_text('{"msg": "three"}\n')
+        cli.main([str(a), str(b), '--colour', 'never'])
+
+        assert capsysbinary.readouterr().out == TEXT.encode() + b'{"msg": "three"}\n'
+
+    def test_main_stdin_keys(self, monkeypatch, capsysbinary):
+        'stdin is read by default'
+
+        monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BufferedReader(io.BytesIO(TEXT.encode()))))
+        cli.main(['--keys', 'level', '--colour', 'never'])
+
+        assert capsysbinary.readouterr().out == b'{"level": "INFO"}\n{"level": "DEBUG"}\n'
+
+    def test_main_missing_file(self, tmp_path, capsysbinary):
+        'A missing file is reported in one line, and the rest are still read'
+        import pytest
+
+        a = tmp_path / 'a.log'
+        a.write_text(TEXT)
+        with pytest.raises(SystemExit) as e:
+            cli.main([str(tmp_path / 'missing.log'), str(a), '--colour', 'never'])
+
+        assert e.value.code == 1
+        captured = capsysbinary.readouterr()
+        assert captured.out == TEXT.encode()
+        assert captured.err == f'python -m pp: {tmp_path / "missing.log"}: No such file or directory\n'.encode()
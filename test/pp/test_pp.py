@@ -120,3 +120,33 @@ class TestNormaliseNamedTuple:
                 {'a': 3, 'b': 4},
             ]
         }
+
+class TestHighlightJSON:
+    def test_highlight_json_keeps_text(self):
+        'Highlighting only adds escape codes'
+        from pp.colour.styled import ESCAPES
+
+        code = '{"a": "b\\"c: d", "n": -1.5e3, "t": [true, null, {}]}'
+        for style in pp.STYLES:
+            assert ESCAPES.sub('', pp.highlight_json(code, style)) == code
+
+    def test_highlight_json_colours(self):
+        'Keys, strings, numbers and constants are coloured by kind'
+
+        _, key, string, number, constant, punct = pp._json_colours('dracula')
+        assert pp.highlight_json('{"a": "b:", "n": [1, true]}') == (
+            f'{punct}{{{key}"a"{punct}: {string}"b:"{punct}, {key}"n"{punct}: [{number}1{punct}, {constant}true{punct}]}}\x1b[0m'
+        )
+
+class TestProject:
+    def test_project(self):
+        'Pick dotted keys, keeping their nesting'
+
+        d = {'msg': 'hi', 'level': 'INFO', 'event': {'key': 1, 'other': 2}}
+        assert pp.project(d, ['msg', 'event.key']) == {'msg': 'hi', 'event': {'key': 1}}
+
+    def test_project_missing(self):
+        'Missing keys are left out'
+
+        d = {'msg': 'hi', 'event': {'key': 1}}
+        assert pp.project(d, ['level', 'event.nope', 'msg.x']) == {}
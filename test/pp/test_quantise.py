@@ -0,0 +1,51 @@
+import random
+
+from pp.colour import c, quantise
+
+
+class TestQuantise:
+    def test_rgb_to_ansi_exact(self):
+        'The cube/grey shortcut should find a colour as near as an exhaustive search'
+        def d(p, n): return sum((a - b) ** 2 for a, b in zip(p, c.ansi_to_rgb(n)))
+
+        rng = random.Random(0)
+        for _ in range(1000):
+            p = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            assert d(p, c.rgb_to_ansi(*p)) == min(d(p, n) for n in quantise.PALETTE)
+
+    def test_greys(self):
+        assert c.rgb_to_ansi(128, 128, 128) == 244
+        assert quantise.nearest_ansi(128, 128, 128, 'oklab') == 244
+
+    def test_palette_round_trip(self):
+        for n in quantise.PALETTE:
+            assert quantise.nearest_ansi(*c.ansi_to_rgb(n), 'oklab') == n
+
+    def test_quantiser_grid(self, tmp_path):
+        'Each cell should hold the nearest colour to its centre, and be the same when loaded from a cache'
+        q = quantise.Quantiser('oklab', bits=3, cache=str(tmp_path / 'grid'))
+        for r, g, b in [(16, 16, 16), (48, 240, 112), (208, 80, 144)]:
+            assert q(r, g, b) == q(r + 15, g - 16, b) == quantise.nearest_ansi(r, g, b, 'oklab')
+
+        cached = quantise.Quantiser('oklab', bits=3, cache=str(tmp_path / 'grid'))
+        assert isinstance(cached.grid, memoryview)
+        assert bytes(cached.grid) == bytes(q.grid)
+
+    def test_quantiser_cache_metric(self, tmp_path):
+        'A cached grid built with another metric (or bits) is rebuilt, not loaded'
+        path = str(tmp_path / 'grid')
+        rgb = quantise.Quantiser('rgb', bits=3, cache=path)
+        oklab = quantise.Quantiser('oklab', bits=3, cache=path)
+        assert bytes(oklab.grid) == bytes(quantise.Quantiser('oklab', bits=3).grid) != bytes(rgb.grid)
+
+        # and the cache now holds the oklab grid
+        assert isinstance(quantise.Quantiser('oklab', bits=3, cache=path).grid, memoryview)
+        assert bytes(quantise.Quantiser('rgb', bits=2, cache=path).grid) == bytes(quantise.Quantiser('rgb', bits=2).grid)
+
+    def test_quantiser_many(self, monkeypatch):
+        pixels = [(0, 0, 0), (255, 128, 0), (17, 200, 99)]
+        expected = [quantise.quantiser('rgb', 4)(*p) for p in pixels]
+        assert list(quantise.quantiser('rgb', 4).many(pixels)) == expected
+
+        monkeypatch.setattr(quantise, 'np', None)
+        assert quantise.Quantiser('rgb', 4).many(pixels) == expected
@@ -0,0 +1,44 @@
+from pp.colour import c, render
+
+
+class TestRender:
+    def test_coalesce(self):
+        'Runs of the same colour should share one escape, with one reset at the end of the line'
+        r = render.Renderer()
+        assert r.render_line([('a', 196, None), ('b', 196, None), ('c', 196, 21)]) == \
+            '\033[38;5;196mab\033[48;5;21mc' + c.RESET
+        assert r.render_line([('a', None, None), ('b', None, None)]) == 'ab'
+
+    def test_back_to_default(self):
+        r = render.Renderer()
+        assert r.render_line([('a', 196, 21), ('b', None, 21), ('c', None, None)]) == \
+            '\033[38;5;196;48;5;21ma\033[0;48;5;21mb\033[0mc'
+
+    def test_modes(self):
+        cells = [('a', (255, 0, 0), c.from_ansi(21)), ('b', (255, 0, 1), c.from_ansi(21))]
+        assert render.Renderer('256').render_line(cells) == '\033[38;5;196;48;5;21mab' + c.RESET
+        assert render.Renderer('truecolour').render_line(cells) == \
+            '\033[38;2;255;0;0;48;5;21ma\033[38;2;255;0;1mb' + c.RESET
+
+    def test_render(self):
+        rows = [[('a', 1, None)], [('b', 1, None)]]
+        assert render.Renderer().render(rows) == f'\033[38;5;1ma{c.RESET}\n\033[38;5;1mb{c.RESET}'
+
+
+class TestScreen:
+    def test_diff(self):
+        'The first frame should be drawn in full, and later ones only where they changed'
+        import io
+
+        screen = render.Screen(out=io.StringIO(), gap=2)
+        frame = [[('a', 1, None)] * 10, [('b', 2, None)] * 10]
+        assert screen.diff(frame).startswith('\033[2J\033[1;1H\033[38;5;1maaaaaaaaaa')
+        assert screen.diff(frame) == ''
+
+        frame[1][3] = frame[1][4] = frame[1][8] = ('c', 2, None)
+        assert screen.diff(frame) == f'\033[2;4H\033[38;5;2mcc{c.RESET}\033[2;9H\033[38;5;2mc{c.RESET}'
+
+    def test_spans(self):
+        old, new = list('aaaaaaaaaa'), list('abbaaaaaba')
+        assert render._changed_spans(old, new, gap=2) == [(1, 3), (8, 9)]
+        assert render._changed_spans(old, new, gap=8) == [(1, 9)]
@@ -0,0 +1,23 @@
+import random
+
+from pp.colour import space
+
+
+class TestSpace:
+    def test_round_trip(self):
+        rng = random.Random(0)
+        for _ in range(1000):
+            rgb = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            assert space.oklab_to_rgb(*space.rgb_to_oklab(*rgb)) == rgb
+            assert space.linear_to_rgb(*space.rgb_to_linear(*rgb)) == rgb
+
+    def test_oklab(self):
+        L, a, b = space.rgb_to_oklab(255, 255, 255)
+        assert abs(L - 1) < 1e-4 and abs(a) < 1e-4 and abs(b) < 1e-4
+
+    def test_many(self):
+        rgb = [(0, 0, 0), (255, 128, 0), (12, 200, 99)]
+        result = space.oklab_to_rgb_many(space.rgb_to_oklab_many(rgb))
+        if space.np is not None:
+            result = [tuple(p) for p in result.tolist()]
+        assert result == rgb
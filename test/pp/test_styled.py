@@ -0,0 +1,18 @@
+from pp.colour import c
+from pp.colour.styled import Styled, text_width, visible_width
+
+
+class TestStyled:
+    def test_widths(self):
+        assert text_width('abc') == 3
+        assert text_width('世界') == 4
+        assert text_width('é') == 1
+        assert visible_width(c.from_ansi(21).colorise('ab')) == 2
+
+    def test_built_width(self):
+        'Widths should be tracked through colouring, joining and concatenating'
+        red, blue = Styled.colour('hello', c.from_ansi(196)), Styled.colour('世界', c.from_ansi(21))
+        s = Styled(' ').join([red, blue])
+        assert s.width == 10 == visible_width(s)
+        assert (s + '!').width == ('!' + s).width == 11
+        assert s.ljust(12).width == 12 and s.ljust(12).endswith('  ')